@@ -4,11 +4,12 @@ TCP Server that communicates with Tendermint
 import asyncio
 import signal
 import platform
-import io
 import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
 
 from .utils import *
-from io import BytesIO
 from loguru import logger
 from cometbft.abci.v1beta3.types_pb2 import (
     Request,
@@ -20,6 +21,28 @@ from cometbft.abci.v1beta1.types_pb2 import (
 )
 
 MaxReadInBytes = 64 * 1024  # Max we'll consume on a read stream
+MaxWriteBufferBytes = 1024 * 1024  # Pending response bytes that force a write
+MaxWriteDelay = 0.005  # Max seconds a response waits for a Flush request
+MaxWorkerThreads = 4  # Threads serving mempool and query requests
+
+# Requests of the consensus connection, these always run on the event loop
+ConsensusRequests = {
+    "init_chain",
+    "prepare_proposal",
+    "process_proposal",
+    "finalize_block",
+    "commit",
+    "extend_vote",
+    "verify_vote_extension",
+}
+
+# Mempool and query connection requests that run in worker threads,
+# plus the batched pre-verification of pipelined CheckTx requests
+ThreadedRequests = {
+    "check_tx",
+    "query",
+    "prepare_check_tx",
+}
 
 
 class ProtocolHandler:
@@ -57,6 +80,15 @@ class ProtocolHandler:
         response = Response(check_tx=result)
         return write_message(response)
 
+    async def prepare_check_tx(self, txs) -> None:
+        """
+        Hand all CheckTx txs of a pipelined batch to the app at once, so
+        it can verify them together before the single check_tx calls
+        """
+        prepare = getattr(self.app, "prepare_check_tx", None)
+        if prepare is not None:
+            await prepare(txs)
+
     async def query(self, req) -> bytes:
         result = await self.app.query(req.query)
         response = Response(query=result)
@@ -114,6 +146,128 @@ class ProtocolHandler:
         return write_message(response)
 
 
+class ResponseBuffer:
+    """
+    Per connection buffer for encoded responses.
+
+    CometBFT pipelines requests (e.g. many CheckTx on the mempool
+    connection) and sends a Flush when it needs the answers. Responses are
+    collected and written with a single writelines call when the Flush
+    arrives, once MaxWriteBufferBytes are pending or after MaxWriteDelay.
+    """
+
+    def __init__(
+            self,
+            writer: asyncio.StreamWriter,
+            max_bytes: int = MaxWriteBufferBytes,
+            max_delay: float = MaxWriteDelay
+    ) -> None:
+        self.writer = writer
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._pending = []
+        self._size = 0
+        self._timer = None
+
+    def append(self, response: bytes) -> bool:
+        """
+        Buffer a response, returns True if the buffer was written out
+        """
+        self._pending.append(response)
+        self._size += len(response)
+        if self._size >= self.max_bytes:
+            self.flush()
+            return True
+        if self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.max_delay, self.flush)
+        return False
+
+    def flush(self) -> None:
+        """
+        Write all buffered responses to the transport
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        self.writer.writelines(self._pending)
+        self._pending = []
+        self._size = 0
+
+    def discard(self) -> None:
+        """
+        Drop buffered responses, used once the connection is gone
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._pending = []
+        self._size = 0
+
+
+class RequestScheduler:
+    """
+    Decides where requests are processed.
+
+    Every connection awaits a request before parsing the next one, so
+    requests stay in order within a connection. Consensus requests run
+    on the event loop. Mempool and query requests run in worker threads
+    and the application must serve them from committed state. Priority
+    goes to consensus: threaded requests only start while no consensus
+    request is in progress.
+
+    Threaded requests that started before a consensus request keep
+    running, so up to max_workers of them compete with it for the GIL
+    until they finish. Queries that take long, like simulate_tx, hold a
+    worker while they wait on the simulator and don't compete for the
+    GIL meanwhile.
+    """
+
+    def __init__(self, protocol: ProtocolHandler, max_workers: int = MaxWorkerThreads) -> None:
+        self.protocol = protocol
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="abci-worker"
+        )
+        self._local = threading.local()
+        self._consensus_active = 0
+        self._consensus_idle = asyncio.Event()
+        self._consensus_idle.set()
+
+    async def process(self, req_type: str, req) -> bytes:
+        if req_type in ConsensusRequests:
+            return await self._process_consensus(req_type, req)
+        if req_type in ThreadedRequests:
+            await self._consensus_idle.wait()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, self._process_in_thread, req_type, req
+            )
+        return await self.protocol.process(req_type, req)
+
+    async def _process_consensus(self, req_type: str, req) -> bytes:
+        self._consensus_active += 1
+        self._consensus_idle.clear()
+        try:
+            return await self.protocol.process(req_type, req)
+        finally:
+            self._consensus_active -= 1
+            if self._consensus_active == 0:
+                self._consensus_idle.set()
+
+    def _process_in_thread(self, req_type: str, req) -> bytes:
+        # Each worker thread keeps its own event loop for the app coroutines
+        loop = getattr(self._local, "loop", None)
+        if loop is None:
+            loop = self._local.loop = asyncio.new_event_loop()
+        return loop.run_until_complete(self.protocol.process(req_type, req))
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
 class ABCIServer:
     """
     Async TCP server
@@ -128,6 +282,7 @@ class ABCIServer:
         """
         self.socket_path = socket_path
         self.protocol = ProtocolHandler(app)
+        self.scheduler = RequestScheduler(self.protocol)
 
     def run(self) -> None:
         """
@@ -156,6 +311,10 @@ class ABCIServer:
             if on_windows:
                 loop.run_until_complete(_stop())
         finally:
+            self.scheduler.shutdown()
+            shutdown = getattr(self.protocol.app, "shutdown", None)
+            if shutdown is not None:
+                loop.run_until_complete(shutdown())
             loop.stop()
 
     async def _start(self) -> None:
@@ -171,7 +330,8 @@ class ABCIServer:
     async def _handler(
             self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
     ) -> None:
-        data = BytesIO()
+        data = MessageBuffer()
+        responses = ResponseBuffer(writer)
         while True:
             # Read data from the reader
             bits = await reader.read(MaxReadInBytes)
@@ -180,32 +340,27 @@ class ABCIServer:
                 break  # Exit the loop if the connection is closed
 
             # Append new data to the buffer
-            data.seek(0, io.SEEK_END)
-            data.write(bits)
-            data.seek(0)  # Reset position to start of buffer
-
-            # Attempt to parse and process messages
-            while True:
-                start_pos = data.tell()
-                messages = list(read_messages(data, Request))
-                if not messages:
-                    # No complete messages available, reset position and wait
-                    data.seek(start_pos)
-                    break  # Exit the parsing loop to read more data
-
-                for message in messages:
-                    req_type = message.WhichOneof("value")
-                    response = await self.protocol.process(req_type, message)
-                    writer.write(response)
+            data.feed(bits)
+
+            # Process every complete message, partial data stays buffered
+            messages = list(data.read_messages(Request))
+
+            txs = [m.check_tx.tx for m in messages if m.WhichOneof("value") == "check_tx"]
+            if len(txs) > 1:
+                await self.scheduler.process("prepare_check_tx", txs)
+
+            for message in messages:
+                req_type = message.WhichOneof("value")
+                response = await self.scheduler.process(req_type, message)
+                written = responses.append(response)
+                if req_type == "flush":
+                    responses.flush()
+                    written = True
+                if written:
                     await writer.drain()
-                    # Update start position after processing
-                    start_pos = data.tell()
-
-            # Remove processed data from the buffer
-            remaining_data = data.read()
-            data = BytesIO()
-            data.write(remaining_data)
-            data.seek(0)  # Reset position to start of buffer
+
+        # Nobody is left to read buffered responses
+        responses.discard()
 
         # Shut down if the connection is closed
         await _stop()
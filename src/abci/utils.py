@@ -5,6 +5,8 @@ from io import BytesIO
 import logging, colorlog
 from google.protobuf.message import Message
 
+MaxVarintShift = 70  # A uint64 varint never needs more than 10 bytes
+
 
 def get_logger(name: str) -> logging.Logger:
     """
@@ -69,6 +71,27 @@ def decode_varint(stream: BytesIO) -> int:
     return result
 
 
+def decode_varint_at(buffer: bytearray, pos: int):
+    """
+    Decode a varint in place starting at pos.
+    Returns (value, position after the varint) or None if the buffer
+    does not hold the complete varint yet
+    """
+    shift = 0
+    result = 0
+    end = len(buffer)
+    while pos < end:
+        i = buffer[pos]
+        pos += 1
+        result |= (i & 0x7F) << shift
+        if not (i & 0x80):
+            return result, pos
+        shift += 7
+        if shift >= MaxVarintShift:
+            raise ValueError("Varint too long, stream is corrupted")
+    return None
+
+
 def _read_one(stream: BytesIO) -> int:
     """
     Read 1 byte, converting it into an int
@@ -112,4 +135,55 @@ def read_messages(reader: BytesIO, message_class):
         # Parse the message
         msg = message_class()
         msg.ParseFromString(data)
-        yield msg
\ No newline at end of file
+        yield msg
+
+
+class MessageBuffer:
+    """
+    Receive buffer for length prefixed protobuf messages.
+
+    Incoming bytes are appended to one growable bytearray and consumed
+    through a read cursor. Varints are decoded in place and messages are
+    parsed straight from memoryview slices, so a message is never copied
+    before protobuf sees it. Consumed bytes are only dropped when new data
+    arrives, which moves the (usually small) unparsed tail once.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._cursor = 0
+
+    def __len__(self) -> int:
+        return len(self._buffer) - self._cursor
+
+    def feed(self, data: bytes) -> None:
+        """
+        Append data read from the stream
+        """
+        if self._cursor:
+            del self._buffer[:self._cursor]
+            self._cursor = 0
+        self._buffer += data
+
+    def read_messages(self, message_class):
+        """
+        Return an iterator over the complete messages in the buffer.
+        An incomplete trailing message stays buffered until more data is fed.
+        """
+        buffer = self._buffer
+        while True:
+            header = decode_varint_at(buffer, self._cursor)
+            if header is None:
+                break  # Not enough data to read the length
+
+            length, start = header
+            end = start + length
+            if end > len(buffer):
+                break  # Not enough data to read the full message
+
+            msg = message_class()
+            # Views must be released before the buffer is resized again
+            with memoryview(buffer) as view, view[start:end] as frame:
+                msg.ParseFromString(frame)
+            self._cursor = end
+            yield msg
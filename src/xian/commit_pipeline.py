@@ -0,0 +1,193 @@
+import os
+import time
+import asyncio
+import struct
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from contracting.storage.encoder import encode, decode
+from loguru import logger
+
+# Length and crc32 of the record that follows
+_HEADER = struct.Struct(">II")
+
+
+class WriteAheadLog:
+    """
+    Append-only log of the write sets of committed blocks.
+
+    Every record is framed with its length and crc32 and fsynced before
+    append returns. A torn or corrupt record at the end, left by a crash
+    during an append, ends the log.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        return self._file
+
+    def append(self, record: dict) -> None:
+        data = encode(record).encode()
+        f = self._open()
+        f.write(_HEADER.pack(len(data), zlib.crc32(data)) + data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    def records(self) -> list[dict]:
+        try:
+            with open(self.path, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return []
+
+        records = []
+        offset = 0
+        while offset + _HEADER.size <= len(content):
+            length, crc = _HEADER.unpack_from(content, offset)
+            data = content[offset + _HEADER.size:offset + _HEADER.size + length]
+            if len(data) != length or zlib.crc32(data) != crc:
+                logger.warning(f"Ignoring torn record at offset {offset} of {self.path}")
+                break
+            records.append(decode(data.decode()))
+            offset += _HEADER.size + length
+        return records
+
+    def truncate(self) -> None:
+        f = self._open()
+        f.truncate(0)
+        f.flush()
+        os.fsync(f.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def sync_state_files(driver, since: float) -> int:
+    """
+    fsync the state files of the driver that were modified since the given
+    time. The other stores in the storage directory (snapshots, history,
+    indexes) take care of their own durability.
+    """
+    return sum(sync_directory(path, since) for path in (driver.contract_state, driver.run_state))
+
+
+def sync_directory(path, since: float) -> int:
+    """
+    fsync the files and directories below path that were modified since
+    the given time. Returns the number of synced files.
+    """
+    synced = 0
+    for root, _, files in os.walk(path):
+        for name in [""] + files:
+            file_path = os.path.join(root, name) if name else root
+            try:
+                if os.stat(file_path).st_mtime < since:
+                    continue
+                fd = os.open(file_path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            synced += 1
+    return synced
+
+
+def replay_wal(driver, wal: WriteAheadLog) -> int:
+    """
+    Apply the write sets left in the log by a crash, in order. Writes are
+    absolute values, so replaying blocks that were applied already is
+    harmless. Returns the number of replayed blocks.
+    """
+    started = time.time()
+    records = wal.records()
+    for record in records:
+        for key, value in record["writes"].items():
+            driver.set(key, value)
+        driver.hard_apply(str(record["nanos"]))
+        logger.info(f"Replayed the writes of block {record['height']} from the commit log")
+    if records:
+        # mtime has a coarser resolution than time.time on some filesystems
+        sync_state_files(driver, started - 1)
+        wal.truncate()
+    return len(records)
+
+
+class CommitPipeline:
+    """
+    Commits blocks without waiting for the state writes to reach the store.
+
+    commit appends the block's pending writes to the write-ahead log, which
+    makes the block durable, and applies them to the store on a background
+    thread. Until that is done, the committed state view serves the writes
+    from an overlay. The consensus handlers wait for the apply before they
+    touch the driver again, so the driver is never used by two threads.
+
+    Every checkpoint_interval blocks and at shutdown the state files of
+    the driver written since the last checkpoint are synced and the log is
+    truncated.
+    """
+
+    def __init__(self, driver, wal: WriteAheadLog, committed_state, checkpoint_interval: int = 100):
+        self.driver = driver
+        self.wal = wal
+        self.committed_state = committed_state
+        self.checkpoint_interval = checkpoint_interval
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="commit")
+        self._pending = None
+        self._logged = 0
+        self._checkpointed_at = time.time()
+
+    def commit(self, height: int, nanos: int, after_apply=None) -> None:
+        writes = dict(self.driver.pending_writes)
+        self.wal.append({"height": height, "nanos": nanos, "writes": writes})
+        self._logged += 1
+        self.committed_state.overlay = writes
+        self._pending = self.executor.submit(self._apply, str(nanos), after_apply)
+
+    def _apply(self, nanos: str, after_apply) -> None:
+        self.driver.hard_apply(nanos)
+        if after_apply is not None:
+            after_apply()
+        self.committed_state.overlay = None
+
+        if self._logged >= self.checkpoint_interval:
+            self._checkpoint()
+
+    def _checkpoint(self) -> None:
+        started = time.time()
+        # mtime has a coarser resolution than time.time on some filesystems
+        sync_state_files(self.driver, self._checkpointed_at - 1)
+        self.wal.truncate()
+        self._logged = 0
+        self._checkpointed_at = started
+
+    async def wait(self) -> None:
+        """
+        Wait until the writes of the last commit are applied. A failed
+        apply is raised here, the log replays it on restart.
+        """
+        if self._pending is None:
+            return
+        pending = self._pending
+        await asyncio.wrap_future(pending)
+        if self._pending is pending:
+            self._pending = None
+
+    def shutdown(self) -> None:
+        """
+        Wait for the last apply and checkpoint it, unless it failed and has
+        to be replayed from the log on restart
+        """
+        self.executor.shutdown(wait=True)
+        pending = self._pending
+        if self._logged and (pending is None or pending.exception() is None):
+            self._checkpoint()
+        self.wal.close()
@@ -0,0 +1,116 @@
+import json
+import hashlib
+import sqlite3
+import threading
+
+from contracting.compilation import parser
+from loguru import logger
+
+CODE_SUFFIX = ".__code__"
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha3_256(code.encode()).hexdigest()
+
+
+class ContractIndex:
+    """
+    Methods and variables of the deployed contracts, so that queries do
+    not parse the contract source every time.
+
+    Metadata is computed once per code hash and kept in memory and in a
+    side table. The latest code of every contract is tracked by name from
+    the writes of committed blocks, contracts of other heights are looked
+    up by the hash of their code.
+    """
+
+    def __init__(self, path, state):
+        self.state = state
+        self.db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS contracts ("
+            "code_hash TEXT PRIMARY KEY, methods TEXT NOT NULL, variables TEXT NOT NULL)"
+        )
+        self.lock = threading.Lock()
+        self._by_hash = {}
+        self._by_name = {}
+
+    def _metadata(self, code: str) -> dict:
+        h = code_hash(code)
+        metadata = self._by_hash.get(h)
+        if metadata is not None:
+            return metadata
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT methods, variables FROM contracts WHERE code_hash = ?", (h,)
+            ).fetchone()
+            if row is not None:
+                metadata = {"code_hash": h, "methods": json.loads(row[0]), "variables": json.loads(row[1])}
+            else:
+                metadata = {
+                    "code_hash": h,
+                    "methods": parser.methods_for_contract(code),
+                    "variables": parser.variables_for_contract(code),
+                }
+                self.db.execute(
+                    "INSERT OR REPLACE INTO contracts VALUES (?, ?, ?)",
+                    (h, json.dumps(metadata["methods"]), json.dumps(metadata["variables"]))
+                )
+        self._by_hash[h] = metadata
+        return metadata
+
+    def get(self, name: str, state=None) -> dict | None:
+        """
+        Metadata of a contract in the committed state, or in state
+        """
+        if state is None:
+            metadata = self._by_name.get(name)
+            if metadata is not None:
+                return metadata
+            state = self.state
+        code = state.get_contract(name)
+        if code is None:
+            return None
+        return self._metadata(code)
+
+    def update(self, writes: dict) -> None:
+        """
+        Index the contracts submitted or changed by the writes of a block
+        """
+        for key, value in writes.items():
+            if not key.endswith(CODE_SUFFIX):
+                continue
+            name = key[:-len(CODE_SUFFIX)]
+            if value is None:
+                self._by_name.pop(name, None)
+                continue
+            try:
+                self._by_name[name] = self._metadata(value)
+            except Exception as e:
+                # Left to the queries, which read the code again
+                self._by_name.pop(name, None)
+                logger.warning(f"Failed to index contract {name}: {e}")
+
+    def warm_up(self) -> int:
+        """
+        Index every contract in the committed state, metadata of code seen
+        before comes from the side table
+        """
+        names = [key[:-len(CODE_SUFFIX)] for key in self.state.keys() if key.endswith(CODE_SUFFIX)]
+        count = 0
+        for name in names:
+            code = self.state.get_contract(name)
+            if code is None:
+                continue
+            try:
+                metadata = self._metadata(code)
+            except Exception as e:
+                logger.warning(f"Failed to index contract {name}: {e}")
+                continue
+            # Blocks committed meanwhile have indexed newer code
+            self._by_name.setdefault(name, metadata)
+            count += 1
+        logger.info(f"Indexed {count} contracts")
+        return count
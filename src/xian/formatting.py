@@ -1,11 +1,16 @@
 import re
 
 
+IDENTIFIER_PATTERN = re.compile(r'^[a-zA-Z][a-zA-Z0-9_]*$')
+CONTRACT_NAME_PATTERN = re.compile(r'^con_[a-zA-Z][a-zA-Z0-9_]*$')
+
+
 def vk_is_formatted(s: str):
     try:
-        int(s, 16)
+        # The cheap length check first, most junk fails it
         if len(s) != 64:
             return False
+        int(s, 16)
         return True
     except ValueError:
         return False
@@ -15,9 +20,9 @@ def vk_is_formatted(s: str):
 
 def signature_is_formatted(s: str):
     try:
-        int(s, 16)
         if len(s) != 128:
             return False
+        int(s, 16)
         return True
     except ValueError:
         return False
@@ -26,8 +31,12 @@ def signature_is_formatted(s: str):
     
 
 def identifier_is_formatted(s: str):
+    # Fast path for plain ASCII identifiers, everything else is left to
+    # the pattern (which, among others, also accepts a trailing newline)
+    if type(s) is str and s.isascii() and s.isidentifier() and s[0] != '_':
+        return True
     try:
-        iden = re.match(r'^[a-zA-Z][a-zA-Z0-9_]*$', s)
+        iden = IDENTIFIER_PATTERN.match(s)
         if iden is None:
             return False
         return True
@@ -56,7 +65,7 @@ def cid_id_formated(s: str):
 
 def contract_name_is_formatted(s: str):
     try:
-        func = re.match(r'^con_[a-zA-Z][a-zA-Z0-9_]*$', s)
+        func = CONTRACT_NAME_PATTERN.match(s)
         if func is None:
             return False
         return True
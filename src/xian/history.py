@@ -0,0 +1,169 @@
+import sqlite3
+import threading
+
+from contracting.storage.encoder import encode, decode
+from loguru import logger
+
+
+class StateHistory:
+    """
+    Versions of the committed state for the last heights.
+
+    Before the writes of a block are applied, record stores the value
+    every written key had before the block, None for keys that did not
+    exist. The value of a key at height H is the prior value of its first
+    change above H, or the current value if it has not changed since.
+    Current state needs no lookup and the store grows with the writes,
+    not with the size of the state.
+
+    With keep_heights, changes that no queryable height needs any more
+    are compacted away, without it every height stays queryable.
+    """
+
+    def __init__(self, path, keep_heights: int = 0):
+        self.path = str(path)
+        self.keep_heights = keep_heights
+        self.db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            "key TEXT NOT NULL, height INTEGER NOT NULL, prior TEXT, PRIMARY KEY (key, height))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS changes_height ON changes (height)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)")
+        self.lock = threading.RLock()
+        # Queryable heights, None until the first block is recorded
+        self.earliest = self._get_meta("earliest")
+        self.height = self._get_meta("height")
+
+    def _get_meta(self, name, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return default if row is None else row[0]
+
+    def _set_meta(self, name, value) -> None:
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (name, value))
+
+    def record(self, height: int, keys, state) -> None:
+        """
+        Record the values that the writes of the block at height overwrite,
+        state holds the committed state of the previous height
+        """
+        rows = []
+        for key in keys:
+            prior = state.get(key)
+            rows.append((key, height, None if prior is None else encode(prior)))
+
+        with self.lock:
+            earliest = height - 1 if self.earliest is None else self.earliest
+            if self.keep_heights:
+                earliest = max(earliest, height - self.keep_heights)
+            self.db.execute("BEGIN")
+            try:
+                self.db.executemany("INSERT OR REPLACE INTO changes VALUES (?, ?, ?)", rows)
+                if earliest != self.earliest:
+                    # Heights up to earliest are served without these
+                    self.db.execute("DELETE FROM changes WHERE height <= ?", (earliest,))
+                    self._set_meta("earliest", earliest)
+                self._set_meta("height", height)
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+            self.earliest = earliest
+            self.height = height
+
+    def truncate(self, height: int) -> None:
+        """
+        Forget the changes above height, recorded for blocks that never
+        made it into the store
+        """
+        with self.lock:
+            if self.height is None or self.height <= height:
+                return
+            self.db.execute("BEGIN")
+            self.db.execute("DELETE FROM changes WHERE height > ?", (height,))
+            self._set_meta("height", height)
+            self.db.execute("COMMIT")
+            self.height = height
+            logger.info(f"Dropped state history above height {height}")
+
+    def check_height(self, height: int) -> None:
+        if self.height is None or not self.earliest <= height <= self.height:
+            raise ValueError(f"No state history for height {height}")
+
+    def get(self, key: str, height: int, state):
+        with self.lock:
+            self.check_height(height)
+            row = self.db.execute(
+                "SELECT prior FROM changes WHERE key = ? AND height > ? ORDER BY height LIMIT 1",
+                (key, height)
+            ).fetchone()
+        if row is None:
+            return state.get(key)
+        return None if row[0] is None else decode(row[0])
+
+    def keys(self, prefix: str, height: int, state) -> list:
+        with self.lock:
+            self.check_height(height)
+            # The prior value of the first change of every key above height
+            rows = self.db.execute(
+                "SELECT key, prior, MIN(height) FROM changes "
+                "WHERE height > ? AND substr(key, 1, ?) = ? GROUP BY key",
+                (height, len(prefix), prefix)
+            ).fetchall()
+        keys = set(state.keys(prefix))
+        for key, prior, _ in rows:
+            if prior is None:
+                keys.discard(key)
+            else:
+                keys.add(key)
+        return sorted(keys)
+
+    def at(self, height: int, state) -> "HistoricalState":
+        self.check_height(height)
+        return HistoricalState(self, height, state)
+
+    def rollback(self, height: int, driver, nanos: str) -> int:
+        """
+        Restore the state of height in the driver and drop the history
+        above it. Returns the number of keys that changed.
+        """
+        with self.lock:
+            self.check_height(height)
+            rows = self.db.execute(
+                "SELECT key, prior, MIN(height) FROM changes WHERE height > ? GROUP BY key",
+                (height,)
+            ).fetchall()
+            for key, prior, _ in rows:
+                driver.set(key, None if prior is None else decode(prior))
+            driver.hard_apply(nanos)
+            self.truncate(height)
+        logger.info(f"Rolled the state back to height {height}, {len(rows)} keys changed")
+        return len(rows)
+
+
+class HistoricalState:
+    """
+    Read-only view of the committed state at a past height, with the
+    reading interface of CommittedState
+    """
+
+    def __init__(self, history: StateHistory, height: int, state):
+        self.history = history
+        self.height = height
+        self.state = state
+
+    def get(self, key: str):
+        return self.history.get(key, self.height, self.state)
+
+    def keys(self, prefix: str = ""):
+        return self.history.keys(prefix, self.height, self.state)
+
+    def get_many(self, keys) -> dict:
+        return {key: self.get(key) for key in keys}
+
+    def get_var(self, contract, variable, arguments=[], mark=False):
+        return self.get(self.state.make_key(contract, variable, arguments))
+
+    def get_contract(self, name: str):
+        return self.get_var(name, "__code__")
@@ -0,0 +1,77 @@
+import sqlite3
+import threading
+
+from loguru import logger
+
+# Sorts after every character a key can continue a prefix with
+_PREFIX_END = "\U0010ffff"
+
+
+class KeyIndex:
+    """
+    Sorted index of the keys of the committed state.
+
+    Kept in sqlite next to the state and updated with the writes of every
+    committed block. A scan walks the keys of a prefix in order from a
+    cursor, reading from the database as it goes, so no prefix is ever
+    loaded as a whole.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY) WITHOUT ROWID")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)")
+        self.lock = threading.Lock()
+        row = self.db.execute("SELECT value FROM meta WHERE name = 'height'").fetchone()
+        self.height = -1 if row is None else row[0]
+
+    def _write(self, inserts, deletes, height: int, clear: bool = False) -> None:
+        with self.lock:
+            self.db.execute("BEGIN")
+            try:
+                if clear:
+                    self.db.execute("DELETE FROM keys")
+                self.db.executemany("INSERT OR IGNORE INTO keys VALUES (?)", ((key,) for key in inserts))
+                self.db.executemany("DELETE FROM keys WHERE key = ?", ((key,) for key in deletes))
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('height', ?)", (height,))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+            self.height = height
+
+    def update(self, writes: dict, height: int) -> None:
+        self._write(
+            [key for key, value in writes.items() if value is not None],
+            [key for key, value in writes.items() if value is None],
+            height
+        )
+
+    def rebuild(self, keys, height: int) -> None:
+        self._write(keys, [], height, clear=True)
+        logger.info(f"Built key index at height {height}")
+
+    def scan(self, prefix: str, after: str = None, limit: int = None):
+        """
+        Keys starting with prefix, in order, after the cursor key
+        """
+        start = prefix if after is None or after < prefix else after
+        batch = 500 if limit is None else min(limit, 500)
+        remaining = limit
+        inclusive = after is None or after < prefix
+        while remaining is None or remaining > 0:
+            size = batch if remaining is None else min(batch, remaining)
+            with self.lock:
+                rows = self.db.execute(
+                    f"SELECT key FROM keys WHERE key {'>=' if inclusive else '>'} ? AND key < ? "
+                    f"ORDER BY key LIMIT ?",
+                    (start, prefix + _PREFIX_END, size)
+                ).fetchall()
+            for (key,) in rows:
+                yield key
+            if len(rows) < size:
+                return
+            start, inclusive = rows[-1][0], False
+            if remaining is not None:
+                remaining -= len(rows)
@@ -1,27 +1,64 @@
 from cometbft.abci.v1beta3.types_pb2 import ResponseCheckTx
 from xian.utils.tx import (
-    validate_transaction
-)
-from xian.utils.tx import (
-    verify,
-    unpack_transaction
+    check_tx_formatting,
+    validate_transaction_state,
 )
 from xian.utils.encoding import decode_transaction_bytes
 from xian.constants import Constants as c
 
-import json
-
 
 async def check_tx(self, raw_tx) -> ResponseCheckTx:
+    cached = None
+    tx_hash = self.tx_cache.key(raw_tx)
     try:
-        tx, payload_str = decode_transaction_bytes(raw_tx)
-        validate_transaction(self.client,self.nonce_storage,tx)
-        sender, signature, payload = unpack_transaction(tx)
-        if not verify(sender, payload_str, signature):
+        # Decoding, formatting and the signature only depend on the tx bytes,
+        # rechecks of a cached tx skip straight to the state checks
+        cached = self.tx_cache.get(raw_tx)
+        if cached is None:
+            tx, payload_str = decode_transaction_bytes(raw_tx)
+            check_tx_formatting(tx)
+            signature_valid = self.signature_verifier.verify(
+                tx["payload"]["sender"], payload_str, tx["metadata"]["signature"]
+            )
+            cached = self.tx_cache.add(raw_tx, tx, payload_str, signature_valid)
+
+        if not cached.signature_valid:
             return ResponseCheckTx(code=c.ErrorCode, log="Bad signature")
-        payload_json = json.loads(payload)
-        if payload_json["chain_id"] != self.chain_id:
+        if cached.tx["payload"]["chain_id"] != self.chain_id:
             return ResponseCheckTx(code=c.ErrorCode, log="Wrong chain_id")
+
+        self.pending_nonces.check_nonce(cached.tx, tx_hash)
+        validate_transaction_state(self.committed_parameters, cached.tx)
+        self.pending_nonces.add(cached.tx, tx_hash)
         return ResponseCheckTx(code=c.OkCode)
     except Exception as e:
+        # A tx failing its recheck leaves the mempool, its nonce is free again
+        if cached is not None:
+            self.pending_nonces.discard(cached.tx, tx_hash)
         return ResponseCheckTx(code=c.ErrorCode, log=f"{type(e).__name__}: {e}")
+
+
+async def prepare_check_tx(self, raw_txs) -> None:
+    """
+    Verify the signatures of pipelined CheckTx requests as one parallel
+    batch and put the verdicts into the tx cache for check_tx
+    """
+    pending = []
+    for raw_tx in raw_txs:
+        if self.tx_cache.get(raw_tx) is not None:
+            continue
+        try:
+            tx, payload_str = decode_transaction_bytes(raw_tx)
+            check_tx_formatting(tx)
+        except Exception:
+            # check_tx reports the error for this tx
+            continue
+        pending.append((raw_tx, tx, payload_str))
+
+    verdicts = self.signature_verifier.verify_many([
+        (tx["payload"]["sender"], payload_str, tx["metadata"]["signature"])
+        for _, tx, payload_str in pending
+    ])
+
+    for (raw_tx, tx, payload_str), signature_valid in zip(pending, verdicts):
+        self.tx_cache.add(raw_tx, tx, payload_str, signature_valid)
@@ -1,20 +1,52 @@
 from cometbft.abci.v1beta3.types_pb2 import ResponseCommit
-from xian.utils.block import (
-    set_latest_block_hash,
-    set_latest_block_height
-)
+from xian.upgrades import STATE_ROOT
 
 
 async def commit(self) -> ResponseCommit:
-    set_latest_block_hash(self.merkle_root_hash)
-    set_latest_block_height(self.current_block_meta["height"])
-
-    self.client.raw_driver.hard_apply(str(self.current_block_meta["nanos"]))
+    height = self.current_block_meta["height"]
+    # Written with the state of the block, the file follows once it is applied
+    self.block_metadata.stage(self.merkle_root_hash, self.current_block_meta["height"])
+    if self.snapshot_store is not None:
+        # A snapshot that is still being written keeps the values it needs
+        self.snapshot_store.preserve(self.client.raw_driver.pending_writes)
+    if self.state_history is not None:
+        self.state_history.record(height, self.client.raw_driver.pending_writes, self.committed_state)
+    writes = dict(self.client.raw_driver.pending_writes)
+    # Readers of several keys see either all writes of the block or none
+    with self.committed_state.lock:
+        if self.commit_pipeline is not None:
+            # Durable once logged, the store is written in the background
+            self.commit_pipeline.commit(
+                self.current_block_meta["height"],
+                self.current_block_meta["nanos"],
+                after_apply=self.block_metadata.persist
+            )
+        else:
+            self.client.raw_driver.hard_apply(str(self.current_block_meta["nanos"]))
+    if self.commit_pipeline is None:
+        self.block_metadata.persist()
+    if self.state_tree is not None:
+        self.state_tree.commit(self.current_block_meta["height"])
+    if self.key_index is not None:
+        self.key_index.update(writes, height)
+    self.pending_nonces.commit(self.block_nonces)
+    self.validator_handler.commit()
+    self.committed_parameters.clear()
+    # Inclusion proofs of the committed block for /app_hash_proof
+    self.committed_app_hash_tree = self.app_hash_tree
+    self.contract_index.update(writes)
+    if self.query_cache is not None:
+        # Everything queries read is updated now
+        self.query_cache.invalidate(writes)
+    if self.snapshot_store is not None and height % self.snapshot_interval == 0:
+        take_snapshot(self)
 
     # unset current_block_meta & cleanup
     self.fingerprint_hashes = []
     self.merkle_root_hash = None
+    self.app_hash_tree = None
     self.current_block_rewards = {}
+    self.block_nonces = {}
 
     retain_height = 0 
     if self.pruning_enabled:
@@ -24,3 +56,17 @@ async def commit(self) -> ResponseCommit:
     self.current_block_meta = None
 
     return ResponseCommit(retain_height=retain_height)
+
+
+def take_snapshot(self) -> None:
+    state_proof = None
+    if self.app_hash_tree is not None:
+        # The state root is a leaf of the app hash once it is part of it
+        state_proof = self.app_hash_tree.proof_for(STATE_ROOT)
+    self.snapshot_store.take(
+        self.committed_state,
+        self.current_block_meta["height"],
+        self.merkle_root_hash,
+        self.current_block_meta["nanos"],
+        state_proof=state_proof
+    )
@@ -10,8 +10,10 @@ from xian.utils.hash import (
     hash_list,
     hash_from_rewards
 )
+from xian.utils.merkle import MerkleAccumulator
+from xian.upgrades import MERKLE_APP_HASH, STATE_ROOT, BATCHED_REWARDS
+from xian.rewards import RewardLedger
 from xian.utils.block import (
-    get_latest_block_hash,
     get_nanotime_from_block_time,
     convert_cometbft_time_to_datetime
 )
@@ -23,24 +25,136 @@ from xian.utils.encoding import (
 )
 from loguru import logger
 
+class BlockExecution:
+    """
+    Result of executing the txs of a block. The state writes are left
+    pending in the driver, everything else FinalizeBlock needs is kept here
+    so that an execution can be thrown away before the block is decided.
+    """
+
+    def __init__(self, block_meta: dict, block_datetime):
+        self.block_meta = block_meta
+        self.block_datetime = block_datetime
+        self.tx_results = []
+        self.bds_txs = []
+        self.fingerprint_hashes = []
+        self.block_nonces = {}
+        self.nodes_changed = False
+        self.previous_app_hash = None
+        self.tx_count = 0
+        self.app_hash = None
+        # Merkle tree over the fingerprint hashes, once the upgrade is active
+        self.app_hash_tree = None
+
+    def add_fingerprint(self, fingerprint: str, key=None) -> None:
+        self.fingerprint_hashes.append(fingerprint)
+        if self.app_hash_tree is not None:
+            self.app_hash_tree.append(fingerprint.encode(), key=key)
+
+    def compute_app_hash(self) -> bytes:
+        # No transactions = no rewards / no change to ABCI state, use previous block hash.
+        if self.tx_count == 0:
+            self.app_hash = self.previous_app_hash
+            self.app_hash_tree = None
+        elif self.app_hash_tree is not None:
+            self.app_hash = self.app_hash_tree.root().hex().encode("utf-8")
+        else:
+            self.app_hash = hash_list(self.fingerprint_hashes)
+        return self.app_hash
+
+
 async def finalize_block(self, req) -> ResponseFinalizeBlock:
-    nanos = get_nanotime_from_block_time(req.time)
+    height = req.height
     hash = convert_binary_to_hex(req.hash)
+    await self.wait_for_commit()
+
+    for tx_bytes in req.txs:
+        # Included txs leave the mempool and will not be rechecked
+        self.tx_cache.discard(tx_bytes)
+
+    execution = None
+    if self.optimistic_execution.pending:
+        execution = await self.optimistic_execution.take(height, hash)
+        if execution is None:
+            # A different block was decided, drop what the proposal wrote
+            discard_block_execution(self)
+        else:
+            logger.debug(f"Using optimistic execution of block {height}")
+
+    if execution is None:
+        execution = await execute_block(self, req.txs, hash, height, req.time)
+
+    # The validator set lives in memory, it is only updated for the decided block
+    validator_updates = self.validator_handler.build_validator_updates(height, execution.nodes_changed)
+
+    # Every write of the block is pending now, including the validator set
+    if self.state_tree is not None:
+        state_root = self.state_tree.stage(self.client.raw_driver.pending_writes)
+        if self.upgrades.is_active(STATE_ROOT, height):
+            execution.add_fingerprint(state_root.hex(), key=STATE_ROOT)
+
+    self.current_block_meta = execution.block_meta
+    self.fingerprint_hashes = execution.fingerprint_hashes
+    self.block_nonces = execution.block_nonces
+    self.merkle_root_hash = execution.compute_app_hash()
+    self.app_hash_tree = execution.app_hash_tree
+    if execution.tx_count == 0:
+        # An empty block keeps the app hash of the last block with txs, and
+        # the tree it is the root of, for proofs and snapshots
+        self.app_hash_tree = self.committed_app_hash_tree
+
+    # Save data to BDS - Add tx data to batch, then process batch
+    if self.block_service_mode:
+        for tx_bytes, tx, result in execution.bds_txs:
+            cometbft_hash = hash_bytes(tx_bytes).upper()
+            result["tx_result"]["hash"] = cometbft_hash
+            asyncio.create_task(self.bds.add_to_batch(tx | result, execution.block_datetime))
+        asyncio.create_task(self.bds.commit_batch())
+
+    return ResponseFinalizeBlock(
+        validator_updates=validator_updates,
+        tx_results=execution.tx_results,
+        app_hash=execution.app_hash
+    )
+
+
+def discard_block_execution(self) -> None:
+    """
+    Drop the pending state writes of a block execution that will not be
+    committed
+    """
+    self.client.raw_driver.flush_cache()
+    self.block_parameters.clear()
+
+
+async def execute_block(self, txs, block_hash: str, height: int, time) -> BlockExecution:
+    """
+    Execute the txs of a block on top of the committed state. Apart from
+    the pending state writes, the app is left untouched.
+    """
+    nanos = get_nanotime_from_block_time(time)
     block_datetime = convert_cometbft_time_to_datetime(nanos)
-    height = req.height
-    tx_results = []
-    reward_writes = []
-    latest_block_hash = get_latest_block_hash()
-    self.fingerprint_hashes.append(latest_block_hash.hex())
+    latest_block_hash = self.block_metadata.hash
 
-    self.current_block_meta = {
+    execution = BlockExecution({
         "nanos": nanos,
         "height": height,
-        "hash": hash,
+        "hash": block_hash,
         "chain_id": self.chain_id
-    }
+    }, block_datetime)
+    if self.upgrades.is_active(MERKLE_APP_HASH, height):
+        execution.app_hash_tree = MerkleAccumulator()
+    execution.previous_app_hash = latest_block_hash
+    execution.tx_count = len(txs)
+    execution.add_fingerprint(latest_block_hash.hex())
+    reward_writes = []
 
-    for tx_bytes in req.txs:
+    self.block_parameters.clear()
+    # Tx rewards are summed up and paid once at the end of the block
+    self.rewards_handler.ledger = RewardLedger() if self.upgrades.is_active(BATCHED_REWARDS, height) else None
+
+    block_txs = []
+    for tx_bytes in txs:
         try:
             tx, payload_str = decode_transaction_bytes(tx_bytes)
         except Exception as e:
@@ -48,22 +162,49 @@ async def finalize_block(self, req) -> ResponseFinalizeBlock:
             continue
 
         # Attach metadata to the transaction
-        tx["b_meta"] = self.current_block_meta
+        tx["b_meta"] = execution.block_meta
+        block_txs.append((tx_bytes, tx))
 
-        try:
-            result = self.tx_processor.process_tx(
-                tx,
-                enabled_fees=self.enable_tx_fee,
-                rewards_handler=self.rewards_handler
+    # Execute the txs speculatively in parallel, results are still committed in block order
+    speculative_results = [None] * len(block_txs)
+    parallel_block = None
+    if self.parallel_executor is not None:
+        block_tx_list = [tx for _, tx in block_txs]
+        if self.parallel_executor.should_speculate(block_tx_list):
+            speculative_results = await self.parallel_executor.speculate(
+                block_tx_list,
+                [self.tx_processor.get_environment(tx=tx) for tx in block_tx_list],
+                metering=self.enable_tx_fee
             )
+            parallel_block = self.parallel_executor.block()
+
+    for (tx_bytes, tx), speculative_result in zip(block_txs, speculative_results):
+        try:
+            if parallel_block is not None:
+                result = parallel_block.process_tx(
+                    tx,
+                    speculative_result,
+                    self.tx_processor,
+                    enabled_fees=self.enable_tx_fee,
+                    rewards_handler=self.rewards_handler
+                )
+            else:
+                result = self.tx_processor.process_tx(
+                    tx,
+                    enabled_fees=self.enable_tx_fee,
+                    rewards_handler=self.rewards_handler
+                )
         except Exception as e:
             logger.error(f"Error processing tx: {e}")
             # Skip this transaction
             continue
 
         self.nonce_storage.set_nonce_by_tx(tx)
+        execution.block_nonces[tx["payload"]["sender"]] = tx["payload"]["nonce"]
+        if any(write["key"] == "masternodes.nodes" for write in result["tx_result"]["state"]):
+            execution.nodes_changed = True
         tx_hash = result["tx_result"]["hash"]
-        self.fingerprint_hashes.append(tx_hash)
+        execution.add_fingerprint(tx_hash, key=tx_hash)
         parsed_tx_result = json.dumps(stringify_decimals(result["tx_result"]))
         logger.debug(f"Parsed tx result: {parsed_tx_result}")
 
@@ -91,7 +232,7 @@ async def finalize_block(self, req) -> ResponseFinalizeBlock:
                     attributes=state_changes
                 ))
 
-        tx_results.append(
+        execution.tx_results.append(
             ExecTxResult(
                 code=result["tx_result"]["status"],
                 data=parsed_tx_result.encode(),
@@ -100,15 +241,18 @@ async def finalize_block(self, req) -> ResponseFinalizeBlock:
             )
         )
 
-        # Save data to BDS - Add tx data to batch
         if self.block_service_mode:
-            cometbft_hash = hash_bytes(tx_bytes).upper()
-            result["tx_result"]["hash"] = cometbft_hash
-            asyncio.create_task(self.bds.add_to_batch(tx | result, block_datetime))
+            execution.bds_txs.append((tx_bytes, tx, result))
 
-    # Save data to BDS - Process batch
-    if self.block_service_mode:
-        asyncio.create_task(self.bds.commit_batch())
+    if parallel_block is not None:
+        logger.debug(
+            f"Parallel execution: {parallel_block.reused} of {len(block_txs)} txs "
+            f"used their speculative result, {parallel_block.executed} executed again"
+        )
+
+    if self.rewards_handler.ledger is not None:
+        reward_writes.append(self.rewards_handler.ledger.apply(self.client.raw_driver))
+        self.rewards_handler.ledger = None
 
     if self.static_rewards:
         try:
@@ -120,15 +264,6 @@ async def finalize_block(self, req) -> ResponseFinalizeBlock:
             logger.error(f"STATIC REWARD ERROR: {e} for block")
 
     reward_hash = hash_from_rewards(reward_writes)
-    validator_updates = self.validator_handler.build_validator_updates(height)
-    
-    self.fingerprint_hashes.append(reward_hash)
-    
-    # No transactions = no rewards / no change to ABCI state, use previous block hash.
-    self.merkle_root_hash = latest_block_hash if len(req.txs) == 0 else hash_list(self.fingerprint_hashes)
+    execution.add_fingerprint(reward_hash)
 
-    return ResponseFinalizeBlock(
-        validator_updates=validator_updates,
-        tx_results=tx_results,
-        app_hash=self.merkle_root_hash
-    )
+    return execution
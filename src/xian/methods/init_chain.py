@@ -1,12 +1,21 @@
 from cometbft.abci.v1beta3.types_pb2 import ResponseInitChain
-from xian.utils.block import set_latest_block_hash, store_genesis_block
+from xian.utils.block import store_genesis_block
 
 import asyncio
 
 
 async def init_chain(self, req) -> ResponseInitChain:
     abci_genesis_state = self.genesis["abci_genesis"]
-    set_latest_block_hash(bytes.fromhex(abci_genesis_state["hash"]))
-    asyncio.ensure_future(store_genesis_block(self.client, self.nonce_storage, abci_genesis_state))
+    self.block_metadata.set(h=bytes.fromhex(abci_genesis_state["hash"]))
+    self.validator_handler.init_validators(req.validators)
+    asyncio.ensure_future(store_genesis(self, abci_genesis_state))
 
     return ResponseInitChain()
+
+
+async def store_genesis(self, abci_genesis_state: dict):
+    await store_genesis_block(self.client, self.nonce_storage, abci_genesis_state)
+    # The genesis state is applied without going through a block
+    self.sync_state_tree(0, force=True)
+    self.sync_key_index(0, force=True)
+    self.contract_index.warm_up()
@@ -2,5 +2,6 @@ from cometbft.abci.v1beta2.types_pb2 import ResponsePrepareProposal
 
 
 async def prepare_proposal(self, req) -> ResponsePrepareProposal:
-    response = ResponsePrepareProposal(txs=req.txs)
+    txs = self.proposal_builder.build(list(req.txs), req.max_tx_bytes)
+    response = ResponsePrepareProposal(txs=txs)
     return response
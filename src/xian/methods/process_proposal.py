@@ -1,7 +1,24 @@
 from cometbft.abci.v1beta2.types_pb2 import ResponseProcessProposal
+from xian.methods.finalize_block import execute_block, discard_block_execution
+from xian.utils.encoding import convert_binary_to_hex
 
 
 async def process_proposal(self, req) -> ResponseProcessProposal:
+    if self.optimistic_execution_enabled:
+        await self.wait_for_commit()
+        # A proposal of a later round replaces the one executed before
+        if self.optimistic_execution.pending:
+            await self.optimistic_execution.discard()
+            discard_block_execution(self)
+
+        block_hash = convert_binary_to_hex(req.hash)
+        # Runs in its own thread while the response is sent, FinalizeBlock waits for it
+        self.optimistic_execution.start(
+            req.height,
+            block_hash,
+            execute_block(self, list(req.txs), block_hash, req.height, req.time)
+        )
+
     response = ResponseProcessProposal()
     response.status = ResponseProcessProposal.ProposalStatus.ACCEPT
     return response
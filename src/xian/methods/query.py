@@ -1,15 +1,20 @@
 import json
-import socket
-import struct
+import heapq
 
 from cometbft.abci.v1beta1.types_pb2 import ResponseQuery
+from cometbft.crypto.v1.proof_pb2 import ProofOp, ProofOps
+from xian.state_tree import PROOF_OP_TYPE
+from xian.query_cache import query_kind
 from xian.utils.encoding import encode_str
 from xian.constants import Constants as c
 from contracting.stdlib.bridge.decimal import ContractingDecimal
-from contracting.compilation import parser
 from contracting.storage.encoder import Encoder
 from loguru import logger
 
+SCAN_LIMIT = 100
+MAX_SCAN_LIMIT = 1000
+GET_MANY_MAX_KEYS = 100
+
 
 async def query(self, req) -> ResponseQuery:
     """
@@ -17,39 +22,116 @@ async def query(self, req) -> ResponseQuery:
     Request Ex. http://localhost:26657/abci_query?path="path"
     (Yes you need to quote the path)
     """
+    cache = self.query_cache
+    if cache is None or req.prove:
+        return await run_query(self, req)
+
+    path_parts = [part for part in req.path.split("/") if part]
+    # http://localhost:26657/abci_query?path="/cache_stats"
+    if path_parts == ["cache_stats"]:
+        return ResponseQuery(
+            code=c.OkCode,
+            value=encode_str(json.dumps(cache.stats())),
+            info="str",
+            key=encode_str("")
+        )
+
+    # The latest height is the same entry whatever number it is asked by
+    historical = bool(req.height) and req.height != self.block_metadata.height
+    kind = query_kind(path_parts, historical)
+    if kind is None:
+        return await run_query(self, req)
+
+    cache_key = ("/".join(path_parts), req.height if historical else 0)
+    res, generation = cache.get(cache_key)
+    if res is None:
+        res = await run_query(self, req)
+        if res.code == c.OkCode:
+            cache.put(cache_key, res, *kind, generation=generation)
+    return res
 
+
+async def run_query(self, req) -> ResponseQuery:
     logger.debug(req.path)
     path_parts = [part for part in req.path.split("/") if part]
     key = path_parts[1] if len(path_parts) > 1 else ""
     result = None
+    proof_ops = None
+    height = 0
     try:
+        state = self.committed_state
+        # State at a past height, from the state history
+        if req.height and req.height != self.block_metadata.height:
+            if self.state_history is None:
+                raise ValueError("Queries at past heights need the state history")
+            state = self.state_history.at(req.height, self.committed_state)
+            height = req.height
+
         # http://localhost:26657/abci_query?path="/get/currency.balances:c93dee52d7dc6cc43af44007c3b1dae5b730ccf18a9e6fb43521f8e4064561e6"
         if path_parts and path_parts[0] == "get":
-            result = self.client.raw_driver.get(path_parts[1])
+            result = state.get(path_parts[1])
+            # Proof of the value against the state root of the committed height
+            if req.prove and self.state_tree is not None and state is self.committed_state:
+                proof = self.state_tree.prove(path_parts[1])
+                height = proof["height"]
+                proof_ops = ProofOps(ops=[ProofOp(
+                    type=PROOF_OP_TYPE,
+                    key=encode_str(path_parts[1]),
+                    data=encode_str(json.dumps(proof))
+                )])
+
+        # Values of several keys from the same height, keys separated by
+        # commas, as a hex encoded JSON list or as a JSON list in data
+        # http://localhost:26657/abci_query?path="/get_many/currency.balances:alice,currency.balances:bob"
+        elif path_parts[0] == "get_many":
+            keys = parse_key_list(path_parts[1] if len(path_parts) > 1 else "", req.data)
+            max_keys = self.cometbft_config["xian"].get("get_many_max_keys", GET_MANY_MAX_KEYS)
+            if len(keys) > max_keys:
+                raise ValueError(f"get_many reads at most {max_keys} keys")
+            result = state.get_many(keys)
 
         # http://localhost:26657/abci_query?path="/health"
         elif path_parts[0] == "health":
             result = "OK"
         # http://localhost:26657/abci_query?path="/get_next_nonce/ddd326fddb5d1677595311f298b744a4e9f415b577ac179a6afbf38483dc0791"
         elif path_parts[0] == "get_next_nonce":
-            result = self.nonce_storage.get_next_nonce(path_parts[1])
+            result = self.pending_nonces.get_next_nonce(path_parts[1])
+
+        # Inclusion proof of a tx of the latest block in its app hash
+        # http://localhost:26657/abci_query?path="/app_hash_proof/f39b4ea880088cfae45538acb2f7fdae1e70112185a5523d1027bcf74eac3919"
+        elif path_parts[0] == "app_hash_proof":
+            tree = self.committed_app_hash_tree
+            if tree is not None:
+                result = tree.proof_for(path_parts[1])
 
         # http://localhost:26657/abci_query?path="/contract/con_some_contract"
         elif path_parts[0] == "contract":
-            result = self.client.raw_driver.get_contract(path_parts[1])
+            result = state.get_contract(path_parts[1])
 
         # http://localhost:26657/abci_query?path="/contract_methods/con_some_contract"
         elif path_parts[0] == "contract_methods":
-            contract_code = self.client.raw_driver.get_contract(path_parts[1])
-            if contract_code is not None:
-                funcs = parser.methods_for_contract(contract_code)
-                result = {"methods": funcs}
+            metadata = self.contract_index.get(path_parts[1], None if state is self.committed_state else state)
+            if metadata is not None:
+                result = {"methods": metadata["methods"]}
 
         # http://localhost:26657/abci_query?path="/contract_vars/con_some_contract"
         elif path_parts[0] == "contract_vars":
-            contract_code = self.client.raw_driver.get_contract(path_parts[1])
-            if contract_code is not None:
-                result = parser.variables_for_contract(contract_code)
+            metadata = self.contract_index.get(path_parts[1], None if state is self.committed_state else state)
+            if metadata is not None:
+                result = metadata["variables"]
+
+        # Keys and values of a prefix in order, from the key after the cursor
+        # http://localhost:26657/abci_query?path="/scan/currency.balances/after=currency.balances:ee06a34c/limit=100"
+        elif path_parts[0] == "scan":
+            params = dict(part.split("=", 1) for part in path_parts[2:] if "=" in part)
+            limit = int(params.get("limit", SCAN_LIMIT))
+            if not 0 < limit <= MAX_SCAN_LIMIT:
+                raise ValueError(f"limit has to be between 1 and {MAX_SCAN_LIMIT}")
+            items = [
+                [k, state.get(k)] for k in scan_keys(self, state, path_parts[1], params.get("after"), limit)
+            ]
+            # Cursor of the next page
+            result = {"items": items, "next": items[-1][0] if len(items) == limit else None}
 
         # http://localhost:26657/abci_query?path="/ping"
         elif path_parts[0] == "ping":
@@ -82,95 +164,53 @@ async def query(self, req) -> ResponseQuery:
                 except (ValueError, TypeError):
                     offset = 0
 
-            # http://localhost:26657/abci_query?path="/keys/currency.balances"    
+            # Pages of limit keys without the variable name, next is the
+            # cursor of the following page, None after the last one
+            # http://localhost:26657/abci_query?path="/keys/currency.balances"
+            # http://localhost:26657/abci_query?path="/keys/currency.balances/after=currency.balances:ee06a34c/limit=100"
             if path_parts[0] == "keys":
-                list_of_keys = self.client.raw_driver.keys(path_parts[1])
-                result = [key.split(":")[1] for key in list_of_keys]
+                list_of_keys = list(scan_keys(self, state, path_parts[1], params.get("after"), limit))
+                result = {
+                    "keys": [k.split(":", 1)[1] if ":" in k else k for k in list_of_keys],
+                    "next": list_of_keys[-1] if len(list_of_keys) == limit else None
+                }
                 key = path_parts[1]
 
             # http://localhost:26657/abci_query?path="/state/currency.balances"
             elif path_parts[0] == "state":
-                result = await self.bds.get_state(key, limit, offset)
+                result = await self.on_app_loop(self.bds.get_state(key, limit, offset))
 
             # http://localhost:26657/abci_query?path="/state_history/currency.balances:ee06a34cf08bf72ce592d26d36b90c79daba2829ba9634992d034318160d49f9/limit=10/offset=20"
             elif path_parts[0] == "state_history":
-                result = await self.bds.get_state_history(key, limit, offset)
+                result = await self.on_app_loop(self.bds.get_state_history(key, limit, offset))
 
             # http://localhost:26657/abci_query?path="/state_for_tx/f39b4ea880088cfae45538acb2f7fdae1e70112185a5523d1027bcf74eac3919"
             elif path_parts[0] == "state_for_tx":
-                result = await self.bds.get_state_for_tx(key)
+                result = await self.on_app_loop(self.bds.get_state_for_tx(key))
 
             # Block Height: http://localhost:26657/abci_query?path="/state_for_block/662"
             # Block Hash: http://localhost:26657/abci_query?path="/state_for_block/34F1A1C923D23C5C0531490E714FC56F501EDADF05B6BF68C2ED3923234E0CC4"
             elif path_parts[0] == "state_for_block":
-                result = await self.bds.get_state_for_block(key)
+                result = await self.on_app_loop(self.bds.get_state_for_block(key))
 
             # http://localhost:26657/abci_query?path="/contracts/limit=10/offset=20"
             elif path_parts[0] == "contracts":
-                result = await self.bds.get_contracts(limit, offset)
+                result = await self.on_app_loop(self.bds.get_contracts(limit, offset))
 
             # http://localhost:26657/abci_query?path="/simulate_tx/<encoded_payload>"
             elif path_parts[0] == "simulate_tx":
-                connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                connection.connect(c.SIMULATOR_SOCKET)
-
-                raw_tx = path_parts[1]
-                byte_data = bytes.fromhex(raw_tx)
-                message_length = struct.pack('>I', len(byte_data))
-                connection.sendall(message_length + byte_data)
-                recv_length = connection.recv(4)
-
-                if len(recv_length) < 4:
-                    # Handle error or incomplete length prefix
-                    raise ValueError("Incomplete length prefix received")
-                else:
-                    length = struct.unpack('>I', recv_length)[0]
-                    recv = b''
-                    while len(recv) < length:
-                        packet = connection.recv(length - len(recv))
-                        if not packet:
-                            # Connection closed or error
-                            raise ConnectionError("Connection closed before receiving all data")
-                        recv += packet
-                    if len(recv) == length:
-                        result = recv.decode('utf-8')
-                    else:
-                        # Handle incomplete data error
-                        raise ValueError("Did not receive all expected data")
+                byte_data = bytes.fromhex(path_parts[1])
+                result = (await self.on_app_loop(self.simulator.request(byte_data))).decode('utf-8')
 
             # TODO: Deprecated - Remove after wallet and tools are reworked to use 'simulate_tx'
             # http://localhost:26657/abci_query?path="/calculate_stamps/<encoded_payload>"
             elif path_parts[0] == "calculate_stamps":
-                connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                connection.connect(c.SIMULATOR_SOCKET)
-
-                raw_tx = path_parts[1]
-                byte_data = bytes.fromhex(raw_tx)
+                byte_data = bytes.fromhex(path_parts[1])
                 # extract payload from the raw_tx
                 decoded_dict = json.loads(byte_data.decode('utf-8'))
                 payload = decoded_dict.get('payload', {})
-                payload_byte_data = bytes.fromhex(json.dumps(payload).encode('utf-8').hex())
-                message_length = struct.pack('>I', len(payload_byte_data))
-                connection.sendall(message_length + payload_byte_data)
-                recv_length = connection.recv(4)
-
-                if len(recv_length) < 4:
-                    # Handle error or incomplete length prefix
-                    raise ValueError("Incomplete length prefix received")
-                else:
-                    length = struct.unpack('>I', recv_length)[0]
-                    recv = b''
-                    while len(recv) < length:
-                        packet = connection.recv(length - len(recv))
-                        if not packet:
-                            # Connection closed or error
-                            raise ConnectionError("Connection closed before receiving all data")
-                        recv += packet
-                    if len(recv) == length:
-                        result = recv.decode('utf-8')
-                    else:
-                        # Handle incomplete data error
-                        raise ValueError("Did not receive all expected data")
+                payload_byte_data = json.dumps(payload).encode('utf-8')
+                result = (await self.on_app_loop(self.simulator.request(payload_byte_data))).decode('utf-8')
 
         else:
             error = f'Unknown query path: {path_parts[0]}'
@@ -200,4 +240,38 @@ async def query(self, req) -> ResponseQuery:
         logger.error(err)
         return ResponseQuery(code=c.ErrorCode)
 
-    return ResponseQuery(code=c.OkCode, value=v, info=type_of_data, key=encode_str(key))
\ No newline at end of file
+    return ResponseQuery(
+        code=c.OkCode,
+        value=v,
+        info=type_of_data,
+        key=encode_str(key),
+        proof_ops=proof_ops,
+        height=height
+    )
+
+
+def scan_keys(self, state, prefix: str, after: str = None, limit: int = None):
+    """
+    Keys starting with prefix in order, after the cursor. Streamed from the
+    key index at the latest height, past heights and nodes without the
+    index select the page from the keys of the prefix without sorting them.
+    """
+    if self.key_index is not None and state is self.committed_state:
+        return self.key_index.scan(prefix, after, limit)
+    keys = (key for key in state.keys(prefix) if after is None or key > after)
+    if limit is None:
+        return sorted(keys)
+    return heapq.nsmallest(limit, keys)
+
+
+def parse_key_list(part: str, data: bytes) -> list[str]:
+    if data:
+        keys = json.loads(data)
+    else:
+        try:
+            keys = json.loads(bytes.fromhex(part))
+        except ValueError:
+            keys = [key for key in part.split(",") if key]
+    if not isinstance(keys, list) or not all(isinstance(key, str) for key in keys):
+        raise ValueError("get_many takes a list of keys")
+    return keys
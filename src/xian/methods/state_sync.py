@@ -0,0 +1,147 @@
+import json
+import hashlib
+
+from cometbft.abci.v1beta1.types_pb2 import (
+    Snapshot,
+    ResponseListSnapshots,
+    ResponseOfferSnapshot,
+    ResponseLoadSnapshotChunk,
+    ResponseApplySnapshotChunk,
+)
+from xian.snapshots import SNAPSHOT_FORMAT, SnapshotRestore
+from xian.state_tree import StateTree
+from xian.utils.merkle import leaf_hash, verify_inclusion
+from loguru import logger
+
+
+async def list_snapshots(self, req) -> ResponseListSnapshots:
+    res = ResponseListSnapshots()
+    if self.snapshot_store is None:
+        return res
+    for height in self.snapshot_store.heights():
+        metadata = self.snapshot_store.metadata(height)
+        if metadata is None:
+            continue
+        manifest = json.loads(metadata)
+        res.snapshots.append(Snapshot(
+            height=height,
+            format=manifest["format"],
+            chunks=len(manifest["chunks"]),
+            hash=hashlib.sha256(metadata).digest(),
+            metadata=metadata
+        ))
+    return res
+
+
+async def load_snapshot_chunk(self, req) -> ResponseLoadSnapshotChunk:
+    if self.snapshot_store is None or req.format != SNAPSHOT_FORMAT:
+        return ResponseLoadSnapshotChunk()
+    return ResponseLoadSnapshotChunk(chunk=self.snapshot_store.load_chunk(req.height, req.chunk))
+
+
+async def offer_snapshot(self, req) -> ResponseOfferSnapshot:
+    snapshot = req.snapshot
+    if snapshot.format != SNAPSHOT_FORMAT:
+        return ResponseOfferSnapshot(result=ResponseOfferSnapshot.REJECT_FORMAT)
+    if self.block_metadata.height > 0:
+        logger.warning(f"Rejecting snapshot of height {snapshot.height}, the state is not empty")
+        return ResponseOfferSnapshot(result=ResponseOfferSnapshot.REJECT)
+
+    try:
+        manifest = json.loads(snapshot.metadata)
+        valid = (
+            hashlib.sha256(snapshot.metadata).digest() == snapshot.hash
+            # The app hash comes from the light client and is trusted
+            and manifest["app_hash"] == req.app_hash.hex()
+            and manifest["height"] == snapshot.height
+            and len(manifest["chunks"]) == snapshot.chunks
+        )
+    except (ValueError, KeyError, TypeError):
+        valid = False
+    if not valid:
+        logger.warning(f"Rejecting invalid snapshot of height {snapshot.height}")
+        return ResponseOfferSnapshot(result=ResponseOfferSnapshot.REJECT)
+    # Without the proof the state is only vouched for by the peer that sent it
+    if manifest.get("state_proof") is None and not self.snapshot_trust_unverified:
+        logger.warning(
+            f"Rejecting snapshot of height {snapshot.height}, its state can't be verified "
+            f"against the app hash before the state root upgrade"
+        )
+        return ResponseOfferSnapshot(result=ResponseOfferSnapshot.REJECT)
+
+    if self.snapshot_restore is not None:
+        self.snapshot_restore.rollback()
+    self.snapshot_restore = SnapshotRestore(manifest, self.client.raw_driver)
+    logger.info(f"Restoring snapshot of height {snapshot.height} from {snapshot.chunks} chunks")
+    return ResponseOfferSnapshot(result=ResponseOfferSnapshot.ACCEPT)
+
+
+async def apply_snapshot_chunk(self, req) -> ResponseApplySnapshotChunk:
+    restore = self.snapshot_restore
+    if restore is None:
+        return ResponseApplySnapshotChunk(result=ResponseApplySnapshotChunk.ABORT)
+
+    if not restore.apply(req.index, req.chunk):
+        logger.warning(f"Chunk {req.index} does not match the snapshot, refetching")
+        return ResponseApplySnapshotChunk(
+            result=ResponseApplySnapshotChunk.RETRY,
+            refetch_chunks=[req.index],
+            reject_senders=[req.sender] if req.sender else []
+        )
+    if not restore.complete:
+        return ResponseApplySnapshotChunk(result=ResponseApplySnapshotChunk.ACCEPT)
+
+    manifest = restore.manifest
+    try:
+        await restore.finish()
+        verify_restored_state(self, manifest)
+    except Exception as e:
+        logger.error(f"Failed to restore snapshot of height {manifest['height']}: {e}")
+        restore.rollback()
+        self.snapshot_restore = None
+        return ResponseApplySnapshotChunk(result=ResponseApplySnapshotChunk.REJECT_SNAPSHOT)
+
+    self.snapshot_restore = None
+    self.block_metadata.set(h=bytes.fromhex(manifest["app_hash"]), height=manifest["height"])
+    self.committed_parameters.clear()
+    self.sync_key_index(manifest["height"], force=True)
+    self.contract_index.warm_up()
+    if self.query_cache is not None:
+        self.query_cache.clear()
+    logger.info(f"Restored snapshot of height {manifest['height']}")
+    return ResponseApplySnapshotChunk(result=ResponseApplySnapshotChunk.ACCEPT)
+
+
+def verify_restored_state(self, manifest: dict) -> None:
+    """
+    Check the restored state against the app hash of the snapshot.
+
+    Once the state root is part of the app hash, the snapshot carries the
+    inclusion proof of the root, which is checked against the root of the
+    restored state. Before that the app hash does not cover the state, such
+    snapshots are only offered this far if the operator trusts the peers.
+    """
+    proof = manifest.get("state_proof")
+    if proof is None:
+        logger.warning(
+            f"Snapshot of height {manifest['height']} has no state root proof, "
+            f"the restored state is trusted without verifying it against the app hash"
+        )
+        if self.state_tree is not None:
+            self.sync_state_tree(manifest["height"], force=True)
+        return
+
+    if self.state_tree is not None:
+        self.sync_state_tree(manifest["height"], force=True)
+        state_root = self.state_tree.root()
+    else:
+        tree = StateTree(":memory:")
+        tree.rebuild(self.state_tree_items(), manifest["height"])
+        state_root = tree.root()
+
+    app_hash_root = bytes.fromhex(bytes.fromhex(manifest["app_hash"]).decode())
+    leaf = leaf_hash(state_root.hex().encode())
+    if leaf.hex() != proof["leaf"] or not verify_inclusion(
+        leaf, proof["index"], proof["size"], [bytes.fromhex(node) for node in proof["proof"]], app_hash_root
+    ):
+        raise ValueError("restored state does not match the app hash")
@@ -1,3 +1,6 @@
+import threading
+
+from collections import OrderedDict
 from xian.constants import Constants as c
 from xian.exceptions import TransactionException
 
@@ -84,3 +87,146 @@ class NonceStorage:
 
     def flush_pending(self):
         self.client.raw_driver.flush_file(c.PENDING_NONCE_FILENAME)
+
+
+class PendingNonceIndex:
+    """
+    In-memory index of the nonces of transactions in the mempool.
+
+    CheckTx adds a tx once it passed all checks, and rejects txs that reuse
+    a pending nonce or leave a gap after the sender's latest nonce. Commit
+    moves the nonces of the block into the committed nonces and drops the
+    pending entries they cover. With recheck enabled, entries of txs that
+    were not rechecked since the previous commit have left the mempool and
+    are pruned as well.
+
+    Committed nonces of the max_committed most recently active senders
+    are kept up to date from the committed blocks, so get_next_nonce needs
+    no disk reads for them. The committed state stays the source of truth
+    for everyone else.
+    """
+
+    def __init__(self, nonce_storage, prune_unseen: bool = True, max_committed: int = 100000):
+        self.nonce_storage = nonce_storage
+        self.prune_unseen = prune_unseen
+        self.max_committed = max_committed
+        # LRU of sender -> committed nonce
+        self._committed = OrderedDict()
+        # sender -> {nonce: [tx_hash, generation last seen in CheckTx]}
+        self._pending = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _get_committed(self, sender):
+        with self._lock:
+            if sender in self._committed:
+                self._committed.move_to_end(sender)
+                return self._committed[sender]
+            generation = self._generation
+        nonce = self.nonce_storage.get_nonce(sender=sender)
+        with self._lock:
+            if sender in self._committed:
+                return self._committed[sender]
+            # A block committed meanwhile may have set a newer nonce
+            if generation == self._generation:
+                self._cache_committed(sender, nonce)
+            return nonce
+
+    def _cache_committed(self, sender, nonce):
+        self._committed[sender] = nonce
+        self._committed.move_to_end(sender)
+        while len(self._committed) > self.max_committed:
+            self._committed.popitem(last=False)
+
+    def get_committed_nonce(self, sender):
+        return self._get_committed(sender)
+
+    def _check(self, sender, nonce, tx_hash, committed):
+        if not (committed is None or nonce > committed):
+            raise TransactionException('Transaction nonce is invalid')
+
+        pending = self._pending.get(sender)
+        if not pending:
+            if committed is not None and nonce != committed + 1:
+                raise TransactionException('Transaction nonce leaves a gap')
+            return None
+
+        entry = pending.get(nonce)
+        if entry is not None:
+            if entry[0] != tx_hash:
+                raise TransactionException('Transaction nonce is already pending')
+            return entry
+
+        if nonce - 1 not in pending and (committed is None or nonce != committed + 1):
+            raise TransactionException('Transaction nonce leaves a gap')
+        return None
+
+    def check_nonce(self, tx: dict, tx_hash=None):
+        """
+        Raise if the tx nonce can't follow the committed and pending nonces
+        """
+        sender = tx["payload"]["sender"]
+        committed = self._get_committed(sender)
+        with self._lock:
+            self._check(sender, tx["payload"]["nonce"], tx_hash, committed)
+
+    def add(self, tx: dict, tx_hash):
+        sender = tx["payload"]["sender"]
+        nonce = tx["payload"]["nonce"]
+        committed = self._get_committed(sender)
+        with self._lock:
+            # Check again, another CheckTx thread may have taken the nonce
+            entry = self._check(sender, nonce, tx_hash, committed)
+            if entry is not None:
+                entry[1] = self._generation
+            else:
+                self._pending.setdefault(sender, {})[nonce] = [tx_hash, self._generation]
+
+    def discard(self, tx: dict, tx_hash):
+        sender = tx["payload"]["sender"]
+        nonce = tx["payload"]["nonce"]
+        with self._lock:
+            pending = self._pending.get(sender)
+            if pending is None:
+                return
+            entry = pending.get(nonce)
+            if entry is not None and entry[0] == tx_hash:
+                del pending[nonce]
+                if not pending:
+                    del self._pending[sender]
+
+    def commit(self, block_nonces: dict):
+        """
+        Reconcile with the nonces set by a committed block
+        """
+        with self._lock:
+            for sender, nonce in block_nonces.items():
+                self._cache_committed(sender, nonce)
+            # Pending senders that were evicted from the committed nonces
+            evicted = [sender for sender in self._pending if sender not in self._committed]
+        stored = {sender: self.nonce_storage.get_nonce(sender=sender) for sender in evicted}
+
+        with self._lock:
+            for sender in list(self._pending):
+                pending = self._pending[sender]
+                committed = self._committed.get(sender, stored.get(sender))
+                for nonce, (_, seen) in list(pending.items()):
+                    if (committed is not None and nonce <= committed) or \
+                            (self.prune_unseen and seen < self._generation):
+                        del pending[nonce]
+                if not pending:
+                    del self._pending[sender]
+
+            self._generation += 1
+
+    def get_next_nonce(self, sender):
+        committed = self._get_committed(sender)
+        with self._lock:
+            pending = self._pending.get(sender)
+            latest = max(pending) if pending else None
+
+        if committed is not None and (latest is None or committed > latest):
+            latest = committed
+        if latest is None:
+            return 0
+        return latest + 1
@@ -0,0 +1,71 @@
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+
+class OptimisticExecution:
+    """
+    Execution of a proposed block that starts in ProcessProposal, while
+    CometBFT runs the prevote and precommit rounds, and is handed to
+    FinalizeBlock if the decided block is the one that was executed.
+
+    Only one execution is kept. Its state writes stay pending in the
+    driver until the block is decided: FinalizeBlock takes the result if
+    height and block hash match, otherwise the execution is discarded and
+    the caller has to drop the pending writes before executing the
+    decided block.
+
+    The execution runs on an event loop of its own in a dedicated thread,
+    so the main loop keeps serving the other connections and resolving
+    the results of worker threads meanwhile. Nothing else uses the driver
+    until FinalizeBlock, which waits for the result.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.task = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="optimistic")
+
+    @property
+    def pending(self) -> bool:
+        return self.task is not None
+
+    def start(self, height: int, block_hash: str, coro) -> None:
+        if self.task is not None:
+            raise RuntimeError("An optimistic execution is already pending")
+        self.key = (height, block_hash)
+        self.task = asyncio.wrap_future(self.executor.submit(asyncio.run, coro))
+
+    async def take(self, height: int, block_hash: str):
+        """
+        Wait for the pending execution and return its result if it
+        executed the given block, None otherwise
+        """
+        key, result = await self._wait()
+        if key is None:
+            return None
+        if key != (height, block_hash):
+            logger.debug(f"Discarding optimistic execution of block {key[0]} {key[1]}")
+            return None
+        return result
+
+    async def discard(self) -> None:
+        await self._wait()
+
+    async def _wait(self):
+        if self.task is None:
+            return None, None
+
+        key, task = self.key, self.task
+        self.key = None
+        self.task = None
+
+        try:
+            return key, await task
+        except Exception as e:
+            logger.error(f"Optimistic execution of block {key[0]} failed: {e}")
+            return key, None
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,223 @@
+import os
+import asyncio
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from contracting.execution.executor import Executor
+from contracting.storage.driver import Driver
+from contracting.storage.encoder import convert_dict
+from loguru import logger
+
+STAMP_COST_KEY = "stamp_cost.S:value"
+
+# The speculative executor of a worker process
+_worker = None
+
+
+class RecordingDriver(Driver):
+    """
+    Driver that records every key and prefix a transaction reads
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_keys = set()
+        self.read_prefixes = set()
+
+    def get(self, key, *args, **kwargs):
+        self.read_keys.add(key)
+        return super().get(key, *args, **kwargs)
+
+    def find(self, key, *args, **kwargs):
+        self.read_keys.add(key)
+        return super().find(key, *args, **kwargs)
+
+    def keys(self, prefix="", *args, **kwargs):
+        self.read_prefixes.add(prefix)
+        return super().keys(prefix, *args, **kwargs)
+
+    def items(self, prefix="", *args, **kwargs):
+        self.read_prefixes.add(prefix)
+        return super().items(prefix, *args, **kwargs)
+
+    def reset(self):
+        self.flush_cache()
+        self.read_keys = set()
+        self.read_prefixes = set()
+
+
+class SpeculativeWorker:
+    """
+    Executes transactions against the committed state, which is the state
+    at the start of the block being finalized. Nothing is written to disk.
+    """
+
+    def __init__(self, storage_home):
+        self.driver = RecordingDriver(storage_home=storage_home)
+        self.executor = Executor(driver=self.driver, metering=False)
+
+    def execute(self, tx, environment, metering):
+        try:
+            self.driver.reset()
+            # Same as TxProcessor.process_tx
+            stamp_cost = self.driver.get(STAMP_COST_KEY) or 1
+            output = self.executor.execute(
+                sender=tx['payload']['sender'],
+                contract_name=tx['payload']['contract'],
+                function_name=tx['payload']['function'],
+                stamps=tx['payload']['stamps_supplied'],
+                stamp_cost=stamp_cost,
+                kwargs=convert_dict(tx['payload']['kwargs']),
+                environment=environment,
+                auto_commit=False,
+                metering=metering
+            )
+            reads = self.driver.read_keys | {STAMP_COST_KEY}
+            return output, stamp_cost, reads, self.driver.read_prefixes
+        except Exception as e:
+            logger.debug(f"Speculative execution failed: {e}")
+            return None
+        finally:
+            self.driver.flush_cache()
+
+
+def _init_worker(storage_home):
+    global _worker
+    _worker = SpeculativeWorker(storage_home)
+
+
+def _execute_chunk(chunk, metering):
+    return [_worker.execute(tx, environment, metering) for tx, environment in chunk]
+
+
+class SpeculativeResult:
+    __slots__ = ("output", "stamp_cost", "reads", "prefixes")
+
+    def __init__(self, output, stamp_cost, reads, prefixes):
+        self.output = output
+        self.stamp_cost = stamp_cost
+        self.reads = reads
+        self.prefixes = prefixes
+
+
+class ParallelExecutor:
+    """
+    Optimistic parallel execution of the transactions of a block.
+
+    All txs of a block are first executed speculatively on a pool of
+    worker processes, each against the state at the start of the block,
+    recording the keys it reads. The results are then committed in block
+    order on the main process: a tx whose reads don't touch any key written
+    by an earlier tx of the block saw exactly the state serial execution
+    would have given it, so its output is applied as is. Every other tx is
+    executed again on the main process against the pending block state.
+    The committed state and results are therefore the same as with serial
+    execution, only the execution of non-conflicting txs runs in parallel.
+
+    Worker processes are used because the contracting runtime is global to
+    a process.
+    """
+
+    def __init__(self, storage_home, workers: int = None, min_block_size: int = 2):
+        self.storage_home = storage_home
+        self.workers = workers or os.cpu_count() or 1
+        self.min_block_size = min_block_size
+        self.pool = None
+
+    def start(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(str(self.storage_home),)
+            )
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def should_speculate(self, txs: list) -> bool:
+        if len(txs) < self.min_block_size:
+            return False
+        # Contract submissions change the code other txs import, which the
+        # workers may have cached. Blocks with submissions run serially.
+        return not any(tx["payload"]["contract"] == "submission" for tx in txs)
+
+    async def speculate(self, txs: list, environments: list, metering: bool) -> list:
+        """
+        Returns a SpeculativeResult or None for every tx
+        """
+        self.start()
+        items = list(zip(txs, environments))
+        size = -(-len(items) // self.workers)
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+
+        futures = [
+            asyncio.wrap_future(self.pool.submit(_execute_chunk, chunk, metering))
+            for chunk in chunks
+        ]
+
+        results = []
+        for chunk, outcome in zip(chunks, await asyncio.gather(*futures, return_exceptions=True)):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Speculative execution of {len(chunk)} txs failed: {outcome}")
+                results.extend([None] * len(chunk))
+                # A broken pool stays broken, start a new one for the next block
+                self.shutdown()
+                continue
+            results.extend(
+                SpeculativeResult(*result) if result is not None else None
+                for result in outcome
+            )
+        return results
+
+    def block(self) -> "ParallelBlock":
+        return ParallelBlock()
+
+
+class ParallelBlock:
+    """
+    Commits speculative results of one block in block order
+    """
+
+    def __init__(self):
+        self.written = set()
+        self.reused = 0
+        self.executed = 0
+
+    def is_valid(self, spec: SpeculativeResult) -> bool:
+        if spec is None or spec.output is None:
+            return False
+        # Failed txs are rare, they are executed again so that whatever the
+        # executor leaves behind on failure matches serial execution
+        if spec.output["status_code"] != 0:
+            return False
+        if not spec.reads.isdisjoint(self.written):
+            return False
+        for prefix in spec.prefixes:
+            if any(key.startswith(prefix) for key in self.written):
+                return False
+        return True
+
+    def process_tx(self, tx, spec, tx_processor, enabled_fees, rewards_handler) -> dict:
+        if self.is_valid(spec):
+            self.reused += 1
+            output = spec.output
+            # Leave the writes pending like the executor does on the main process
+            for key, value in output["writes"].items():
+                tx_processor.client.raw_driver.set(key, value)
+            self.written.update(output["writes"])
+            result = tx_processor.process_executed_tx(
+                tx, output, spec.stamp_cost, rewards_handler=rewards_handler
+            )
+        else:
+            self.executed += 1
+            result = tx_processor.process_tx(
+                tx, enabled_fees=enabled_fees, rewards_handler=rewards_handler
+            )
+
+        if result["tx_result"] is not None:
+            self.written.update(write["key"] for write in result["tx_result"]["state"])
+        return result
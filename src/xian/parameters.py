@@ -0,0 +1,54 @@
+PARAMETER_KEYS = frozenset({
+    "stamp_cost.S:value",
+    "foundation.owner",
+    "masternodes.nodes",
+    "rewards.S:value",
+})
+
+
+class ParameterCache:
+    """
+    Read-through cache for the governance and fee parameters that are read
+    for every transaction.
+
+    It wraps a client (ContractingClient or CommittedState) and serves
+    get_var / get for PARAMETER_KEYS from memory, all other reads go to the
+    client. The owner decides the scope: the block cache is cleared at the
+    start of every block and invalidated with the writes of each tx, the
+    CheckTx cache is cleared at every commit.
+    """
+
+    def __init__(self, client, keys=PARAMETER_KEYS):
+        self.client = client
+        self.keys = keys
+        self._values = {}
+
+    @property
+    def raw_driver(self):
+        return self
+
+    def make_key(self, contract, variable, args=[]):
+        return self.client.raw_driver.make_key(contract, variable, args)
+
+    def get(self, key: str):
+        if key not in self.keys:
+            return self.client.raw_driver.get(key)
+        try:
+            return self._values[key]
+        except KeyError:
+            value = self._values[key] = self.client.raw_driver.get(key)
+            return value
+
+    def get_var(self, contract, variable, arguments=[], mark=False):
+        key = self.make_key(contract, variable, arguments)
+        if key not in self.keys:
+            return self.client.get_var(contract=contract, variable=variable, arguments=arguments, mark=mark)
+        return self.get(key)
+
+    def invalidate(self, keys) -> None:
+        for key in keys:
+            if key in self._values:
+                del self._values[key]
+
+    def clear(self) -> None:
+        self._values.clear()
@@ -5,6 +5,7 @@ from loguru import logger
 from datetime import datetime
 from xian.utils.tx import tx_hash_from_tx, format_dictionary
 from xian.utils.block import is_compiled_key
+from xian.parameters import ParameterCache
 from contracting.execution.executor import Executor
 from contracting.storage.encoder import convert_dict, safe_repr
 from contracting.stdlib.bridge.time import Datetime
@@ -12,14 +13,16 @@ from contracting.stdlib.bridge.decimal import ContractingDecimal
 
 
 class TxProcessor:
-    def __init__(self, client, metering=False):
+    def __init__(self, client, metering=False, parameters=None):
         self.client = client
+        # Without a cache owned by the caller every read goes to the client
+        self.parameters = parameters or ParameterCache(client, keys=())
         self.executor = Executor(driver=self.client.raw_driver, metering=metering)
 
     def process_tx(self, tx, enabled_fees=False, rewards_handler=None):
         environment = self.get_environment(tx=tx)
 
-        stamp_cost = self.client.get_var(contract='stamp_cost', variable='S', arguments=['value']) or 1
+        stamp_cost = self.parameters.get_var(contract='stamp_cost', variable='S', arguments=['value']) or 1
 
         try:
             # Execute the transaction
@@ -29,6 +32,23 @@ class TxProcessor:
                 environment=environment,
                 metering=enabled_fees
             )
+        except Exception as e:
+            logger.error(e)
+
+            return {
+                'tx_result': None,
+                'stamp_rewards_amount': 0,
+                'stamp_rewards_contract': None
+            }
+
+        return self.process_executed_tx(tx, output, stamp_cost, rewards_handler)
+
+    def process_executed_tx(self, tx, output, stamp_cost, rewards_handler=None):
+        """
+        The part of process_tx after the executor ran, also used to apply
+        the output of a speculative execution
+        """
+        try:
             if output is None:
                 return {
                     'tx_result': None,
@@ -36,6 +56,9 @@ class TxProcessor:
                     'stamp_rewards_contract': None
                 }
 
+            # The tx may have changed a parameter, e.g. through a governance vote
+            self.parameters.invalidate(output['writes'])
+
             # Process the result of the executor
             tx_result = self.process_tx_output(
                 output=output,
@@ -115,22 +138,30 @@ class TxProcessor:
                 total_stamps_to_split=output['stamps_used'],
                 contract=transaction['payload']['contract']
             )
-            stamp_rate = self.client.get_var(contract='stamp_cost', variable='S', arguments=['value'])
-            foundation_owner = self.client.get_var(contract='foundation', variable='owner')
+            stamp_rate = self.parameters.get_var(contract='stamp_cost', variable='S', arguments=['value'])
+            foundation_owner = self.parameters.get_var(contract='foundation', variable='owner')
             rewards = {
                 'masternode_reward': {},
                 'foundation_reward': {foundation_owner: ContractingDecimal(str(calculated_rewards[1] / stamp_rate))},
                 'developer_reward': {}
             }
 
-            for masternode in self.client.get_var(contract='masternodes', variable='nodes'):
-                rewards['masternode_reward'][masternode] = ContractingDecimal(str(calculated_rewards[0] / stamp_rate))
+            masternode_reward = ContractingDecimal(str(calculated_rewards[0] / stamp_rate))
+            for masternode in self.parameters.get_var(contract='masternodes', variable='nodes'):
+                rewards['masternode_reward'][masternode] = masternode_reward
 
             for developer, reward in calculated_rewards[2].items():
                 if developer == 'sys' or developer is None:
-                    developer = self.client.get_var(contract='foundation', variable='owner')
+                    developer = self.parameters.get_var(contract='foundation', variable='owner')
                 rewards['developer_reward'][developer] = ContractingDecimal(str(reward / stamp_rate))
 
+        if rewards is not None and rewards_handler.ledger is not None:
+            # Credited to the balances once at the end of the block
+            rewards_handler.ledger.credit_many(rewards['masternode_reward'], masternode_reward)
+            for group in ('foundation_reward', 'developer_reward'):
+                for address, reward in rewards[group].items():
+                    rewards_handler.ledger.credit(address, reward)
+        elif rewards is not None:
             state_change_key = "currency.balances"
 
             # Update masternode rewards in output writes
@@ -178,6 +209,7 @@ class TxProcessor:
 
         for write in writes:
             self.client.raw_driver.set(key=write['key'], value=write['value'])        
+        self.parameters.invalidate(write['key'] for write in writes)
 
         tx_output = {
             'hash': tx_hash,
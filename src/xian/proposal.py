@@ -0,0 +1,184 @@
+import heapq
+import time
+
+from xian.utils.encoding import decode_transaction_bytes
+from xian.utils.tx import check_tx_formatting
+from loguru import logger
+
+ORDERING_POLICIES = ("fifo", "stamps")
+
+
+def proto_size(tx: bytes) -> int:
+    """
+    Size of a tx in the block data as CometBFT counts it against
+    max_tx_bytes: field tag, length varint and the tx bytes
+    """
+    n = len(tx)
+    size = n + 2
+    while n >= 0x80:
+        n >>= 7
+        size += 1
+    return size
+
+
+class ProposalStats:
+    __slots__ = ("candidates", "included", "invalid", "duplicates", "nonce_dropped",
+                 "size_dropped", "bytes", "decode_time", "verify_time", "pack_time")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def __repr__(self):
+        return (
+            f"{self.included} of {self.candidates} txs, {self.bytes} bytes "
+            f"(dropped: {self.invalid} invalid, {self.duplicates} duplicate, "
+            f"{self.nonce_dropped} nonce, {self.size_dropped} size; "
+            f"decode {self.decode_time * 1000:.2f}ms, verify {self.verify_time * 1000:.2f}ms, "
+            f"pack {self.pack_time * 1000:.2f}ms)"
+        )
+
+
+class ProposalBuilder:
+    """
+    Builds the tx list of a block proposal from the txs CometBFT takes out
+    of the mempool.
+
+    Txs that would certainly fail are left out: txs that don't decode or
+    are malformed, carry a bad signature or the wrong chain_id, repeat a
+    tx of the list, or whose nonce is already committed or leaves a gap.
+    Each sender's txs are ordered by nonce, senders are interleaved by the
+    ordering policy and the list is packed up to max_tx_bytes. A sender
+    whose next tx doesn't fit contributes nothing more to the block, as
+    its later txs would leave a gap.
+
+    Ordering policies:
+    fifo: the order of the mempool, which is the order txs arrived in
+    stamps: most stamps supplied first
+    """
+
+    def __init__(self, tx_cache, signature_verifier, nonce_index, chain_id, ordering: str = "fifo"):
+        if ordering not in ORDERING_POLICIES:
+            raise ValueError(f"Unknown proposal ordering {ordering}, use one of {ORDERING_POLICIES}")
+        self.tx_cache = tx_cache
+        self.signature_verifier = signature_verifier
+        self.nonce_index = nonce_index
+        self.chain_id = chain_id
+        self.ordering = ordering
+        self.last_stats: ProposalStats = None
+
+    def build(self, raw_txs, max_tx_bytes: int) -> list[bytes]:
+        stats = ProposalStats()
+        stats.candidates = len(raw_txs)
+
+        start = time.perf_counter()
+        candidates = self._decode(raw_txs, stats)
+        decoded = time.perf_counter()
+        candidates = self._verify(candidates, stats)
+        verified = time.perf_counter()
+        txs = self._pack(candidates, max_tx_bytes, stats)
+        packed = time.perf_counter()
+
+        stats.decode_time = decoded - start
+        stats.verify_time = verified - decoded
+        stats.pack_time = packed - verified
+        self.last_stats = stats
+        logger.debug(f"Built proposal: {stats}")
+        return txs
+
+    def _decode(self, raw_txs, stats: ProposalStats) -> list:
+        """
+        Returns [index, raw_tx, tx, payload_str, signature_valid] for every
+        unique tx that decodes, signature_valid is None if not cached
+        """
+        seen = set()
+        candidates = []
+        for index, raw_tx in enumerate(raw_txs):
+            tx_hash = self.tx_cache.key(raw_tx)
+            if tx_hash in seen:
+                stats.duplicates += 1
+                continue
+            seen.add(tx_hash)
+
+            cached = self.tx_cache.get(raw_tx)
+            if cached is not None:
+                candidates.append([index, raw_tx, cached.tx, cached.payload_str, cached.signature_valid])
+                continue
+            try:
+                tx, payload_str = decode_transaction_bytes(raw_tx)
+                check_tx_formatting(tx)
+            except Exception:
+                stats.invalid += 1
+                continue
+            candidates.append([index, raw_tx, tx, payload_str, None])
+        return candidates
+
+    def _verify(self, candidates: list, stats: ProposalStats) -> list:
+        unverified = [candidate for candidate in candidates if candidate[4] is None]
+        verdicts = self.signature_verifier.verify_many([
+            (tx["payload"]["sender"], payload_str, tx["metadata"]["signature"])
+            for _, _, tx, payload_str, _ in unverified
+        ])
+        for candidate, signature_valid in zip(unverified, verdicts):
+            candidate[4] = signature_valid
+            self.tx_cache.add(candidate[1], candidate[2], candidate[3], signature_valid)
+
+        valid = []
+        for candidate in candidates:
+            if candidate[4] and candidate[2]["payload"].get("chain_id") == self.chain_id:
+                valid.append(candidate)
+            else:
+                stats.invalid += 1
+        return valid
+
+    def _priority(self, index: int, tx: dict):
+        if self.ordering == "stamps":
+            return -tx["payload"]["stamps_supplied"], index
+        return (index,)
+
+    def _pack(self, candidates: list, max_tx_bytes: int, stats: ProposalStats) -> list[bytes]:
+        by_sender = {}
+        for index, raw_tx, tx, _, _ in candidates:
+            by_sender.setdefault(tx["payload"]["sender"], []).append((tx["payload"]["nonce"], index, raw_tx, tx))
+
+        # One queue per sender with its consecutive run of nonces
+        queues = []
+        for sender, sender_txs in by_sender.items():
+            sender_txs.sort(key=lambda entry: (entry[0], entry[1]))
+            committed = self.nonce_index.get_committed_nonce(sender)
+            expected = sender_txs[0][0] if committed is None else committed + 1
+            queue = []
+            for nonce, index, raw_tx, tx in sender_txs:
+                if nonce == expected:
+                    queue.append((index, raw_tx, tx))
+                    expected += 1
+                else:
+                    # Committed, pending twice or behind a gap
+                    stats.nonce_dropped += 1
+            if queue:
+                queues.append(queue)
+
+        heap = []
+        for queue in queues:
+            index, _, tx = queue[0]
+            heapq.heappush(heap, (self._priority(index, tx), 0, id(queue), queue))
+
+        txs = []
+        size = 0
+        while heap:
+            _, position, _, queue = heapq.heappop(heap)
+            _, raw_tx, _ = queue[position]
+            tx_size = proto_size(raw_tx)
+            if max_tx_bytes > 0 and size + tx_size > max_tx_bytes:
+                stats.size_dropped += len(queue) - position
+                continue
+            txs.append(raw_tx)
+            size += tx_size
+            position += 1
+            if position < len(queue):
+                index, _, tx = queue[position]
+                heapq.heappush(heap, (self._priority(index, tx), position, id(queue), queue))
+
+        stats.included = len(txs)
+        stats.bytes = size
+        return txs
@@ -0,0 +1,179 @@
+import bisect
+import threading
+import time
+
+from collections import OrderedDict
+
+# Seconds an entry lives per kind of query, as a bound on top of the
+# invalidation at commit
+DEFAULT_TTLS = {
+    "get": 30,
+    "keys": 30,
+    "contract": 300,
+    "app_hash_proof": 30,
+    "history": 600,
+}
+
+# Served from the BDS database, which is written by tasks that finish
+# after the commit, not cached
+BDS_QUERIES = {"state", "state_history", "state_for_tx", "state_for_block", "contracts"}
+
+# Depends on every write of a block
+ALL = object()
+
+
+def query_kind(path_parts: list, historical: bool) -> tuple[str, set, list] | None:
+    """
+    Kind of a query and the state it depends on: exact keys and key
+    prefixes, or ALL. None for queries that are not cached.
+    """
+    if not path_parts:
+        return None
+    name = path_parts[0]
+    if name in BDS_QUERIES or len(path_parts) < 2:
+        return None
+    elif name == "get":
+        kind, keys, prefixes = "get", {path_parts[1]}, []
+    elif name in ("contract", "contract_methods", "contract_vars"):
+        kind, keys, prefixes = "contract", {f"{path_parts[1]}.__code__"}, []
+    elif name in ("keys", "scan"):
+        kind, keys, prefixes = "keys", set(), [path_parts[1]]
+    elif name == "app_hash_proof":
+        kind, keys, prefixes = "app_hash_proof", ALL, []
+    else:
+        return None
+    if historical:
+        # A past height does not change any more
+        if kind not in ("get", "contract", "keys"):
+            return None
+        return "history", set(), []
+    return kind, keys, prefixes
+
+
+class _Entry:
+    __slots__ = ("value", "expires", "keys")
+
+    def __init__(self, value, expires, keys):
+        self.value = value
+        self.expires = expires
+        self.keys = keys
+
+
+class QueryCache:
+    """
+    LRU cache of query responses for the committed height.
+
+    Entries are keyed by the normalised path and the height asked for, 0
+    for the latest. At commit the entries that depend on a key the block
+    wrote are dropped, the rest stays valid for the new height. Entries
+    also expire after a TTL per kind of query.
+
+    Queries run in worker threads while blocks commit. A response that was
+    computed before a commit is not stored after it, put checks the
+    generation that get handed out.
+    """
+
+    def __init__(self, max_size: int = 10000, ttls: dict = None, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttls = DEFAULT_TTLS | (ttls or {})
+        self.clock = clock
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        # Cache keys by the state key they depend on
+        self._by_key = {}
+        # Entries that depend on key prefixes or on ALL
+        self._broad = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, cache_key):
+        """
+        Cached value and the generation to put a computed one with
+        """
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry.expires > self.clock():
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry.value, self.generation
+            if entry is not None:
+                self._remove(cache_key)
+            self.misses += 1
+            return None, self.generation
+
+    def put(self, cache_key, value, kind: str, keys, prefixes: list, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation:
+                return
+            if cache_key in self._entries:
+                self._remove(cache_key)
+            self._entries[cache_key] = _Entry(value, self.clock() + self.ttls[kind], keys)
+            if keys is ALL or prefixes:
+                self._broad[cache_key] = ALL if keys is ALL else prefixes
+            if keys is not ALL:
+                for key in keys:
+                    self._by_key.setdefault(key, set()).add(cache_key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, cache_key) -> None:
+        entry = self._entries.pop(cache_key)
+        self._broad.pop(cache_key, None)
+        if entry.keys is not ALL:
+            for key in entry.keys:
+                dependents = self._by_key.get(key)
+                if dependents is not None:
+                    dependents.discard(cache_key)
+                    if not dependents:
+                        del self._by_key[key]
+
+    def invalidate(self, written_keys) -> int:
+        """
+        Drop the latest height entries that depend on the written keys.
+        Returns the number of dropped entries.
+        """
+        written = sorted(written_keys)
+        with self._lock:
+            self.generation += 1
+            stale = set()
+            for key in written:
+                stale.update(self._by_key.get(key, ()))
+            for cache_key, prefixes in self._broad.items():
+                if prefixes is ALL:
+                    stale.add(cache_key)
+                    continue
+                for prefix in prefixes:
+                    i = bisect.bisect_left(written, prefix)
+                    if i < len(written) and written[i].startswith(prefix):
+                        stale.add(cache_key)
+            for cache_key in stale:
+                self._remove(cache_key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_key.clear()
+            self._broad.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
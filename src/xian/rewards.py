@@ -3,12 +3,57 @@ import decimal
 from xian.constants import Constants as c
 from collections import defaultdict
 from loguru import logger
+from xian.parameters import ParameterCache
+
+
+class RewardLedger:
+    """
+    Stamp rewards of the txs of a block, summed per recipient in integer
+    units of 10 ** -DUST_EXPONENT and written to currency.balances once at
+    the end of the block. Every credit is rounded to DUST_EXPONENT places.
+    """
+
+    SCALE = decimal.Decimal(10) ** c.DUST_EXPONENT
+
+    def __init__(self):
+        self.totals = defaultdict(int)
+
+    def to_units(self, amount) -> int:
+        return int((decimal.Decimal(str(amount)) * self.SCALE).to_integral_value(rounding=decimal.ROUND_HALF_EVEN))
+
+    def credit(self, address: str, amount) -> None:
+        self.credit_many((address,), amount)
+
+    def credit_many(self, addresses, amount) -> None:
+        units = self.to_units(amount)
+        if units == 0:
+            return
+        for address in addresses:
+            self.totals[address] += units
+
+    def apply(self, driver) -> list[dict]:
+        """
+        Add the totals to the balances, returns the writes
+        """
+        writes = []
+        for address in sorted(self.totals):
+            key = f"currency.balances:{address}"
+            balance = driver.get(key) or 0
+            reward = ContractingDecimal(str(decimal.Decimal(self.totals[address]).scaleb(-c.DUST_EXPONENT)))
+            value = balance + reward
+            driver.set(key, value)
+            writes.append({"key": key, "value": value})
+        self.totals.clear()
+        return writes
 
 
 class RewardsHandler:
     
-    def __init__(self, client):
+    def __init__(self, client, parameters=None):
         self.client = client
+        self.parameters = parameters or ParameterCache(client, keys=())
+        # Set for the blocks that batch their tx rewards
+        self.ledger: RewardLedger = None
     
     def calculate_participant_reward(self, participant_ratio, number_of_participants, total_stamps_to_split):
         number_of_participants = number_of_participants if number_of_participants != 0 else 1
@@ -31,23 +76,23 @@ class RewardsHandler:
         send_map = defaultdict(lambda: 0)
         recipient = self.client.get_var(contract=contract, variable="__developer__")
         if not recipient:
-            return {self.client.get_var(contract="foundation", variable="owner"): ContractingDecimal(str(total_stamps_to_split * developer_ratio))}
+            return {self.parameters.get_var(contract="foundation", variable="owner"): ContractingDecimal(str(total_stamps_to_split * developer_ratio))}
         send_map[recipient] += ContractingDecimal(str(total_stamps_to_split * developer_ratio))
         send_map[recipient] /= len(send_map)
         return dict(send_map)
     
     def calculate_tx_output_rewards(self, total_stamps_to_split, contract):
-        if not self.client.get_var(contract="rewards", variable="S", arguments=["value"]):
+        if not self.parameters.get_var(contract="rewards", variable="S", arguments=["value"]):
             logger.error("Rewards not set up.")
             return 0, 0, {}
         try:
-            master_ratio, burn_ratio, foundation_ratio, developer_ratio = self.client.get_var(contract="rewards", variable="S", arguments=["value"])
+            master_ratio, burn_ratio, foundation_ratio, developer_ratio = self.parameters.get_var(contract="rewards", variable="S", arguments=["value"])
         except TypeError:
             raise NotImplementedError("Driver could not get value for key rewards.S:value. Try setting up rewards.")
         
         master_reward = self.calculate_participant_reward(
             participant_ratio=master_ratio,
-            number_of_participants=len(self.client.get_var(contract="masternodes", variable="nodes")),
+            number_of_participants=len(self.parameters.get_var(contract="masternodes", variable="nodes")),
             total_stamps_to_split=total_stamps_to_split
         )
         
@@ -66,7 +111,7 @@ class RewardsHandler:
         return master_reward, foundation_reward, developer_mapping
     
     def distribute_rewards(self, stamp_rewards_amount, stamp_rewards_contract):
-        if not self.client.get_var(contract="rewards", variable="S", arguments=["value"]) or stamp_rewards_amount <= 0:
+        if not self.parameters.get_var(contract="rewards", variable="S", arguments=["value"]) or stamp_rewards_amount <= 0:
             return []
         
         driver = self.client.raw_driver
@@ -75,7 +120,7 @@ class RewardsHandler:
             contract=stamp_rewards_contract
         )
         
-        stamp_cost = driver.get("stamp_cost.S:value")
+        stamp_cost = self.parameters.get("stamp_cost.S:value")
         master_reward /= stamp_cost
         foundation_reward /= stamp_cost
         
@@ -87,14 +132,14 @@ class RewardsHandler:
     
     def _distribute_masternode_rewards(self, driver, master_reward):
         rewards = []
-        for m in driver.get("masternodes.nodes"):
+        for m in self.parameters.get("masternodes.nodes"):
             m_balance = driver.get(f"currency.balances:{m}") or 0
             m_balance_after = round(m_balance + master_reward, c.DUST_EXPONENT)
             rewards.append(driver.set(f"currency.balances:{m}", m_balance_after))
         return rewards
     
     def _distribute_foundation_reward(self, driver, foundation_reward):
-        foundation_wallet = driver.get("foundation.owner")
+        foundation_wallet = self.parameters.get("foundation.owner")
         foundation_balance = driver.get(f"currency.balances:{foundation_wallet}") or 0
         foundation_balance_after = round(foundation_balance + foundation_reward, c.DUST_EXPONENT)
         return driver.set(f"currency.balances:{foundation_wallet}", foundation_balance_after)
@@ -103,7 +148,7 @@ class RewardsHandler:
         rewards = []
         for recipient, amount in developer_mapping.items():
             if recipient == "sys" or recipient is None:
-                recipient = driver.get("foundation.owner")
+                recipient = self.parameters.get("foundation.owner")
             dev_reward = round(amount / stamp_cost, c.DUST_EXPONENT)
             recipient_balance = driver.get(f"currency.balances:{recipient}") or 0
             recipient_balance_after = round(recipient_balance + dev_reward, c.DUST_EXPONENT)
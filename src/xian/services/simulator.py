@@ -3,6 +3,7 @@ import socket
 import pathlib
 import json
 import struct
+import threading
 
 from loguru import logger
 from datetime import datetime
@@ -14,6 +15,22 @@ from xian.utils.tx import format_dictionary
 from xian.utils.encoding import stringify_decimals
 from xian.constants import Constants as c
 
+# Length and request id of the message that follows, in both directions
+HEADER = struct.Struct(">II")
+
+
+def recv_exactly(connection, size: int) -> bytes | None:
+    """
+    Read size bytes, None if the client disconnects first
+    """
+    data = bytearray()
+    while len(data) < size:
+        packet = connection.recv(size - len(data))
+        if not packet:
+            return None
+        data += packet
+    return bytes(data)
+
 
 class Simulator:
     def __init__(self):
@@ -27,7 +44,8 @@ class Simulator:
         # Create a socket
         self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         self.socket.bind(c.SIMULATOR_SOCKET)
-        self.socket.listen(1)
+        self.socket.listen()
+        self.lock = threading.Lock()
 
     def listen(self):
         logger.debug("Listening...")
@@ -35,53 +53,39 @@ class Simulator:
         while True:
             connection, client_address = self.socket.accept()
             logger.debug("Client connected")
+            # Clients keep their connections open, every one gets a thread
+            threading.Thread(target=self.serve, args=(connection,), daemon=True).start()
 
-            try:
-                while True:
-                    try:
-                        # Read message length (4 bytes)
-                        raw_msglen = connection.recv(4)
-                        if not raw_msglen:
-                            break
-                        if len(raw_msglen) < 4:
-                            # Handle incomplete length prefix
-                            raise ValueError("Incomplete length prefix received")
-                        msglen = struct.unpack('>I', raw_msglen)[0]
-
-                        # Read the message data
-                        data = b''
-
-                        while len(data) < msglen:
-                            packet = connection.recv(msglen - len(data))
-                            if not packet:
-                                # No more data from client, client closed connection
-                                logger.debug(f"Client disconnected")
-                                break
-                            data += packet
-
-                        if not data:
-                            logger.debug(f"Client disconnected")
-                            break
-
-                        # Parse the JSON payload directly from bytes
-                        payload = json.loads(data)
-                        logger.debug(f"Received payload: {payload}")
-
-                        try:
-                            response = self.execute(payload)
-                            response = json.dumps(response)
-                            response = response.encode()
-                            message_length = struct.pack('>I', len(response))
-                            connection.sendall(message_length + response)
-                        except BrokenPipeError:
-                            logger.error(f"Cannot send data, broken pipe.")
-                            break
-                    except ConnectionResetError:
-                        logger.debug(f"Client disconnected")
-                        break
-            finally:
-                logger.debug(f"Client disconnected")
-                connection.close()
+    def serve(self, connection):
+        try:
+            while True:
+                # Message length and request id, the response carries the same id
+                header = recv_exactly(connection, HEADER.size)
+                if header is None:
+                    break
+                msglen, request_id = HEADER.unpack(header)
+                data = recv_exactly(connection, msglen)
+                if data is None:
+                    break
+
+                try:
+                    # Parse the JSON payload directly from bytes
+                    payload = json.loads(data)
+                    logger.debug(f"Received payload: {payload}")
+                    # The contracting runtime is not thread safe
+                    with self.lock:
+                        response = self.execute(payload)
+                except Exception as e:
+                    logger.error(f"Simulation failed: {e}")
+                    response = {"error": str(e)}
+
+                response = json.dumps(response).encode()
+                connection.sendall(HEADER.pack(len(response), request_id) + response)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            logger.debug("Client disconnected")
+            connection.close()
 
     def generate_environment(self, num=1):
         random_hex_string = secrets.token_hex(nbytes=64 // 2)
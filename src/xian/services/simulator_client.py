@@ -0,0 +1,107 @@
+import asyncio
+import itertools
+import struct
+
+from loguru import logger
+
+# Length and request id of the message that follows, in both directions
+HEADER = struct.Struct(">II")
+
+
+class SimulatorConnection:
+    """
+    Connection to the simulator that can have several requests in flight.
+    Responses are matched to their requests by id.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.reader = None
+        self.writer = None
+        self.pending = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+        self._reader_task = None
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def _connect(self) -> None:
+        async with self._connect_lock:
+            if self.connected:
+                return
+            self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+            self._reader_task = asyncio.create_task(self._read_responses(self.reader, self.writer))
+
+    async def _read_responses(self, reader, writer) -> None:
+        error = ConnectionError("Simulator closed the connection")
+        try:
+            while True:
+                length, request_id = HEADER.unpack(await reader.readexactly(HEADER.size))
+                data = await reader.readexactly(length)
+                future = self.pending.pop(request_id, None)
+                # None if the request timed out already
+                if future is not None and not future.done():
+                    future.set_result(data)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            logger.debug(f"Simulator connection lost: {e}")
+        finally:
+            writer.close()
+            # Unless the requests in flight belong to a new connection already
+            if self.writer is writer:
+                for future in self.pending.values():
+                    if not future.done():
+                        future.set_exception(error)
+                self.pending.clear()
+
+    async def request(self, data: bytes, timeout: float) -> bytes:
+        request_id = next(self._ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        # Counts as in flight for the pool right away
+        self.pending[request_id] = future
+        try:
+            if not self.connected:
+                await self._connect()
+            self.writer.write(HEADER.pack(len(data), request_id) + data)
+            await self.writer.drain()
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+
+class SimulatorClient:
+    """
+    Pool of persistent connections to the simulator.
+
+    Connections are opened on first use and again after they are lost.
+    A request goes to the connection with the fewest requests in flight.
+    The client belongs to the event loop it is first used on, handlers in
+    worker threads reach it through Xian.on_app_loop.
+    """
+
+    def __init__(self, path: str, size: int = 2, timeout: float = 10):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.connections = None
+
+    async def request(self, data: bytes) -> bytes:
+        """
+        Send a payload to the simulator and return its response. Raises
+        asyncio.TimeoutError if there is none within timeout seconds.
+        """
+        if self.connections is None:
+            self.connections = [SimulatorConnection(self.path) for _ in range(self.size)]
+        connection = min(self.connections, key=lambda conn: (len(conn.pending), not conn.connected))
+        return await connection.request(data, self.timeout)
+
+    async def close(self) -> None:
+        if self.connections is not None:
+            await asyncio.gather(*(connection.close() for connection in self.connections))
@@ -0,0 +1,252 @@
+import os
+import json
+import asyncio
+import hashlib
+import shutil
+import threading
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from contracting.storage.encoder import encode, decode
+from loguru import logger
+
+SNAPSHOT_FORMAT = 1
+MANIFEST_FILENAME = "manifest.json"
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def chunk_hash(chunk: bytes) -> str:
+    return hashlib.sha256(chunk).hexdigest()
+
+
+def encode_chunk(items: list) -> bytes:
+    return zlib.compress(encode(items).encode())
+
+
+def decode_chunk(chunk: bytes) -> list:
+    return decode(zlib.decompress(chunk).decode())
+
+
+class SnapshotView:
+    """
+    Committed state as of the height of a snapshot that is being written.
+
+    Blocks keep being committed while the snapshot is read in the
+    background. Before the writes of a block reach the store, preserve
+    saves the values they overwrite, None for keys that did not exist, so
+    the reader sees the state of the snapshot height throughout.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.lock = threading.Lock()
+        self.preserved = {}
+
+    def preserve(self, keys) -> None:
+        with self.lock:
+            for key in keys:
+                if key not in self.preserved:
+                    self.preserved[key] = self.state.get(key)
+
+    def keys(self) -> list:
+        keys = set(self.state.keys())
+        # Keys removed since the snapshot height are only known from here
+        with self.lock:
+            keys.update(self.preserved)
+        return sorted(keys)
+
+    def get(self, key: str):
+        with self.lock:
+            if key in self.preserved:
+                return self.preserved[key]
+            return self.state.get(key)
+
+
+class SnapshotStore:
+    """
+    Snapshots of the committed state, served to nodes that join through
+    state sync.
+
+    A snapshot is a directory per height with the state in chunks of
+    sorted (key, value) pairs, zlib compressed, and a manifest. The
+    manifest lists the sha256 of every chunk and the app hash of the
+    height, it goes to peers as the snapshot metadata and its hash is the
+    snapshot hash. It is written last, a snapshot without one is ignored.
+    """
+
+    def __init__(self, directory, chunk_size: int = DEFAULT_CHUNK_SIZE, keep_recent: int = 2):
+        if keep_recent < 1:
+            raise ValueError("keep_recent has to be at least 1, the snapshot that was just written")
+        self.directory = Path(directory)
+        self.chunk_size = chunk_size
+        self.keep_recent = keep_recent
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+        self.view: SnapshotView = None
+        self._pending = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def in_progress(self) -> bool:
+        return self._pending is not None and not self._pending.done()
+
+    def preserve(self, keys) -> None:
+        """
+        Called with the keys of a block's writes before they are applied
+        """
+        view = self.view
+        if view is not None:
+            view.preserve(keys)
+
+    def take(self, state, height: int, app_hash: bytes, nanos: int, state_proof: dict = None) -> bool:
+        """
+        Start writing a snapshot of the state that was just committed
+        """
+        if self.in_progress:
+            logger.warning(f"Skipping snapshot at height {height}, the previous one is still being written")
+            return False
+        self.view = SnapshotView(state)
+        manifest = {
+            "height": height,
+            "format": SNAPSHOT_FORMAT,
+            "app_hash": app_hash.hex(),
+            "nanos": nanos,
+            # Inclusion of the state root in the app hash, if it is part of it
+            "state_proof": state_proof,
+        }
+        self._pending = self.executor.submit(self._write, self.view, manifest)
+        return True
+
+    def _write(self, view: SnapshotView, manifest: dict) -> None:
+        height = manifest["height"]
+        path = self.directory / str(height)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        try:
+            hashes = []
+            items, size = [], 0
+            for key in view.keys():
+                value = view.get(key)
+                if value is None:
+                    continue
+                items.append([key, value])
+                size += len(key) + len(encode(value))
+                if size >= self.chunk_size:
+                    hashes.append(self._write_chunk(path, len(hashes), items))
+                    items, size = [], 0
+            if items or not hashes:
+                hashes.append(self._write_chunk(path, len(hashes), items))
+
+            manifest["chunks"] = hashes
+            tmp_path = path / (MANIFEST_FILENAME + ".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path / MANIFEST_FILENAME)
+            logger.info(f"Wrote snapshot of height {height} in {len(hashes)} chunks")
+        except Exception as e:
+            logger.error(f"Failed to write snapshot of height {height}: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        finally:
+            if self.view is view:
+                self.view = None
+        self.prune()
+
+    def _write_chunk(self, path: Path, index: int, items: list) -> str:
+        chunk = encode_chunk(items)
+        with open(path / f"chunk_{index}", "wb") as f:
+            f.write(chunk)
+        return chunk_hash(chunk)
+
+    def prune(self) -> None:
+        for height in self.heights()[:-self.keep_recent]:
+            shutil.rmtree(self.directory / str(height), ignore_errors=True)
+
+    def heights(self) -> list[int]:
+        return sorted(
+            int(name) for name in os.listdir(self.directory)
+            if name.isdigit() and (self.directory / name / MANIFEST_FILENAME).exists()
+        )
+
+    def metadata(self, height: int) -> bytes | None:
+        try:
+            with open(self.directory / str(height) / MANIFEST_FILENAME, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def load_chunk(self, height: int, index: int) -> bytes:
+        try:
+            with open(self.directory / str(height) / f"chunk_{index}", "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return b""
+
+    async def wait(self) -> None:
+        if self._pending is not None:
+            await asyncio.wrap_future(self._pending)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+class SnapshotRestore:
+    """
+    Restores the state from the chunks of an accepted snapshot.
+
+    Chunks are checked against the hashes in the manifest as they arrive,
+    then decompressed and decoded on a pool of threads while the next ones
+    are fetched. Writes to the driver are serialized.
+    """
+
+    def __init__(self, manifest: dict, driver, workers: int = None):
+        self.manifest = manifest
+        self.driver = driver
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="restore")
+        self.futures = {}
+        self.written = set()
+        self._lock = threading.Lock()
+
+    @property
+    def complete(self) -> bool:
+        return len(self.futures) == len(self.manifest["chunks"])
+
+    def apply(self, index: int, chunk: bytes) -> bool:
+        """
+        Start applying a chunk, False if it does not match the manifest
+        """
+        if not 0 <= index < len(self.manifest["chunks"]) or chunk_hash(chunk) != self.manifest["chunks"][index]:
+            return False
+        if index not in self.futures:
+            self.futures[index] = self.executor.submit(self._apply, chunk)
+        return True
+
+    def _apply(self, chunk: bytes) -> None:
+        items = decode_chunk(chunk)
+        with self._lock:
+            for key, value in items:
+                self.driver.set(key, value)
+                self.written.add(key)
+            self.driver.hard_apply(str(self.manifest["nanos"]))
+
+    async def finish(self) -> None:
+        """
+        Wait for all chunks to be written, a failed chunk is raised here
+        """
+        try:
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in self.futures.values()))
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def rollback(self) -> None:
+        """
+        Remove what was written, before another snapshot is restored
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            for key in self.written:
+                self.driver.set(key, None)
+            self.driver.hard_apply(str(self.manifest["nanos"]))
+            self.written.clear()
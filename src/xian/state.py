@@ -0,0 +1,67 @@
+import threading
+
+from contracting.storage.driver import Driver
+
+
+class CommittedState:
+    """
+    Read-only view of the committed state.
+
+    Reads go straight to disk, so they never see the pending writes of a
+    block that is being executed, and they skip the runtime read metering
+    of Driver.get. That makes the view safe to use from the worker threads
+    that serve mempool and query requests while consensus is executing
+    transactions. It mirrors the parts of ContractingClient that readers
+    use (raw_driver, get_var).
+
+    While the commit pipeline applies a block in the background, its
+    writes are served from overlay.
+
+    Commit holds lock while it makes the writes of a block visible and
+    every read takes it, so no read sees a block half applied. get_many
+    holds it across its reads to see a single height.
+    """
+
+    def __init__(self, storage_home):
+        self.driver = Driver(bypass_cache=True, storage_home=storage_home)
+        self.overlay: dict = None
+        self.lock = threading.RLock()
+
+    @property
+    def raw_driver(self):
+        return self
+
+    def make_key(self, contract, variable, args=[]):
+        return self.driver.make_key(contract, variable, args)
+
+    def get(self, key: str):
+        with self.lock:
+            overlay = self.overlay
+            if overlay is not None and key in overlay:
+                return overlay[key]
+            return self.driver.find(key)
+
+    def get_many(self, keys) -> dict:
+        with self.lock:
+            return {key: self.get(key) for key in keys}
+
+    def get_var(self, contract, variable, arguments=[], mark=False):
+        return self.get(self.driver.make_key(contract, variable, arguments))
+
+    def get_contract(self, name: str):
+        return self.get_var(name, "__code__")
+
+    def keys(self, prefix: str = ""):
+        with self.lock:
+            overlay = self.overlay
+            keys = self.driver.keys(prefix)
+        if overlay is None:
+            return keys
+        keys = set(keys)
+        for key, value in overlay.items():
+            if key.startswith(prefix):
+                if value is None:
+                    keys.discard(key)
+                else:
+                    keys.add(key)
+        return sorted(keys)
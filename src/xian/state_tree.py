@@ -0,0 +1,325 @@
+import hashlib
+import sqlite3
+import threading
+
+from contracting.storage.encoder import encode
+from loguru import logger
+
+EMPTY_HASH = bytes(32)
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+PROOF_OP_TYPE = "xian:state_tree"
+
+# Marks a path that is removed by the staged writes
+_REMOVED = object()
+
+
+def key_hash(key: str) -> bytes:
+    return hashlib.sha3_256(key.encode()).digest()
+
+
+def value_hash(value) -> bytes:
+    return hashlib.sha3_256(encode(value).encode()).digest()
+
+
+def leaf_node_hash(k_hash: bytes, v_hash: bytes) -> bytes:
+    return hashlib.sha3_256(LEAF_PREFIX + k_hash + v_hash).digest()
+
+
+def inner_node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha3_256(NODE_PREFIX + left + right).digest()
+
+
+def key_bits(k_hash: bytes) -> str:
+    return format(int.from_bytes(k_hash, "big"), "0256b")
+
+
+class Node:
+    """
+    Inner nodes have no key_hash, their hash is computed from the children
+    """
+
+    __slots__ = ("hash", "key_hash", "value_hash")
+
+    def __init__(self, hash: bytes = None, key_hash: bytes = None, value_hash: bytes = None):
+        self.hash = hash
+        self.key_hash = key_hash
+        self.value_hash = value_hash
+
+    @property
+    def is_leaf(self) -> bool:
+        return self.key_hash is not None
+
+    @classmethod
+    def leaf(cls, k_hash: bytes, v_hash: bytes) -> "Node":
+        return cls(leaf_node_hash(k_hash, v_hash), k_hash, v_hash)
+
+
+class StateTree:
+    """
+    Sparse Merkle tree over the committed state, stored next to it.
+
+    Keys are placed by the bits of sha3_256(key), a leaf sits at the
+    shortest path that no other key shares and an inner node at every path
+    shared by two or more keys. The shape only depends on the set of keys,
+    its depth grows with log n, and so does the number of hashes a write
+    updates.
+
+    Nodes are stored by path in sqlite and loaded on demand. Writes of a
+    block are staged on top of the committed nodes with stage, which
+    returns the new root, and are persisted with commit.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            "path TEXT PRIMARY KEY, hash BLOB NOT NULL, key_hash BLOB, value_hash BLOB)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)")
+        self.lock = threading.RLock()
+        # Committed nodes read so far, None for paths known to be empty
+        self._nodes = {}
+        self._staged = {}
+        self._dirty = set()
+        self.height = self._get_meta("height", -1)
+
+    def _get_meta(self, name, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return default if row is None else row[0]
+
+    def _load(self, path: str) -> Node | None:
+        with self.lock:
+            try:
+                return self._nodes[path]
+            except KeyError:
+                pass
+            row = self.db.execute(
+                "SELECT hash, key_hash, value_hash FROM nodes WHERE path = ?", (path,)
+            ).fetchone()
+            node = None if row is None else Node(*row)
+            self._nodes[path] = node
+            return node
+
+    def _get(self, path: str) -> Node | None:
+        node = self._staged.get(path)
+        if node is None:
+            return self._load(path)
+        return None if node is _REMOVED else node
+
+    def _set(self, path: str, node: Node | None) -> None:
+        self._staged[path] = _REMOVED if node is None else node
+
+    def _mark(self, path: str) -> None:
+        # Inner nodes above a changed path have to be hashed again
+        for i in range(len(path)):
+            self._dirty.add(path[:i])
+
+    def root(self) -> bytes:
+        """
+        Root of the committed tree
+        """
+        node = self._load("")
+        return EMPTY_HASH if node is None else node.hash
+
+    def stage(self, writes: dict) -> bytes:
+        """
+        Apply the writes of a block on top of the committed tree and
+        return the new root. A value of None deletes the key.
+        """
+        self.discard()
+        for key, value in writes.items():
+            k_hash = key_hash(key)
+            if value is None:
+                self._delete(k_hash)
+            else:
+                self._insert(k_hash, value_hash(value))
+        self._rehash()
+        node = self._get("")
+        return EMPTY_HASH if node is None else node.hash
+
+    def discard(self) -> None:
+        self._staged = {}
+        self._dirty = set()
+
+    def _insert(self, k_hash: bytes, v_hash: bytes) -> None:
+        bits = key_bits(k_hash)
+        path = ""
+        while True:
+            node = self._get(path)
+            if node is None or (node.is_leaf and node.key_hash == k_hash):
+                self._set(path, Node.leaf(k_hash, v_hash))
+                self._mark(path)
+                return
+            if node.is_leaf:
+                # Push the other leaf down to where the two keys part
+                other_bits = key_bits(node.key_hash)
+                depth = len(path)
+                while bits[depth] == other_bits[depth]:
+                    depth += 1
+                for i in range(len(path), depth + 1):
+                    self._set(bits[:i], Node())
+                self._set(bits[:depth] + other_bits[depth], node)
+                self._set(bits[:depth + 1], Node.leaf(k_hash, v_hash))
+                self._mark(bits[:depth + 1])
+                return
+            path = bits[:len(path) + 1]
+
+    def _delete(self, k_hash: bytes) -> None:
+        bits = key_bits(k_hash)
+        path = ""
+        while True:
+            node = self._get(path)
+            if node is None:
+                return
+            if node.is_leaf:
+                if node.key_hash != k_hash:
+                    return
+                break
+            path = bits[:len(path) + 1]
+
+        self._set(path, None)
+        # A leaf left alone under an inner node moves up to it
+        while path:
+            parent = path[:-1]
+            sibling = parent + ("1" if path[-1] == "0" else "0")
+            node, other = self._get(path), self._get(sibling)
+            if node is None and other is not None and other.is_leaf:
+                self._set(sibling, None)
+                self._set(parent, other)
+            elif other is None and node is not None and node.is_leaf:
+                self._set(path, None)
+                self._set(parent, node)
+            elif node is None and other is None:
+                self._set(parent, None)
+            else:
+                break
+            path = parent
+        self._mark(path)
+
+    def _rehash(self) -> None:
+        for path in sorted(self._dirty, key=len, reverse=True):
+            node = self._get(path)
+            if node is None or node.is_leaf:
+                continue
+            left = self._get(path + "0")
+            right = self._get(path + "1")
+            node = Node(inner_node_hash(
+                EMPTY_HASH if left is None else left.hash,
+                EMPTY_HASH if right is None else right.hash
+            ))
+            self._set(path, node)
+        self._dirty = set()
+
+    def commit(self, height: int) -> None:
+        """
+        Persist the staged writes as the tree of the given height
+        """
+        with self.lock:
+            self.db.execute("BEGIN")
+            try:
+                for path, node in self._staged.items():
+                    if node is _REMOVED:
+                        self.db.execute("DELETE FROM nodes WHERE path = ?", (path,))
+                    else:
+                        self.db.execute(
+                            "INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?)",
+                            (path, node.hash, node.key_hash, node.value_hash)
+                        )
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('height', ?)", (height,))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                self._nodes.clear()
+                raise
+
+            for path, node in self._staged.items():
+                self._nodes[path] = None if node is _REMOVED else node
+            self.height = height
+        self.discard()
+
+    def rebuild(self, items, height: int) -> None:
+        """
+        Build the tree from scratch from (key, value) pairs
+        """
+        with self.lock:
+            self.db.execute("BEGIN")
+            self.db.execute("DELETE FROM nodes")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('height', -1)")
+            self.db.execute("COMMIT")
+            self._nodes.clear()
+            self.height = -1
+        self.discard()
+        count = 0
+        for key, value in items:
+            if value is not None:
+                self._insert(key_hash(key), value_hash(value))
+                count += 1
+        self._rehash()
+        self.commit(height)
+        logger.info(f"Built state tree of {count} keys at height {height}")
+
+    def prove(self, key: str) -> dict:
+        """
+        Proof of the committed value of key, or that it is absent.
+        siblings are the hashes next to the path from the root down.
+        """
+        k_hash = key_hash(key)
+        bits = key_bits(k_hash)
+        siblings = []
+        with self.lock:
+            path = ""
+            while True:
+                node = self._load(path)
+                if node is None or node.is_leaf:
+                    break
+                sibling = self._load(path + ("1" if bits[len(path)] == "0" else "0"))
+                siblings.append((EMPTY_HASH if sibling is None else sibling.hash).hex())
+                path = bits[:len(path) + 1]
+
+            leaf = None
+            if node is not None:
+                leaf = {"key_hash": node.key_hash.hex(), "value_hash": node.value_hash.hex()}
+            return {
+                "key": key,
+                "height": self.height,
+                "root": self.root().hex(),
+                "siblings": siblings,
+                "leaf": leaf,
+            }
+
+
+def verify_proof(proof: dict, root: bytes, value=None) -> bool:
+    """
+    Check a proof from StateTree.prove against a root. With a value it
+    proves that key holds value, without it that key is absent.
+    """
+    k_hash = key_hash(proof["key"])
+    bits = key_bits(k_hash)
+    siblings = [bytes.fromhex(sibling) for sibling in proof["siblings"]]
+    leaf = proof["leaf"]
+
+    if leaf is None:
+        if value is not None:
+            return False
+        node = EMPTY_HASH
+    else:
+        leaf_key_hash = bytes.fromhex(leaf["key_hash"])
+        leaf_value_hash = bytes.fromhex(leaf["value_hash"])
+        if value is not None:
+            if leaf_key_hash != k_hash or leaf_value_hash != value_hash(value):
+                return False
+        # An other key at the end of the path proves absence only if it
+        # shares the path
+        elif leaf_key_hash == k_hash or key_bits(leaf_key_hash)[:len(siblings)] != bits[:len(siblings)]:
+            return False
+        node = leaf_node_hash(leaf_key_hash, leaf_value_hash)
+
+    for depth in range(len(siblings) - 1, -1, -1):
+        if bits[depth] == "0":
+            node = inner_node_hash(node, siblings[depth])
+        else:
+            node = inner_node_hash(siblings[depth], node)
+    return node == root
@@ -126,6 +126,91 @@ class Configure:
             required=False,
             default=100000
         )
+        parser.add_argument(
+            '--parallel-execution',
+            action=BooleanOptionalAction,
+            help='Execute the txs of a block speculatively in parallel',
+            required=False,
+            default=False
+        )
+        parser.add_argument(
+            '--parallel-workers',
+            type=int,
+            help='Number of worker processes for "parallel-execution", 0 for one per core',
+            required=False,
+            default=0
+        )
+        parser.add_argument(
+            '--optimistic-execution',
+            action=BooleanOptionalAction,
+            help='Start executing proposed blocks in ProcessProposal, before they are decided',
+            required=False,
+            default=False
+        )
+        parser.add_argument(
+            '--proposal-ordering',
+            type=str,
+            choices=['fifo', 'stamps'],
+            help='Order of the txs in block proposals: mempool order or most stamps supplied first',
+            required=False,
+            default='fifo'
+        )
+        parser.add_argument(
+            '--state-tree',
+            action=BooleanOptionalAction,
+            help='Keep a Merkle tree of the state to serve proofs in queries',
+            required=False,
+            default=False
+        )
+        parser.add_argument(
+            '--state-history',
+            action=BooleanOptionalAction,
+            help='Keep versions of the state to serve queries at past heights, for "blocks-to-keep" heights if pruning is enabled',
+            required=False,
+            default=False
+        )
+        parser.add_argument(
+            '--query-cache-size',
+            type=int,
+            help='Number of query responses to cache, 0 to disable',
+            required=False,
+            default=0
+        )
+        parser.add_argument(
+            '--key-index',
+            action=BooleanOptionalAction,
+            help='Keep a sorted index of the state keys for paginated "/scan" and "/keys" queries',
+            required=False,
+            default=True
+        )
+        parser.add_argument(
+            '--get-many-max-keys',
+            type=int,
+            help='Maximum number of keys a "/get_many" query reads',
+            required=False,
+            default=100
+        )
+        parser.add_argument(
+            '--snapshot-interval',
+            type=int,
+            help='Take a state sync snapshot every N heights, 0 to disable',
+            required=False,
+            default=0
+        )
+        parser.add_argument(
+            '--snapshot-trust-unverified',
+            action=BooleanOptionalAction,
+            help='Restore state sync snapshots from before the state root upgrade, which can\'t be verified against the app hash',
+            required=False,
+            default=False
+        )
+        parser.add_argument(
+            '--async-commit',
+            action=BooleanOptionalAction,
+            help='Log the writes of a block at commit and apply them to the store in the background',
+            required=False,
+            default=False
+        )
 
         self.args = parser.parse_args()
 
@@ -240,7 +325,19 @@ class Configure:
         config['xian'] = {
             'block_service_mode': self.args.service_node,
             'pruning_enabled': self.args.enable_pruning,
-            'blocks_to_keep': self.args.blocks_to_keep
+            'blocks_to_keep': self.args.blocks_to_keep,
+            'parallel_execution': self.args.parallel_execution,
+            'parallel_workers': self.args.parallel_workers,
+            'optimistic_execution': self.args.optimistic_execution,
+            'proposal_ordering': self.args.proposal_ordering,
+            'state_tree': self.args.state_tree,
+            'async_commit': self.args.async_commit,
+            'snapshot_interval': self.args.snapshot_interval,
+            'snapshot_trust_unverified': self.args.snapshot_trust_unverified,
+            'state_history': self.args.state_history,
+            'query_cache_size': self.args.query_cache_size,
+            'key_index': self.args.key_index,
+            'get_many_max_keys': self.args.get_many_max_keys
         }
 
         config['proxy_app'] = self.UNIX_SOCKET_PATH
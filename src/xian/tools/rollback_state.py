@@ -0,0 +1,49 @@
+"""
+Roll the application state back to a recent height, e.g. after a bad
+upgrade. Needs the state history, --state-history in configure.py, to
+reach back to that height. Stop the node first. On restart CometBFT
+replays the blocks above the height from its block store.
+"""
+
+import time
+
+from pathlib import Path
+from argparse import ArgumentParser
+from contracting.storage.driver import Driver
+from xian.constants import Constants as c
+from xian.history import StateHistory
+from xian.commit_pipeline import WriteAheadLog, replay_wal
+from xian.utils.block import BlockMetadataStore
+from xian.validators import ValidatorHandler
+
+
+def main(height: int, storage_home: Path = c.STORAGE_HOME):
+    driver = Driver(storage_home=storage_home)
+    # Blocks logged by the commit pipeline have to be in the store first
+    replay_wal(driver, WriteAheadLog(storage_home / "commit.wal"))
+
+    history = StateHistory(storage_home / "history.db")
+    block_metadata = BlockMetadataStore(storage_home, driver=driver)
+    history.truncate(block_metadata.height)
+    history.rollback(height, driver, str(time.time_ns()))
+
+    # The latest block keys are part of the state and were rolled back too
+    block_metadata.set(
+        h=bytes.fromhex(driver.get(c.LATEST_BLOCK_HASH_KEY)),
+        height=driver.get(c.LATEST_BLOCK_HEIGHT_KEY)
+    )
+    # The tracked validator set belongs to the latest height, it is seeded
+    # again on restart
+    validators_path = storage_home / ValidatorHandler.FILENAME
+    if validators_path.exists():
+        validators_path.unlink()
+    print(f'State rolled back to height {block_metadata.height}')
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--height', type=int, required=True)
+    parser.add_argument('--storage-home', type=str, required=False)
+    args = parser.parse_args()
+    storage_home = Path(args.storage_home) if args.storage_home is not None else c.STORAGE_HOME
+    main(args.height, storage_home)
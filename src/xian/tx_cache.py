@@ -0,0 +1,62 @@
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+
+class CachedTx:
+    __slots__ = ("tx", "payload_str", "signature_valid")
+
+    def __init__(self, tx: dict, payload_str: str, signature_valid: bool):
+        self.tx = tx
+        self.payload_str = payload_str
+        self.signature_valid = signature_valid
+
+
+class VerifiedTxCache:
+    """
+    Bounded LRU of transactions that passed decoding and formatting in
+    CheckTx, keyed by the hash of the raw tx bytes.
+
+    CometBFT rechecks every remaining mempool tx after each block. With the
+    decoded tx and its signature verdict cached, a recheck only has to run
+    the state dependent checks (nonce, balance, stamps) again.
+    """
+
+    def __init__(self, max_size: int = 5000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(raw_tx: bytes) -> bytes:
+        return hashlib.sha256(raw_tx).digest()
+
+    def get(self, raw_tx: bytes) -> CachedTx | None:
+        key = self.key(raw_tx)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def add(self, raw_tx: bytes, tx: dict, payload_str: str, signature_valid: bool) -> CachedTx:
+        entry = CachedTx(tx, payload_str, signature_valid)
+        key = self.key(raw_tx)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def discard(self, raw_tx: bytes) -> None:
+        with self._lock:
+            self._entries.pop(self.key(raw_tx), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,36 @@
+MERKLE_APP_HASH = "merkle_app_hash"
+STATE_ROOT = "state_root"
+BATCHED_REWARDS = "batched_rewards"
+
+KNOWN_UPGRADES = (
+    MERKLE_APP_HASH,
+    STATE_ROOT,
+    BATCHED_REWARDS,
+)
+
+
+class Upgrades:
+    """
+    Consensus changes that take effect at a block height.
+
+    The heights come from the "upgrades" section of genesis.json, e.g.
+    {"upgrades": {"merkle_app_hash": 120000}}. Every node of a chain has to
+    use the same heights, an upgrade that is not listed never activates,
+    so existing chains keep their behaviour until they schedule it.
+    """
+
+    def __init__(self, heights: dict = None):
+        heights = heights or {}
+        for name, height in heights.items():
+            if name not in KNOWN_UPGRADES:
+                raise ValueError(f"Unknown upgrade {name} in genesis")
+            if type(height) is not int or height < 0:
+                raise ValueError(f"Invalid height {height} for upgrade {name}")
+        self.heights = dict(heights)
+
+    def is_active(self, name: str, height: int) -> bool:
+        activation = self.heights.get(name)
+        return activation is not None and height >= activation
+
+    def is_scheduled(self, name: str) -> bool:
+        return name in self.heights
@@ -1,3 +1,4 @@
+import os
 import binascii
 import marshal
 import json
@@ -71,75 +72,89 @@ def is_compiled_key(key):
         return True
     return False
 
-def create_latest_block_json_if_not_exists():
-    try:
-        with open(f"{c.STORAGE_HOME}/__latest_block.json", "x") as f:
-            json.dump({"hash": "", "height": 0}, f)
-    except FileExistsError:
-        pass
+class BlockMetadataStore:
+    """
+    Hash and height of the latest committed block.
+
+    The values are kept in memory and persisted together. commit stages
+    them as state writes, so they become durable with the hard_apply of
+    the block, and then replaces __latest_block.json in one atomic,
+    fsynced write. On load the more recent of the two copies wins, which
+    covers a crash between the hard_apply and the file write.
+    """
+
+    FILENAME = "__latest_block.json"
+
+    def __init__(self, storage_home, driver=None):
+        self.path = os.path.join(str(storage_home), self.FILENAME)
+        self.driver = driver
+        self.hash = b""
+        self.height = 0
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r") as f:
+                latest_block = json.load(f)
+            self.hash = bytes.fromhex(latest_block.get("hash") or "")
+            self.height = latest_block.get("height") or 0
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            raise Exception(f"Error decoding {self.FILENAME}")
+
+        if self.driver is not None:
+            height = self.driver.get(c.LATEST_BLOCK_HEIGHT_KEY)
+            if height is not None and height > self.height:
+                self.hash = bytes.fromhex(self.driver.get(c.LATEST_BLOCK_HASH_KEY))
+                self.height = height
+
+    def stage(self, h: bytes, height: int) -> None:
+        """
+        Set the values and write them to the pending state, to be
+        persisted with the next hard_apply
+        """
+        self.hash = h
+        self.height = height
+        if self.driver is not None:
+            self.driver.set(c.LATEST_BLOCK_HASH_KEY, h.hex())
+            self.driver.set(c.LATEST_BLOCK_HEIGHT_KEY, height)
+
+    def set(self, h: bytes = None, height: int = None) -> None:
+        if h is not None:
+            self.hash = h
+        if height is not None:
+            self.height = height
+        self.persist()
+
+    def persist(self) -> None:
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"hash": self.hash.hex(), "height": self.height}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # Make the rename itself durable
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
 
 
 def get_latest_block_hash():
-    # Get the latest block hash from the json file
-    create_latest_block_json_if_not_exists()
-    try:
-        with open(f"{c.STORAGE_HOME}/__latest_block.json", "r") as f:
-            latest_block = json.load(f)
-            latest_hash = bytes.fromhex(latest_block.get("hash"))
-    except FileNotFoundError:
-        raise Exception("__latest_block.json not found")
-    except json.JSONDecodeError:
-        raise Exception("Error decoding __latest_block.json")
-
-    return latest_hash
+    return BlockMetadataStore(c.STORAGE_HOME).hash
 
 
 def set_latest_block_hash(h):
-    # Set the latest block hash in the json file
-    create_latest_block_json_if_not_exists()
-    try:
-        with open(f"{c.STORAGE_HOME}/__latest_block.json", "r") as f:
-            latest_block = json.load(f)
-        
-        # Update the hash while keeping the height intact
-        latest_block["hash"] = h.hex()
-
-        with open(f"{c.STORAGE_HOME}/__latest_block.json", "w") as f:
-            json.dump(latest_block, f)
-    except FileNotFoundError:
-        raise Exception("__latest_block.json not found")
-    except json.JSONDecodeError:
-        raise Exception("Error decoding __latest_block.json")
+    BlockMetadataStore(c.STORAGE_HOME).set(h=h)
 
 
 def get_latest_block_height():
-    # Get the latest block height from the json file
-    create_latest_block_json_if_not_exists()
-    try:
-        with open(f"{c.STORAGE_HOME}/__latest_block.json", "r") as f:
-            latest_block = json.load(f)
-            latest_height = latest_block.get("height")
-    except FileNotFoundError:
-        raise Exception("__latest_block.json not found")
-    except json.JSONDecodeError:
-        raise Exception("Error decoding __latest_block.json")
-
-    return latest_height
+    return BlockMetadataStore(c.STORAGE_HOME).height
 
 
 def set_latest_block_height(h):
-    # Set the latest block height in the json file
-    create_latest_block_json_if_not_exists()
-    try:
-        with open(f"{c.STORAGE_HOME}/__latest_block.json", "r") as f:
-            latest_block = json.load(f)
-        
-        # Update the height while keeping the hash intact
-        latest_block["height"] = h
-
-        with open(f"{c.STORAGE_HOME}/__latest_block.json", "w") as f:
-            json.dump(latest_block, f)
-    except FileNotFoundError:
-        raise Exception("__latest_block.json not found")
-    except json.JSONDecodeError:
-        raise Exception("Error decoding __latest_block.json")
\ No newline at end of file
+    BlockMetadataStore(c.STORAGE_HOME).set(height=h)
@@ -0,0 +1,160 @@
+import json
+import binascii
+
+from json.decoder import scanstring, WHITESPACE
+from loguru import logger
+
+_decoder = json.JSONDecoder()
+_payload_key = '"payload":'
+
+
+class DecodedTransaction:
+    """
+    A transaction decoded from its wire bytes.
+
+    tx is the parsed transaction and payload_str the exact text of the
+    signed payload as it appears on the wire.
+    """
+
+    __slots__ = ("tx", "payload_str")
+
+    def __init__(self, tx: dict, payload_str: str):
+        self.tx = tx
+        self.payload_str = payload_str
+
+
+def decode_transaction(raw) -> DecodedTransaction:
+    """
+    Decode hex encoded transaction bytes.
+
+    The top level object is walked once with the C scanner of the json
+    module, which also yields the exact span of the payload. Anything the
+    fast path does not handle exactly like the legacy decoding (payload
+    key repeated or not where the legacy search finds it first, escaped
+    backslashes before a quote, NaN) goes through the legacy path, so
+    results and errors are identical.
+    """
+    if type(raw) is not bytes:
+        return decode_transaction_legacy(raw)
+
+    try:
+        tx_bytes = binascii.unhexlify(raw)
+        tx_str = tx_bytes.decode("utf-8")
+        decoded = _decode_fast(tx_str)
+    except ValueError:
+        # Also covers binascii.Error, UnicodeDecodeError and JSONDecodeError
+        decoded = None
+
+    if decoded is None:
+        return decode_transaction_legacy(raw)
+
+    tx, start, end = decoded
+    return DecodedTransaction(tx, tx_str[start:end])
+
+
+def _decode_fast(s: str):
+    """
+    Returns (tx, payload_start, payload_end) or None if the legacy path
+    has to decide
+    """
+    end = WHITESPACE.match(s, 0).end()
+    if s[end:end + 1] != "{":
+        return None
+
+    tx = {}
+    span = None
+    end = WHITESPACE.match(s, end + 1).end()
+    if s[end:end + 1] == "}":
+        return None
+
+    while True:
+        if s[end:end + 1] != '"':
+            return None
+        key_start = end
+        key, end = scanstring(s, end + 1)
+        end = WHITESPACE.match(s, end).end()
+        if s[end:end + 1] != ":":
+            return None
+        end = WHITESPACE.match(s, end + 1).end()
+
+        value, value_end = _decoder.raw_decode(s, end)
+
+        if key == "payload":
+            # The legacy search takes the first '"payload":' in the string
+            if span is not None or s.find(_payload_key) != key_start:
+                return None
+            if type(value) is not dict:
+                return None
+            span = (end, value_end)
+        tx[key] = value
+
+        end = WHITESPACE.match(s, value_end).end()
+        nextchar = s[end:end + 1]
+        if nextchar == "}":
+            break
+        if nextchar != ",":
+            return None
+        end = WHITESPACE.match(s, end + 1).end()
+
+    if span is None or WHITESPACE.match(s, end + 1).end() != len(s):
+        return None
+
+    payload_str = s[span[0]:span[1]]
+    # The legacy brace matcher mistakes the quote of '\\"' for an escaped
+    # one, and NaN never compares equal in its payload check
+    if '\\\\"' in payload_str or "NaN" in payload_str:
+        return None
+
+    return tx, span[0], span[1]
+
+
+def decode_transaction_legacy(raw) -> DecodedTransaction:
+    tx_bytes = raw
+    tx_hex = tx_bytes.decode("utf-8")
+    tx_decoded_bytes = bytes.fromhex(tx_hex)
+    tx_str = tx_decoded_bytes.decode("utf-8")
+    tx_json = json.loads(tx_str)
+    payload_str = extract_payload_string(tx_str)
+
+    assert json.loads(payload_str) == tx_json["payload"], 'Invalid payload'
+    return DecodedTransaction(tx_json, payload_str)
+
+
+def extract_payload_string(json_str):
+    try:
+        # Find the start of the 'payload' object
+        start_index = json_str.find('"payload":')
+        if start_index == -1:
+            raise ValueError("No 'payload' found in the provided JSON string.")
+
+        # Find the opening brace of the 'payload' object
+        start_brace_index = json_str.find('{', start_index)
+        if start_brace_index == -1:
+            raise ValueError("Malformed JSON: No opening brace for 'payload'.")
+
+        # Use a stack to find the matching closing brace, ignoring braces within strings
+        brace_count = 0
+        in_string = False
+        i = start_brace_index
+        while i < len(json_str):
+            char = json_str[i]
+
+            if char == '"' and (i == 0 or json_str[i-1] != '\\'):
+                in_string = not in_string
+
+            if not in_string:
+                if char == '{':
+                    brace_count += 1
+                elif char == '}':
+                    brace_count -= 1
+
+            # When brace_count is zero, we've found the matching closing brace
+            if brace_count == 0:
+                return json_str[start_brace_index:i+1]
+
+            i += 1
+
+        raise ValueError("Malformed JSON: No matching closing brace for 'payload'.")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+        raise
@@ -1,4 +1,3 @@
-import json
 import binascii
 import hashlib
 import decimal
@@ -7,6 +6,7 @@ from typing import Tuple
 from contracting.stdlib.bridge.decimal import ContractingDecimal
 from contracting.stdlib.bridge.time import Datetime
 from loguru import logger
+from xian.utils.decoder import decode_transaction, extract_payload_string
 
 
 def encode_str(value):
@@ -14,15 +14,8 @@ def encode_str(value):
 
 
 def decode_transaction_bytes(raw) -> Tuple[dict, str]:
-    tx_bytes = raw
-    tx_hex = tx_bytes.decode("utf-8")
-    tx_decoded_bytes = bytes.fromhex(tx_hex)
-    tx_str = tx_decoded_bytes.decode("utf-8")
-    tx_json = json.loads(tx_str)
-    payload_str = extract_payload_string(tx_str)
-
-    assert json.loads(payload_str) == tx_json["payload"], 'Invalid payload'
-    return tx_json, payload_str
+    decoded = decode_transaction(raw)
+    return decoded.tx, decoded.payload_str
 
 
 def encode_transaction_bytes(tx_str: str) -> bytes:
@@ -31,45 +24,6 @@ def encode_transaction_bytes(tx_str: str) -> bytes:
     return tx_hex.encode("utf-8")
 
 
-def extract_payload_string(json_str):
-    try:
-        # Find the start of the 'payload' object
-        start_index = json_str.find('"payload":')
-        if start_index == -1:
-            raise ValueError("No 'payload' found in the provided JSON string.")
-        
-        # Find the opening brace of the 'payload' object
-        start_brace_index = json_str.find('{', start_index)
-        if start_brace_index == -1:
-            raise ValueError("Malformed JSON: No opening brace for 'payload'.")
-
-        # Use a stack to find the matching closing brace, ignoring braces within strings
-        brace_count = 0
-        in_string = False
-        i = start_brace_index
-        while i < len(json_str):
-            char = json_str[i]
-            
-            if char == '"' and (i == 0 or json_str[i-1] != '\\'):
-                in_string = not in_string
-            
-            if not in_string:
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-            
-            # When brace_count is zero, we've found the matching closing brace
-            if brace_count == 0:
-                return json_str[start_brace_index:i+1]
-            
-            i += 1
-        
-        raise ValueError("Malformed JSON: No matching closing brace for 'payload'.")
-    except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
-        raise
-
 def hash_bytes(bytes):
     return hashlib.sha256(bytes).hexdigest()
 
@@ -0,0 +1,124 @@
+import hashlib
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def leaf_hash(data: bytes) -> bytes:
+    return hashlib.sha3_256(LEAF_PREFIX + data).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha3_256(NODE_PREFIX + left + right).digest()
+
+
+class MerkleAccumulator:
+    """
+    Append-only binary Merkle tree with the shape and domain separated
+    hashing of RFC 6962, using sha3_256.
+
+    levels[h] holds the roots of all complete subtrees of 2**h leaves, so an
+    append adds O(log n) nodes and the root folds the O(log n) peaks of the
+    tree. Leaves can be given a key to look their inclusion proof up by.
+    """
+
+    def __init__(self):
+        self.levels = [[]]
+        self.keys = {}
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    def append(self, data: bytes, key=None) -> int:
+        index = len(self.levels[0])
+        node = leaf_hash(data)
+        self.levels[0].append(node)
+        if key is not None:
+            self.keys.setdefault(key, index)
+
+        # Every complete pair on a level completes a node one level up
+        height = 0
+        while len(self.levels[height]) % 2 == 0:
+            level = self.levels[height]
+            node = node_hash(level[-2], level[-1])
+            height += 1
+            if height == len(self.levels):
+                self.levels.append([])
+            self.levels[height].append(node)
+        return index
+
+    def root(self) -> bytes:
+        size = len(self)
+        if size == 0:
+            return hashlib.sha3_256(b"").digest()
+        return self._subtree_root(0, size)
+
+    def _subtree_root(self, start: int, size: int) -> bytes:
+        if size & (size - 1) == 0:
+            height = size.bit_length() - 1
+            return self.levels[height][start >> height]
+        # Left subtree is the largest power of two smaller than size
+        split = 1 << (size.bit_length() - 1)
+        return node_hash(
+            self._subtree_root(start, split),
+            self._subtree_root(start + split, size - split)
+        )
+
+    def proof(self, index: int) -> list[bytes]:
+        """
+        Audit path of the leaf at index for the current tree, sibling
+        hashes from the leaf up
+        """
+        size = len(self)
+        if not 0 <= index < size:
+            raise IndexError(f"No leaf {index} in a tree of {size} leaves")
+
+        path = []
+        start = 0
+        while size > 1:
+            split = 1 << ((size - 1).bit_length() - 1)
+            if index - start < split:
+                path.append(self._subtree_root(start + split, size - split))
+                size = split
+            else:
+                path.append(self._subtree_root(start, split))
+                start += split
+                size -= split
+        path.reverse()
+        return path
+
+    def proof_for(self, key) -> dict | None:
+        index = self.keys.get(key)
+        if index is None:
+            return None
+        return {
+            "index": index,
+            "size": len(self),
+            "leaf": self.levels[0][index].hex(),
+            "proof": [node.hex() for node in self.proof(index)],
+            "root": self.root().hex(),
+        }
+
+
+def verify_inclusion(leaf: bytes, index: int, size: int, proof: list[bytes], root: bytes) -> bool:
+    """
+    Check an audit path as in RFC 9162, leaf is the leaf hash
+    """
+    if index >= size:
+        return False
+
+    fn, sn = index, size - 1
+    node = leaf
+    for sibling in proof:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            node = node_hash(sibling, node)
+            while fn & 1 == 0 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            node = node_hash(node, sibling)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and node == root
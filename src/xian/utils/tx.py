@@ -75,7 +75,46 @@ def recurse_rules(d: dict, rule: dict | Callable):
                 return False
 
     return True
-    
+
+
+def compile_rules(rule: dict | Callable) -> Callable:
+    """
+    Turn a rule dict into a validation function with the same results as
+    recurse_rules(d, rule). The rules are resolved once here, so checking
+    a dict is a single pass over its fields without any isinstance or
+    callable tests.
+    """
+    if callable(rule):
+        return rule
+
+    fields = tuple(
+        (key, compile_rules(subrule), callable(subrule))
+        for key, subrule in rule.items()
+    )
+
+    def validate(d) -> bool:
+        for key, check, is_leaf in fields:
+            arg = d[key]
+            arg_type = type(arg)
+
+            if arg_type is list:
+                for a in arg:
+                    if not check(a):
+                        return False
+
+            # A nested rule dict only applies to dict values
+            elif (is_leaf or arg_type is dict) and not check(arg):
+                return False
+
+        return True
+
+    return validate
+
+
+TRANSACTION_KEYS = frozenset(TRANSACTION_RULES)
+TRANSACTION_PAYLOAD_KEYS = frozenset(TRANSACTION_PAYLOAD_RULES)
+transaction_is_formatted = compile_rules(TRANSACTION_RULES)
+
 
 def check_enough_stamps(
         balance: object,
@@ -127,18 +166,19 @@ def check_tx_keys(tx):
     if not payload["stamps_supplied"]:
         raise TransactionException("Payload key 'stamps_supplied' is missing")
 
-    keys = list(payload.keys())
-    keys_are_valid = list(
-        map(lambda key: key in keys, list(TRANSACTION_PAYLOAD_RULES.keys()))
-    )
-
-    if not all(keys_are_valid) and len(keys) == len(list(TRANSACTION_PAYLOAD_RULES.keys())):
+    keys = payload.keys()
+    if len(keys) == len(TRANSACTION_PAYLOAD_KEYS) and not TRANSACTION_PAYLOAD_KEYS <= keys:
         raise TransactionException("Payload keys are not valid")
 
 
 def check_tx_formatting(tx: dict):
     check_tx_keys(tx)
-    check_format(tx, TRANSACTION_RULES)
+
+    # check_format(tx, TRANSACTION_RULES) with the rules compiled
+    if tx.keys() != TRANSACTION_KEYS:
+        raise TransactionException("Transaction has unexpected or missing keys")
+    if not transaction_is_formatted(tx):
+        raise TransactionException("Transaction has wrongly formatted dictionary")
 
 def check_contract_name(contract, function, name):
     if (
@@ -156,6 +196,12 @@ def validate_transaction(client, nonce_storage, tx):
     # Check if nonce is greater than the current nonce
     nonce_storage.check_nonce(tx)
 
+    validate_transaction_state(client, tx)
+
+
+def validate_transaction_state(client, tx):
+    # Checks that depend on state, these have to be repeated on every recheck
+
     # Get the senders balance and the current stamp rate
     try:
         balance = client.get_var(
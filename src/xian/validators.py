@@ -1,43 +1,114 @@
-from cometbft.abci.v1beta1.types_pb2 import ValidatorUpdate
-from cometbft.crypto.v1.keys_pb2 import PublicKey
-import requests
-import base64
-import logging
-
-
-class ValidatorHandler:
-    def __init__(self, app):
-        self.client = app.client
-       
-    def get_validators_from_state(self) -> list[str]:
-        validators = self.client.raw_driver.get("masternodes.nodes")
-        return validators
-    
-    def get_tendermint_validators(self) -> list[str]:
-        try:
-            response = requests.get("http://localhost:26657/validators")
-            validators = [base64.b64decode(validator['pub_key']['value']).hex() for validator in response.json()['result']['validators'] if int(validator['voting_power']) > 0]
-        except Exception as e:
-            validators = []
-        return validators
-    
-    def to_bytes(self, data: str) -> bytes:
-        return bytes.fromhex(data)
-    
-    def build_validator_updates(self, height) -> list[ValidatorUpdate]:
-        validators_state = self.get_validators_from_state()
-        validators_tendermint = self.get_tendermint_validators()
-        if len(validators_tendermint) == 0:
-            logging.error("Failed to get validators from tendermint")
-            return []
-        updates = []
-        for validator in validators_state:
-            if validator not in validators_tendermint:
-                updates.append(ValidatorUpdate(pub_key=PublicKey(ed25519=self.to_bytes(validator)), power=10))
-                logging.info(f"Adding {validator} to tendermint validators")
-        for validator in validators_tendermint:
-            if validator not in validators_state:
-                updates.append(ValidatorUpdate(pub_key=PublicKey(ed25519=self.to_bytes(validator)), power=0))
-                logging.info(f"Removing {validator} from tendermint validators")
-
-        return updates
+from cometbft.abci.v1beta1.types_pb2 import ValidatorUpdate
+from cometbft.crypto.v1.keys_pb2 import PublicKey
+import requests
+import base64
+import logging
+import json
+import os
+
+
+class ValidatorHandler:
+    """
+    Keeps track of the validator set that CometBFT has active, as hex
+    public keys. It is seeded from InitChain, follows the updates this app
+    returns from FinalizeBlock and is persisted at commit, so building the
+    updates of a block needs no call to the CometBFT RPC.
+
+    The set depends on what this node has seen, e.g. a set seeded from the
+    RPC after a restart, so it is kept in __validators.json next to the
+    state and never in it, where it would be part of the state root.
+    """
+
+    FILENAME = "__validators.json"
+
+    def __init__(self, app, storage_home):
+        self.client = app.client
+        self.path = os.path.join(str(storage_home), self.FILENAME)
+        self.validators: set[str] = None
+        self._dirty = False
+       
+    def get_validators_from_state(self) -> list[str]:
+        validators = self.client.raw_driver.get("masternodes.nodes")
+        return validators
+    
+    def get_tendermint_validators(self) -> list[str]:
+        try:
+            response = requests.get("http://localhost:26657/validators")
+            validators = [base64.b64decode(validator['pub_key']['value']).hex() for validator in response.json()['result']['validators'] if int(validator['voting_power']) > 0]
+        except Exception as e:
+            validators = []
+        return validators
+    
+    def to_bytes(self, data: str) -> bytes:
+        return bytes.fromhex(data)
+
+    def set_validators(self, validators) -> None:
+        """
+        Set the tracked validators, persisted with the next commit
+        """
+        self.validators = set(validators)
+        self._dirty = True
+
+    def persist(self) -> None:
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(sorted(self.validators), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def commit(self) -> None:
+        if self._dirty:
+            self.persist()
+
+    def init_validators(self, validator_updates) -> None:
+        # The genesis validators from RequestInitChain
+        self.set_validators(
+            v.pub_key.ed25519.hex() for v in validator_updates if v.power > 0
+        )
+        self.persist()
+
+    def load_validators(self) -> None:
+        try:
+            with open(self.path, "r") as f:
+                self.validators = set(json.load(f))
+            return
+        except FileNotFoundError:
+            pass
+        # Chains started before the set was tracked, ask CometBFT once
+        validators = self.get_tendermint_validators()
+        if len(validators) == 0:
+            logging.error("Failed to get validators from tendermint, assuming masternodes.nodes")
+            validators = self.get_validators_from_state() or []
+        self.set_validators(validators)
+        # The next restart has to start from the same set
+        self.persist()
+
+    def build_validator_updates(self, height, nodes_changed: bool = True) -> list[ValidatorUpdate]:
+        if self.validators is None:
+            self.load_validators()
+            nodes_changed = True
+
+        # The active set can only drift from masternodes.nodes when a tx of this block changed it
+        if not nodes_changed:
+            return []
+
+        validators_state = self.get_validators_from_state() or []
+        state_set = set(validators_state)
+
+        updates = []
+        for validator in dict.fromkeys(validators_state):
+            if validator not in self.validators:
+                updates.append(ValidatorUpdate(pub_key=PublicKey(ed25519=self.to_bytes(validator)), power=10))
+                logging.info(f"Adding {validator} to tendermint validators")
+        for validator in sorted(self.validators - state_set):
+            updates.append(ValidatorUpdate(pub_key=PublicKey(ed25519=self.to_bytes(validator)), power=0))
+            logging.info(f"Removing {validator} from tendermint validators")
+
+        if updates:
+            self.set_validators(state_set)
+
+        return updates
@@ -6,10 +6,12 @@ import asyncio
 import signal
 
 from loguru import logger
+from pathlib import Path
 from datetime import timedelta, datetime
 from abci.server import ABCIServer
 from xian.constants import Constants
 from xian.services.bds.bds import BDS
+from xian.services.simulator_client import SimulatorClient
 from contracting.client import ContractingClient
 
 from xian.methods import (
@@ -22,16 +24,33 @@ from xian.methods import (
     process_proposal,
     prepare_proposal,
     query,
+    state_sync,
 )
 from xian.validators import ValidatorHandler
-from xian.nonce import NonceStorage
+from xian.nonce import NonceStorage, PendingNonceIndex
+from xian.state import CommittedState
+from xian.tx_cache import VerifiedTxCache
+from xian.verifier import SignatureVerifier
 from xian.processor import TxProcessor
 from xian.rewards import RewardsHandler
+from xian.parameters import ParameterCache
+from xian.parallel import ParallelExecutor
+from xian.optimistic import OptimisticExecution
+from xian.proposal import ProposalBuilder
+from xian.upgrades import Upgrades, STATE_ROOT
+from xian.state_tree import StateTree
+from xian.commit_pipeline import CommitPipeline, WriteAheadLog, replay_wal
+from xian.snapshots import SnapshotStore, DEFAULT_CHUNK_SIZE
+from xian.history import StateHistory
+from xian.query_cache import QueryCache
+from xian.contract_index import ContractIndex
+from xian.key_index import KeyIndex
 
 from xian.utils.cometbft import (
     load_tendermint_config,
     load_genesis_data,
 )
+from xian.utils.block import BlockMetadataStore
 
 from abci.utils import get_logger
 
@@ -73,19 +92,112 @@ class Xian:
 
         self.client = ContractingClient(storage_home=constants.STORAGE_HOME)
         self.nonce_storage = NonceStorage(self.client)
-        self.validator_handler = ValidatorHandler(self)
-        self.tx_processor = TxProcessor(client=self.client)
-        self.rewards_handler = RewardsHandler(client=self.client)
+        # Mempool and query requests run in worker threads and only read committed state
+        self.committed_state = CommittedState(storage_home=constants.STORAGE_HOME)
+        self.committed_nonce_storage = NonceStorage(self.committed_state)
+        # Blocks committed before a crash may not be in the store yet
+        wal = WriteAheadLog(Path(constants.STORAGE_HOME) / "commit.wal")
+        replay_wal(self.client.raw_driver, wal)
+        self.commit_pipeline = None
+        if self.cometbft_config["xian"].get("async_commit", False):
+            self.commit_pipeline = CommitPipeline(self.client.raw_driver, wal, self.committed_state)
+        self.block_metadata = BlockMetadataStore(constants.STORAGE_HOME, driver=self.client.raw_driver)
+        # Nonces of the txs in the mempool, rechecks tell which are still in it
+        self.pending_nonces = PendingNonceIndex(
+            self.committed_nonce_storage,
+            prune_unseen=self.cometbft_config.get("mempool", {}).get("recheck", True)
+        )
+        self.block_nonces = {}
+        self.loop = None
+        # Decoded txs and signature verdicts, sized to hold the whole mempool
+        self.tx_cache = VerifiedTxCache(
+            max_size=self.cometbft_config.get("mempool", {}).get("size", 5000)
+        )
+        self.signature_verifier = SignatureVerifier()
+        self.validator_handler = ValidatorHandler(self, constants.STORAGE_HOME)
+        # Parameter reads, scoped to the block being executed and to the
+        # committed height that CheckTx validates against
+        self.block_parameters = ParameterCache(self.client)
+        self.committed_parameters = ParameterCache(self.committed_state)
+        # Methods and variables of the deployed contracts for queries
+        self.contract_index = ContractIndex(Path(constants.STORAGE_HOME) / "contracts.db", self.committed_state)
+        self.tx_processor = TxProcessor(client=self.client, parameters=self.block_parameters)
+        self.rewards_handler = RewardsHandler(client=self.client, parameters=self.block_parameters)
         self.current_block_meta: dict = None
         self.fingerprint_hashes = []
         self.merkle_root_hash = None
+        self.app_hash_tree = None
+        self.committed_app_hash_tree = None
         self.chain_id = self.genesis.get("chain_id", None)
+        self.upgrades = Upgrades(self.genesis.get("upgrades"))
+        # Authenticated index of the committed state, needed once the
+        # state root upgrade is scheduled and optional before for proofs
+        self.state_tree = None
+        if self.upgrades.is_scheduled(STATE_ROOT) or self.cometbft_config["xian"].get("state_tree", False):
+            self.state_tree = StateTree(Path(constants.STORAGE_HOME) / "state_tree.db")
+            self.sync_state_tree(self.block_metadata.height)
+        # Sorted keys of the state for paginated scans
+        self.key_index = None
+        if self.cometbft_config["xian"].get("key_index", True):
+            self.key_index = KeyIndex(Path(constants.STORAGE_HOME) / "key_index.db")
+            self.sync_key_index(self.block_metadata.height)
+
+        # State sync snapshots, taken every snapshot_interval heights
+        self.snapshot_interval = self.cometbft_config["xian"].get("snapshot_interval", 0)
+        self.snapshot_store = None
+        if self.snapshot_interval > 0:
+            self.snapshot_store = SnapshotStore(
+                Path(constants.STORAGE_HOME) / "snapshots",
+                chunk_size=self.cometbft_config["xian"].get("snapshot_chunk_size", DEFAULT_CHUNK_SIZE),
+                keep_recent=self.cometbft_config["xian"].get("snapshot_keep_recent", 2)
+            )
+        self.snapshot_restore = None
+        # Restore snapshots that can't be verified against the app hash
+        self.snapshot_trust_unverified = self.cometbft_config["xian"].get("snapshot_trust_unverified", False)
+        # Responses of repeated queries, dropped when a block writes what they read
+        self.query_cache = None
+        if self.cometbft_config["xian"].get("query_cache_size", 0) > 0:
+            self.query_cache = QueryCache(max_size=self.cometbft_config["xian"]["query_cache_size"])
 
         self.block_service_mode = self.cometbft_config["xian"]["block_service_mode"]
+        # Persistent connections to the simulator of a block service node
+        self.simulator = SimulatorClient(
+            constants.SIMULATOR_SOCKET,
+            size=self.cometbft_config["xian"].get("simulator_connections", 2),
+            timeout=self.cometbft_config["xian"].get("simulator_timeout", 10)
+        )
 
         self.pruning_enabled = self.cometbft_config["xian"]["pruning_enabled"]
         # If pruning is enabled, this is the number of blocks to keep history for
         self.blocks_to_keep = self.cometbft_config["xian"]["blocks_to_keep"]
+
+        # Versions of the state for queries at past heights and rollbacks,
+        # as many heights as blocks are kept, or all on archive nodes
+        self.state_history = None
+        if self.cometbft_config["xian"].get("state_history", False):
+            self.state_history = StateHistory(
+                Path(constants.STORAGE_HOME) / "history.db",
+                keep_heights=self.blocks_to_keep if self.pruning_enabled else 0
+            )
+            self.state_history.truncate(self.block_metadata.height)
+
+        # Speculative parallel execution of the txs of a block
+        self.parallel_executor = None
+        if self.cometbft_config["xian"].get("parallel_execution", False):
+            self.parallel_executor = ParallelExecutor(
+                storage_home=constants.STORAGE_HOME,
+                workers=self.cometbft_config["xian"].get("parallel_workers") or None
+            )
+        # Execution of proposed blocks before they are decided
+        self.optimistic_execution_enabled = self.cometbft_config["xian"].get("optimistic_execution", False)
+        self.optimistic_execution = OptimisticExecution()
+        self.proposal_builder = ProposalBuilder(
+            tx_cache=self.tx_cache,
+            signature_verifier=self.signature_verifier,
+            nonce_index=self.pending_nonces,
+            chain_id=self.chain_id,
+            ordering=self.cometbft_config["xian"].get("proposal_ordering", "fifo")
+        )
         self.app_version = 1
         if self.chain_id is None:
             raise ValueError("No value set for 'chain_id' in genesis block")
@@ -104,10 +216,76 @@ class Xian:
     @classmethod
     async def create(cls, constants=Constants()):
         self = cls(constants=constants)
+        self.loop = asyncio.get_running_loop()
+        # Queries fall back to parsing the contracts until this is done
+        self.loop.run_in_executor(None, self.contract_index.warm_up)
         if self.block_service_mode:
             self.bds = await BDS().init(cometbft_genesis=self.genesis)
         return self
 
+    def sync_state_tree(self, height: int, force: bool = False) -> None:
+        """
+        Rebuild the state tree from the committed state if it doesn't
+        belong to the committed height
+        """
+        if self.state_tree is None or (self.state_tree.height == height and not force):
+            return
+        logger.info(f"State tree is at height {self.state_tree.height}, rebuilding for {height}")
+        self.state_tree.rebuild(self.state_tree_items(), height)
+
+    def sync_key_index(self, height: int, force: bool = False) -> None:
+        """
+        Rebuild the key index from the committed state if it doesn't
+        belong to the committed height
+        """
+        if self.key_index is None or (self.key_index.height == height and not force):
+            return
+        logger.info(f"Key index is at height {self.key_index.height}, rebuilding for {height}")
+        self.key_index.rebuild(self.committed_state.keys(), height)
+
+    def state_tree_items(self):
+        """
+        (key, value) pairs of the committed state that the state tree covers
+        """
+        return (
+            (key, self.committed_state.get(key)) for key in self.committed_state.keys()
+            # Written at commit, after the block's root was computed
+            if key not in (Constants.LATEST_BLOCK_HASH_KEY, Constants.LATEST_BLOCK_HEIGHT_KEY)
+        )
+
+    async def wait_for_commit(self):
+        """
+        Wait until the state of the last committed block is applied, before
+        the driver is used for the next block
+        """
+        if self.commit_pipeline is not None:
+            await self.commit_pipeline.wait()
+
+    async def on_app_loop(self, coro):
+        """
+        Await a coroutine on the main event loop.
+        Handlers running in worker threads use this for resources bound to
+        the main loop, like the BDS connection pool.
+        """
+        if asyncio.get_running_loop() is self.loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    async def shutdown(self):
+        """
+        Not part of ABCI. Called by the server when it stops, drains the
+        background work that has to reach the disk and stops the pools.
+        """
+        if self.commit_pipeline is not None:
+            self.commit_pipeline.shutdown()
+        if self.snapshot_store is not None:
+            self.snapshot_store.shutdown()
+        if self.parallel_executor is not None:
+            self.parallel_executor.shutdown()
+        self.optimistic_execution.shutdown()
+        self.signature_verifier.shutdown()
+        await self.simulator.close()
+
     async def echo(self, req):
         """
         Echo a string to test an ABCI client/server implementation
@@ -137,6 +315,13 @@ class Xian:
         res = await check_tx.check_tx(self, raw_tx)
         return res
 
+    async def prepare_check_tx(self, raw_txs):
+        """
+        Not part of ABCI. Called by the server with all txs of pipelined
+        CheckTx requests before they are checked one by one.
+        """
+        await check_tx.prepare_check_tx(self, raw_txs)
+
     async def finalize_block(self, req):
         """
         Contains the fields of the newly decided block.
@@ -166,6 +351,34 @@ class Xian:
         res = await prepare_proposal.prepare_proposal(self, req)
         return res
 
+    async def list_snapshots(self, req):
+        """
+        Snapshots of the state that this node can serve to peers
+        """
+        res = await state_sync.list_snapshots(self, req)
+        return res
+
+    async def offer_snapshot(self, req):
+        """
+        Offered a snapshot by a peer during state sync, decide whether to restore it
+        """
+        res = await state_sync.offer_snapshot(self, req)
+        return res
+
+    async def load_snapshot_chunk(self, req):
+        """
+        Load a chunk of a local snapshot to send it to a peer
+        """
+        res = await state_sync.load_snapshot_chunk(self, req)
+        return res
+
+    async def apply_snapshot_chunk(self, req):
+        """
+        Apply a chunk of the snapshot that is being restored
+        """
+        res = await state_sync.apply_snapshot_chunk(self, req)
+        return res
+
     async def query(self, req):
         """
         Query the application state
@@ -39,6 +39,8 @@ class TestCheckTx(unittest.IsolatedAsyncioTestCase):
         self.app.current_block_meta = {"height": 0, "nanos": 0}
         self.app.chain_id = "xian-testnet-1"
         self.app.client.raw_driver.set("currency.balances:e9e8aad29ce8e94fd77d9c55582e5e0c57cf81c552ba61c0d4e34b0dc11fd931", 100000)
+        # CheckTx reads committed state only
+        self.app.client.raw_driver.hard_apply("0")
         self.handler = ProtocolHandler(self.app)
 
     async def asyncTearDown(self):
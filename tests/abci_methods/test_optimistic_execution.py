@@ -0,0 +1,121 @@
+import unittest
+import logging
+import nacl.signing
+
+from io import BytesIO
+from fixtures.mock_constants import MockConstants
+from xian.xian_abci import Xian
+from xian.utils.block import store_genesis_block
+from abci.server import ProtocolHandler
+from abci.utils import read_messages
+from cometbft.abci.v1beta3.types_pb2 import (
+    Request,
+    Response,
+    RequestFinalizeBlock,
+    RequestProcessProposal,
+)
+
+from utils import setup_fixtures, teardown_fixtures, make_tx
+# Disable any kind of logging
+logging.disable(logging.CRITICAL)
+
+ALICE, BOB = (nacl.signing.SigningKey(bytes([i]) * 32) for i in range(1, 3))
+HASH_A, HASH_B = b"\x0a" * 32, b"\x0b" * 32
+
+
+def address(key):
+    return key.verify_key.encode().hex()
+
+
+async def deserialize(raw: bytes) -> Response:
+    try:
+        resp = next(read_messages(BytesIO(raw), Response))
+        return resp
+    except Exception as e:
+        logging.error("Deserialization error: %s", e)
+        raise
+
+
+class TestOptimisticExecution(unittest.IsolatedAsyncioTestCase):
+
+    TXS_A = [
+        make_tx(ALICE, "currency", "transfer", {"amount": 100, "to": address(BOB)}, 1),
+        make_tx(BOB, "currency", "transfer", {"amount": 1_000_000, "to": address(ALICE)}, 1),
+    ]
+    TXS_B = [
+        make_tx(ALICE, "currency", "transfer", {"amount": 7, "to": "someone"}, 1),
+        make_tx(BOB, "currency", "transfer", {"amount": 3, "to": address(ALICE)}, 1),
+    ]
+
+    async def asyncSetUp(self):
+        self.app = None
+
+    async def asyncTearDown(self):
+        await self.stop_app()
+
+    async def start_app(self):
+        setup_fixtures()
+        self.app = await Xian.create(constants=MockConstants)
+        self.app.current_block_meta = {"height": 0, "nanos": 0}
+        await store_genesis_block(self.app.client, self.app.nonce_storage, self.app.genesis["abci_genesis"])
+        for key in (ALICE, BOB):
+            self.app.client.raw_driver.set(f"currency.balances:{address(key)}", 1000)
+        self.app.client.raw_driver.hard_apply("0")
+        self.app.optimistic_execution_enabled = True
+        self.handler = ProtocolHandler(self.app)
+
+    async def stop_app(self):
+        if self.app is not None:
+            await self.app.shutdown()
+            self.app = None
+        teardown_fixtures()
+
+    async def process_request(self, request_type, req):
+        raw = await self.handler.process(request_type, req)
+        resp = await deserialize(raw)
+        return resp
+
+    async def process_proposal(self, txs, block_hash):
+        request = Request(process_proposal=RequestProcessProposal(txs=txs, height=1, hash=block_hash))
+        await self.process_request("process_proposal", request)
+
+    async def finalize_block(self, txs, block_hash):
+        request = Request(finalize_block=RequestFinalizeBlock(txs=txs, height=1, hash=block_hash))
+        return (await self.process_request("finalize_block", request)).finalize_block
+
+    async def plain_finalize_block(self, txs, block_hash):
+        # FinalizeBlock of a node without optimistic execution
+        await self.start_app()
+        response = await self.finalize_block(txs, block_hash)
+        await self.stop_app()
+        return response
+
+    async def test_decided_block_was_executed(self):
+        expected = await self.plain_finalize_block(self.TXS_A, HASH_A)
+
+        await self.start_app()
+        await self.process_proposal(self.TXS_A, HASH_A)
+        self.assertTrue(self.app.optimistic_execution.pending)
+        self.assertEqual(await self.finalize_block(self.TXS_A, HASH_A), expected)
+        self.assertFalse(self.app.optimistic_execution.pending)
+
+    async def test_different_block_decided(self):
+        expected = await self.plain_finalize_block(self.TXS_B, HASH_B)
+
+        await self.start_app()
+        await self.process_proposal(self.TXS_A, HASH_A)
+        # The writes of the executed proposal must not leak into the decided block
+        self.assertEqual(await self.finalize_block(self.TXS_B, HASH_B), expected)
+
+    async def test_later_round_replaces_proposal(self):
+        expected = await self.plain_finalize_block(self.TXS_B, HASH_B)
+
+        await self.start_app()
+        await self.process_proposal(self.TXS_A, HASH_A)
+        await self.process_proposal(self.TXS_B, HASH_B)
+        self.assertEqual(self.app.optimistic_execution.key, (1, HASH_B.hex()))
+        self.assertEqual(await self.finalize_block(self.TXS_B, HASH_B), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
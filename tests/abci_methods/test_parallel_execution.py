@@ -0,0 +1,90 @@
+import unittest
+import logging
+import nacl.signing
+
+from io import BytesIO
+from fixtures.mock_constants import MockConstants
+from xian.constants import Constants as c
+from xian.xian_abci import Xian
+from xian.parallel import ParallelExecutor
+from xian.utils.block import store_genesis_block
+from abci.server import ProtocolHandler
+from abci.utils import read_messages
+from cometbft.abci.v1beta3.types_pb2 import (
+    Request,
+    Response,
+    RequestFinalizeBlock,
+)
+
+from utils import setup_fixtures, teardown_fixtures, make_tx
+# Disable any kind of logging
+logging.disable(logging.CRITICAL)
+
+ALICE, BOB, CAROL, DAVE = (nacl.signing.SigningKey(bytes([i]) * 32) for i in range(1, 5))
+
+
+def address(key):
+    return key.verify_key.encode().hex()
+
+
+async def deserialize(raw: bytes) -> Response:
+    try:
+        resp = next(read_messages(BytesIO(raw), Response))
+        return resp
+    except Exception as e:
+        logging.error("Deserialization error: %s", e)
+        raise
+
+
+class TestParallelExecution(unittest.IsolatedAsyncioTestCase):
+
+    # Txs that conflict with each other the ways speculative execution has to catch
+    TXS = [
+        # Same sender twice
+        make_tx(ALICE, "currency", "transfer", {"amount": 100, "to": address(CAROL)}, 1),
+        make_tx(ALICE, "currency", "transfer", {"amount": 5, "to": address(DAVE)}, 2),
+        # Only succeeds with the transfer into its balance above
+        make_tx(CAROL, "currency", "transfer", {"amount": 150, "to": address(BOB)}, 1),
+        # Fails
+        make_tx(BOB, "currency", "transfer", {"amount": 1_000_000, "to": address(ALICE)}, 1),
+        # Independent of all the others
+        make_tx(DAVE, "currency", "transfer", {"amount": 1, "to": "someone"}, 1),
+    ]
+
+    async def asyncTearDown(self):
+        teardown_fixtures()
+
+    async def finalize_block(self, parallel: bool):
+        setup_fixtures()
+        app = await Xian.create(constants=MockConstants)
+        app.current_block_meta = {"height": 0, "nanos": 0}
+        await store_genesis_block(app.client, app.nonce_storage, app.genesis["abci_genesis"])
+        for key, balance in ((ALICE, 1000), (BOB, 1000), (CAROL, 100), (DAVE, 1000)):
+            app.client.raw_driver.set(f"currency.balances:{address(key)}", balance)
+        # The workers execute against the committed state
+        app.client.raw_driver.hard_apply("0")
+        if parallel:
+            app.parallel_executor = ParallelExecutor(storage_home=MockConstants.STORAGE_HOME, workers=2)
+
+        try:
+            request = Request(finalize_block=RequestFinalizeBlock(txs=self.TXS, height=1, hash=b"\x01" * 32))
+            raw = await ProtocolHandler(app).process("finalize_block", request)
+            return (await deserialize(raw)).finalize_block
+        finally:
+            await app.shutdown()
+            teardown_fixtures()
+
+    async def test_same_result_as_serial_execution(self):
+        serial = await self.finalize_block(parallel=False)
+        parallel = await self.finalize_block(parallel=True)
+
+        self.assertEqual(
+            [result.code for result in serial.tx_results],
+            [c.OkCode, c.OkCode, c.OkCode, c.ErrorCode, c.OkCode]
+        )
+        self.assertEqual(list(parallel.tx_results), list(serial.tx_results))
+        self.assertEqual(parallel.app_hash, serial.app_hash)
+
+
+if __name__ == "__main__":
+    unittest.main()
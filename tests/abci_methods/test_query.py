@@ -92,6 +92,8 @@ def transfer_from(amount: float, to: str, main_account: str):
 ''')
         
         self.app.client.raw_driver.set("currency.balances:c93dee52d7dc6cc43af44007c3b1dae5b730ccf18a9e6fb43521f8e4064561e6", 123.45)
+        # Queries read committed state only
+        self.app.client.raw_driver.hard_apply("0")
         self.handler = ProtocolHandler(self.app)
 
     async def asyncTearDown(self):
@@ -1,5 +1,6 @@
 from pathlib import Path
 import shutil
+import json
 import os
     
 def setup_cometbft_tmp():
@@ -41,4 +42,19 @@ def setup_fixtures():
 def teardown_fixtures():
     cometbft_tmp_dir = Path("/tmp/cometbft/")
     if cometbft_tmp_dir.exists():
-        shutil.rmtree(cometbft_tmp_dir)
\ No newline at end of file
+        shutil.rmtree(cometbft_tmp_dir)
+
+def make_tx(key, contract, function, kwargs, nonce, stamps=1000, chain_id="xian-testnet-1"):
+    # Hex encoded tx signed by key, as the wallets send them
+    payload = json.dumps({
+        "chain_id": chain_id,
+        "contract": contract,
+        "function": function,
+        "kwargs": kwargs,
+        "nonce": nonce,
+        "sender": key.verify_key.encode().hex(),
+        "stamps_supplied": stamps,
+    }, separators=(",", ":"), sort_keys=True)
+    signature = key.sign(payload.encode()).signature.hex()
+    tx = '{"metadata":{"signature":"%s"},"payload":%s}' % (signature, payload)
+    return tx.encode().hex().encode()
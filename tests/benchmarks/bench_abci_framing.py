@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of the ABCI request framing.
+
+Compares the BytesIO based decoding the server used before with
+MessageBuffer on a multi-MB stream of FinalizeBlock requests, fed in
+reads of MaxReadInBytes like ABCIServer._handler does.
+
+Usage: python tests/benchmarks/bench_abci_framing.py [--blocks N] [--txs N] [--tx-size N]
+"""
+import io
+import argparse
+from io import BytesIO
+from timeit import default_timer as timer
+
+from abci.server import MaxReadInBytes
+from abci.utils import MessageBuffer, read_messages, write_message
+from cometbft.abci.v1beta3.types_pb2 import Request, RequestFinalizeBlock
+
+
+def build_stream(blocks: int, txs: int, tx_size: int) -> bytes:
+    tx = b"ab" * (tx_size // 2)
+    return b"".join(
+        write_message(Request(finalize_block=RequestFinalizeBlock(height=h, txs=[tx] * txs)))
+        for h in range(blocks)
+    )
+
+
+def decode_bytesio(stream: bytes) -> int:
+    # The pre MessageBuffer handler loop
+    count = 0
+    data = BytesIO()
+    for i in range(0, len(stream), MaxReadInBytes):
+        data.seek(0, io.SEEK_END)
+        data.write(stream[i:i + MaxReadInBytes])
+        data.seek(0)
+        while True:
+            start_pos = data.tell()
+            messages = list(read_messages(data, Request))
+            if not messages:
+                data.seek(start_pos)
+                break
+            count += len(messages)
+        remaining_data = data.read()
+        data = BytesIO()
+        data.write(remaining_data)
+        data.seek(0)
+    return count
+
+
+def decode_message_buffer(stream: bytes) -> int:
+    count = 0
+    data = MessageBuffer()
+    for i in range(0, len(stream), MaxReadInBytes):
+        data.feed(stream[i:i + MaxReadInBytes])
+        for _ in data.read_messages(Request):
+            count += 1
+    return count
+
+
+def run(name, func, stream, rounds):
+    best = None
+    for _ in range(rounds):
+        start = timer()
+        count = func(stream)
+        elapsed = timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    mb = len(stream) / 1024 / 1024
+    print(f"{name:<16} {count} msgs  {best * 1000:9.2f} ms  {mb / best:9.1f} MB/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--blocks", type=int, default=20)
+    parser.add_argument("--txs", type=int, default=200)
+    parser.add_argument("--tx-size", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    stream = build_stream(args.blocks, args.txs, args.tx_size)
+    print(f"Stream: {len(stream) / 1024 / 1024:.1f} MB in {args.blocks} FinalizeBlock requests")
+
+    old = run("BytesIO", decode_bytesio, stream, args.rounds)
+    new = run("MessageBuffer", decode_message_buffer, stream, args.rounds)
+    print(f"Speedup: {old / new:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark of Ed25519 signature verification for CheckTx.
+
+Compares verifying a batch of signed payloads one by one on the calling
+thread with SignatureVerifier.verify_many, which splits the batch across
+a thread pool. The speedup scales with the number of available cores.
+
+Usage: python tests/benchmarks/bench_signature_verification.py [--txs N] [--workers N]
+"""
+import os
+import argparse
+from timeit import default_timer as timer
+
+import nacl.signing
+from xian.utils.tx import verify
+from xian.verifier import SignatureVerifier
+
+
+def build_batch(txs: int) -> list[tuple[str, str, str]]:
+    batch = []
+    for i in range(txs):
+        key = nacl.signing.SigningKey.generate()
+        payload = f'{{"chain_id":"xian-bench","contract":"currency","nonce":{i},"sender":"{key.verify_key.encode().hex()}"}}'
+        batch.append((key.verify_key.encode().hex(), payload, key.sign(payload.encode()).signature.hex()))
+    return batch
+
+
+def verify_serial(batch) -> list[bool]:
+    return [verify(vk, msg, signature) for vk, msg, signature in batch]
+
+
+def run(name, func, batch, rounds):
+    best = None
+    for _ in range(rounds):
+        start = timer()
+        verdicts = func(batch)
+        elapsed = timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    assert all(verdicts)
+    print(f"{name:<16} {len(batch) / best:10.0f} verifications/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--txs", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    batch = build_batch(args.txs)
+    verifier = SignatureVerifier(workers=args.workers)
+    print(f"Batch: {args.txs} signatures, {args.workers} workers, {os.cpu_count()} cores")
+
+    old = run("serial", verify_serial, batch, args.rounds)
+    new = run("verify_many", verifier.verify_many, batch, args.rounds)
+    print(f"Speedup: {old / new:.2f}x ({len(batch) / new / args.workers:.0f} verifications/s per worker)")
+    verifier.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Micro-benchmark of transaction decoding.
+
+Compares the legacy decoding (json.loads, character-wise payload
+extraction, second json.loads of the payload) with the single pass
+decode_transaction on a transfer and on a contract submission.
+
+Usage: python tests/benchmarks/bench_tx_decoding.py [--rounds N]
+"""
+import json
+import argparse
+from timeit import timeit
+
+from xian.utils.decoder import decode_transaction, decode_transaction_legacy
+from xian.utils.encoding import encode_transaction_bytes
+
+
+def build_tx(kwargs: dict) -> bytes:
+    return encode_transaction_bytes(json.dumps({
+        "metadata": {"signature": "ab" * 64},
+        "payload": {
+            "chain_id": "xian-local",
+            "contract": "currency",
+            "function": "transfer",
+            "kwargs": kwargs,
+            "nonce": 40,
+            "sender": "e9" * 32,
+            "stamps_supplied": 10
+        }
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=5000)
+    args = parser.parse_args()
+
+    txs = {
+        "transfer": build_tx({"amount": 0.00000252, "to": "JAVASCRIPT_TRANSACTION_TEST"}),
+        "submission": build_tx({"name": "con_bench", "code": "@export\ndef f():\n    return '{}'\n" * 100}),
+    }
+    for name, raw in txs.items():
+        old = timeit(lambda: decode_transaction_legacy(raw), number=args.rounds) / args.rounds
+        new = timeit(lambda: decode_transaction(raw), number=args.rounds) / args.rounds
+        print(f"{name:<12} {len(raw):6} bytes  legacy {old * 1e6:8.1f} us  single pass {new * 1e6:8.1f} us  {old / new:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Micro-benchmark of transaction format validation.
+
+Compares the original validation (check_tx_keys, the generic
+recurse_rules walk and regexes compiled on every call) with
+check_tx_formatting and the compiled TRANSACTION_RULES, for a valid
+transaction and for one that fails on its last field.
+
+Usage: python tests/benchmarks/bench_tx_formatting.py [--rounds N]
+"""
+import re
+import copy
+import argparse
+from timeit import timeit
+
+from xian.exceptions import TransactionException
+from xian.formatting import (
+    TRANSACTION_PAYLOAD_RULES,
+    cid_id_formated,
+    number_is_formatted,
+)
+from xian.utils.tx import check_format, check_tx_formatting
+
+TX = {
+    "metadata": {"signature": "f4" * 64},
+    "payload": {
+        "chain_id": "xian-local",
+        "contract": "currency",
+        "function": "transfer",
+        "kwargs": {"amount": 1, "to": "bob"},
+        "nonce": 0,
+        "sender": "e9" * 32,
+        "stamps_supplied": 10
+    }
+}
+
+
+def hex_is_formatted_legacy(s, length):
+    try:
+        int(s, 16)
+        return len(s) == length
+    except (ValueError, TypeError):
+        return False
+
+
+def identifier_is_formatted_legacy(s):
+    try:
+        return re.match(r'^[a-zA-Z][a-zA-Z0-9_]*$', s) is not None
+    except TypeError:
+        return False
+
+
+LEGACY_RULES = {
+    'metadata': {
+        'signature': lambda s: hex_is_formatted_legacy(s, 128)
+    },
+    'payload': {
+        'sender': lambda s: hex_is_formatted_legacy(s, 64),
+        'nonce': number_is_formatted,
+        'stamps_supplied': number_is_formatted,
+        'contract': identifier_is_formatted_legacy,
+        'function': identifier_is_formatted_legacy,
+        'kwargs': lambda k: all(identifier_is_formatted_legacy(key) for key in k.keys()),
+        'chain_id': cid_id_formated
+    }
+}
+
+
+def check_tx_formatting_legacy(tx: dict):
+    # check_tx_formatting before the rules were compiled
+    metadata = tx.get("metadata")
+    if not metadata:
+        raise TransactionException("Metadata is missing")
+    if len(metadata.keys()) != 1:
+        raise TransactionException("Wrong number of metadata entries")
+    payload = tx.get("payload")
+    if not payload:
+        raise TransactionException("Payload is missing")
+    for key in ("sender", "contract", "function", "stamps_supplied"):
+        if not payload[key]:
+            raise TransactionException(f"Payload key '{key}' is missing")
+    keys = list(payload.keys())
+    keys_are_valid = list(
+        map(lambda key: key in keys, list(TRANSACTION_PAYLOAD_RULES.keys()))
+    )
+    if not all(keys_are_valid) and len(keys) == len(list(TRANSACTION_PAYLOAD_RULES.keys())):
+        raise TransactionException("Payload keys are not valid")
+    check_format(tx, LEGACY_RULES)
+
+
+def validate(func, tx):
+    try:
+        func(tx)
+    except TransactionException:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=100000)
+    args = parser.parse_args()
+
+    invalid = copy.deepcopy(TX)
+    invalid["payload"]["chain_id"] = 1
+
+    for name, tx in (("valid", TX), ("invalid", invalid)):
+        old = timeit(lambda: validate(check_tx_formatting_legacy, tx), number=args.rounds)
+        new = timeit(lambda: validate(check_tx_formatting, tx), number=args.rounds)
+        print(f"{name:<8} legacy {args.rounds / old:10.0f}/s  compiled {args.rounds / new:10.0f}/s  {old / new:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import unittest
+from io import BytesIO
+from parameterized import parameterized
+from abci.utils import (
+    MessageBuffer,
+    decode_varint,
+    decode_varint_at,
+    encode_varint,
+    read_messages,
+    write_message,
+)
+from cometbft.abci.v1beta3.types_pb2 import Request, RequestFinalizeBlock
+from cometbft.abci.v1beta1.types_pb2 import RequestEcho, RequestFlush
+
+
+def build_stream(count=20, tx_size=5000):
+    messages = []
+    for i in range(count):
+        if i % 3 == 0:
+            messages.append(Request(flush=RequestFlush()))
+        elif i % 3 == 1:
+            messages.append(Request(echo=RequestEcho(message=f"echo {i}")))
+        else:
+            messages.append(Request(finalize_block=RequestFinalizeBlock(
+                height=i,
+                txs=[bytes([i % 256]) * tx_size, b"", b"x" * (i * 7)]
+            )))
+    return messages, b"".join(write_message(m) for m in messages)
+
+
+class TestVarint(unittest.TestCase):
+    @parameterized.expand([(0,), (1,), (127,), (128,), (300,), (2 ** 32,), (2 ** 64 - 1,)])
+    def test_decode_in_place_matches_stream_decoder(self, number):
+        encoded = encode_varint(number)
+        buffer = bytearray(b"\x07" + encoded + b"\x01")
+        self.assertEqual(decode_varint_at(buffer, 1), (number, 1 + len(encoded)))
+        self.assertEqual(decode_varint(BytesIO(encoded)), number)
+
+    def test_incomplete_varint(self):
+        buffer = bytearray(encode_varint(2 ** 40)[:-1])
+        self.assertIsNone(decode_varint_at(buffer, 0))
+
+    def test_corrupt_varint(self):
+        with self.assertRaises(ValueError):
+            decode_varint_at(bytearray(b"\xff" * 11), 0)
+
+
+class TestMessageBuffer(unittest.TestCase):
+    def test_same_messages_as_read_messages(self):
+        messages, stream = build_stream()
+        self.assertEqual(list(read_messages(BytesIO(stream), Request)), messages)
+
+        buffer = MessageBuffer()
+        buffer.feed(stream)
+        self.assertEqual(list(buffer.read_messages(Request)), messages)
+        self.assertEqual(len(buffer), 0)
+
+    @parameterized.expand([(1,), (7,), (1024,), (64 * 1024,)])
+    def test_chunked_stream(self, chunk_size):
+        messages, stream = build_stream()
+        buffer = MessageBuffer()
+        parsed = []
+        for i in range(0, len(stream), chunk_size):
+            buffer.feed(stream[i:i + chunk_size])
+            parsed.extend(buffer.read_messages(Request))
+        self.assertEqual(parsed, messages)
+        self.assertEqual(len(buffer), 0)
+
+    def test_partial_message_stays_buffered(self):
+        messages, stream = build_stream(count=3)
+        buffer = MessageBuffer()
+        buffer.feed(stream[:-1])
+        self.assertEqual(list(buffer.read_messages(Request)), messages[:-1])
+        self.assertGreater(len(buffer), 0)
+        buffer.feed(stream[-1:])
+        self.assertEqual(list(buffer.read_messages(Request)), messages[-1:])
+
+
+if __name__ == "__main__":
+    unittest.main()
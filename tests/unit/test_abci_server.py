@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import unittest
+from abci.server import RequestScheduler, ResponseBuffer
+
+
+class FakeWriter:
+    def __init__(self):
+        self.writes = []
+
+    def writelines(self, data):
+        self.writes.append(b"".join(data))
+
+
+class TestResponseBuffer(unittest.IsolatedAsyncioTestCase):
+
+    async def test_responses_written_together_on_flush(self):
+        writer = FakeWriter()
+        responses = ResponseBuffer(writer, max_delay=60)
+        for i in range(10):
+            self.assertFalse(responses.append(bytes([i])))
+        self.assertEqual(writer.writes, [])
+        responses.flush()
+        self.assertEqual(writer.writes, [bytes(range(10))])
+
+    async def test_size_bound_forces_write(self):
+        writer = FakeWriter()
+        responses = ResponseBuffer(writer, max_bytes=4, max_delay=60)
+        self.assertFalse(responses.append(b"ab"))
+        self.assertTrue(responses.append(b"cd"))
+        self.assertEqual(writer.writes, [b"abcd"])
+
+    async def test_latency_bound_forces_write(self):
+        writer = FakeWriter()
+        responses = ResponseBuffer(writer, max_delay=0.01)
+        responses.append(b"late")
+        await asyncio.sleep(0.05)
+        self.assertEqual(writer.writes, [b"late"])
+
+    async def test_discard(self):
+        writer = FakeWriter()
+        responses = ResponseBuffer(writer, max_delay=0.01)
+        responses.append(b"lost")
+        responses.discard()
+        await asyncio.sleep(0.05)
+        responses.flush()
+        self.assertEqual(writer.writes, [])
+
+
+class FakeProtocol:
+    def __init__(self):
+        self.calls = []
+        self.finalize_started = asyncio.Event()
+        self.release_finalize = asyncio.Event()
+
+    async def process(self, req_type, req):
+        self.calls.append((req_type, threading.current_thread().name))
+        if req_type == "finalize_block":
+            self.finalize_started.set()
+            await self.release_finalize.wait()
+        return req_type.encode()
+
+
+class TestRequestScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.protocol = FakeProtocol()
+        self.scheduler = RequestScheduler(self.protocol, max_workers=2)
+
+    async def asyncTearDown(self):
+        self.scheduler.shutdown()
+
+    async def test_threaded_requests_leave_the_event_loop(self):
+        main = threading.current_thread().name
+        self.assertEqual(await self.scheduler.process("check_tx", None), b"check_tx")
+        self.assertEqual(await self.scheduler.process("query", None), b"query")
+        self.assertEqual(await self.scheduler.process("info", None), b"info")
+        threads = dict(self.protocol.calls)
+        self.assertNotEqual(threads["check_tx"], main)
+        self.assertNotEqual(threads["query"], main)
+        self.assertEqual(threads["info"], main)
+
+    async def test_consensus_requests_take_priority(self):
+        finalize = asyncio.create_task(self.scheduler.process("finalize_block", None))
+        await self.protocol.finalize_started.wait()
+
+        query = asyncio.create_task(self.scheduler.process("query", None))
+        await asyncio.sleep(0.05)
+        self.assertFalse(query.done())
+
+        self.protocol.release_finalize.set()
+        await finalize
+        await query
+        self.assertEqual([c[0] for c in self.protocol.calls], ["finalize_block", "query"])
+
+
+if __name__ == "__main__":
+    unittest.main()
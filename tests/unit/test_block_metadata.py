@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from xian.constants import Constants as c
+from xian.utils.block import BlockMetadataStore
+
+
+class FakeDriver:
+    def __init__(self):
+        self.state = {}
+
+    def get(self, key):
+        return self.state.get(key)
+
+    def set(self, key, value):
+        self.state[key] = value
+
+
+class TestBlockMetadataStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_defaults_without_file(self):
+        store = BlockMetadataStore(self.dir)
+        self.assertEqual(store.hash, b"")
+        self.assertEqual(store.height, 0)
+        self.assertFalse(os.path.exists(store.path))
+
+    def test_persist_and_load(self):
+        store = BlockMetadataStore(self.dir)
+        store.set(h=b"\xaa" * 32, height=7)
+        self.assertEqual(os.listdir(self.dir), [BlockMetadataStore.FILENAME])
+        with open(store.path) as f:
+            self.assertEqual(json.load(f), {"hash": "aa" * 32, "height": 7})
+
+        loaded = BlockMetadataStore(self.dir)
+        self.assertEqual((loaded.hash, loaded.height), (b"\xaa" * 32, 7))
+
+    def test_partial_set_keeps_other_value(self):
+        store = BlockMetadataStore(self.dir)
+        store.set(h=b"\x01", height=3)
+        store.set(h=b"\x02")
+        self.assertEqual(BlockMetadataStore(self.dir).height, 3)
+
+    def test_stage_writes_state(self):
+        driver = FakeDriver()
+        store = BlockMetadataStore(self.dir, driver=driver)
+        store.stage(b"\xbb", 5)
+        self.assertEqual(driver.state, {c.LATEST_BLOCK_HASH_KEY: "bb", c.LATEST_BLOCK_HEIGHT_KEY: 5})
+        # Nothing is written to the file before persist
+        self.assertEqual(BlockMetadataStore(self.dir).height, 0)
+        store.persist()
+        self.assertEqual(BlockMetadataStore(self.dir).height, 5)
+
+    def test_newer_state_wins(self):
+        driver = FakeDriver()
+        store = BlockMetadataStore(self.dir, driver=driver)
+        store.set(h=b"\x01", height=4)
+        # Crash after hard_apply, before the file was replaced
+        store.stage(b"\x02", 5)
+
+        loaded = BlockMetadataStore(self.dir, driver=driver)
+        self.assertEqual((loaded.hash, loaded.height), (b"\x02", 5))
+
+        store.set(h=b"\x03", height=6)
+        loaded = BlockMetadataStore(self.dir, driver=driver)
+        self.assertEqual((loaded.hash, loaded.height), (b"\x03", 6))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from xian.commit_pipeline import CommitPipeline, WriteAheadLog, replay_wal, sync_directory, sync_state_files
+from xian.state import CommittedState
+
+
+class FakeDriver:
+    """
+    Pending writes reach the store on hard_apply
+    """
+
+    def __init__(self, storage_home="/nonexistent"):
+        self.contract_state = os.path.join(storage_home, "contract_state")
+        self.run_state = os.path.join(storage_home, "run_state")
+        self.pending_writes = {}
+        self.store = {}
+        self.applied = []
+        self.block_apply = None
+
+    def set(self, key, value):
+        self.pending_writes[key] = value
+
+    def hard_apply(self, nanos):
+        if self.block_apply is not None:
+            self.block_apply.wait()
+        for key, value in self.pending_writes.items():
+            if value is None:
+                self.store.pop(key, None)
+            else:
+                self.store[key] = value
+        self.pending_writes.clear()
+        self.applied.append(nanos)
+
+    def find(self, key):
+        return self.store.get(key)
+
+    def keys(self, prefix=""):
+        return sorted(key for key in self.store if key.startswith(prefix))
+
+
+def committed_state(driver):
+    state = CommittedState.__new__(CommittedState)
+    state.driver = driver
+    state.overlay = None
+    state.lock = threading.RLock()
+    return state
+
+
+class TestWriteAheadLog(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "commit.wal")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_records_round_trip(self):
+        wal = WriteAheadLog(self.path)
+        wal.append({"height": 1, "nanos": 10, "writes": {"a.b": 1}})
+        wal.append({"height": 2, "nanos": 20, "writes": {"a.b": None}})
+        wal.close()
+        self.assertEqual([r["height"] for r in WriteAheadLog(self.path).records()], [1, 2])
+        self.assertEqual(WriteAheadLog(self.path).records()[1]["writes"], {"a.b": None})
+
+    def test_torn_tail_is_ignored(self):
+        wal = WriteAheadLog(self.path)
+        wal.append({"height": 1, "nanos": 10, "writes": {"a.b": 1}})
+        wal.append({"height": 2, "nanos": 20, "writes": {"a.b": 2}})
+        wal.close()
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        self.assertEqual([r["height"] for r in WriteAheadLog(self.path).records()], [1])
+
+    def test_sync_directory_skips_unchanged_files(self):
+        os.makedirs(os.path.join(self.dir, "contract_state"))
+        for name in ("old", "contract_state/new"):
+            with open(os.path.join(self.dir, name), "w") as f:
+                f.write(name)
+        past = time.time() - 60
+        os.utime(os.path.join(self.dir, "old"), (past, past))
+        os.utime(self.dir, (past, past))
+        # contract_state and the file in it
+        self.assertEqual(sync_directory(self.dir, time.time() - 10), 2)
+
+    def test_sync_state_files_only(self):
+        for name in ("contract_state", "run_state", "snapshots"):
+            os.makedirs(os.path.join(self.dir, name))
+            with open(os.path.join(self.dir, name, "file"), "w") as f:
+                f.write(name)
+        # Both state directories and their files, not the snapshots
+        self.assertEqual(sync_state_files(FakeDriver(self.dir), time.time() - 10), 4)
+
+    def test_missing_log(self):
+        self.assertEqual(WriteAheadLog(self.path).records(), [])
+
+    def test_replay(self):
+        wal = WriteAheadLog(self.path)
+        wal.append({"height": 1, "nanos": 10, "writes": {"a.b": 1, "a.c": 1}})
+        wal.append({"height": 2, "nanos": 20, "writes": {"a.b": 2, "a.c": None}})
+
+        driver = FakeDriver()
+        self.assertEqual(replay_wal(driver, wal), 2)
+        self.assertEqual(driver.store, {"a.b": 2})
+        self.assertEqual(driver.applied, ["10", "20"])
+        # Replayed blocks are in the store, the log starts over
+        self.assertEqual(wal.records(), [])
+        self.assertEqual(replay_wal(driver, wal), 0)
+
+
+class TestCommitPipeline(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.wal = WriteAheadLog(os.path.join(self.dir, "commit.wal"))
+        self.driver = FakeDriver()
+        self.state = committed_state(self.driver)
+        self.pipeline = CommitPipeline(self.driver, self.wal, self.state, checkpoint_interval=3)
+
+    def tearDown(self):
+        self.pipeline.shutdown()
+        shutil.rmtree(self.dir)
+
+    async def test_reads_see_writes_before_apply(self):
+        self.driver.store = {"a.old": 1, "a.gone": 1}
+        self.driver.block_apply = threading.Event()
+        self.driver.set("a.new", 2)
+        self.driver.set("a.gone", None)
+
+        applied = []
+        self.pipeline.commit(1, 10, after_apply=lambda: applied.append(1))
+        # Logged before the store is written
+        self.assertEqual(self.wal.records()[0]["writes"], {"a.new": 2, "a.gone": None})
+        self.assertEqual(self.state.get("a.new"), 2)
+        self.assertIsNone(self.state.get("a.gone"))
+        self.assertEqual(self.state.get("a.old"), 1)
+        self.assertEqual(self.state.keys("a."), ["a.new", "a.old"])
+        self.assertEqual(applied, [])
+
+        self.driver.block_apply.set()
+        await self.pipeline.wait()
+        self.assertIsNone(self.state.overlay)
+        self.assertEqual(self.driver.store, {"a.old": 1, "a.new": 2})
+        self.assertEqual(self.state.get("a.new"), 2)
+        self.assertEqual(applied, [1])
+
+    async def test_checkpoint_truncates_log(self):
+        for height in range(1, 4):
+            self.driver.set("a.b", height)
+            self.pipeline.commit(height, height * 10)
+            await self.pipeline.wait()
+            self.assertEqual(len(self.wal.records()), height % 3)
+        self.assertEqual(self.driver.store, {"a.b": 3})
+
+    async def test_failed_apply_is_raised(self):
+        def fail(nanos):
+            raise OSError("disk full")
+        self.driver.hard_apply = fail
+        self.driver.set("a.b", 1)
+        self.pipeline.commit(1, 10)
+        with self.assertRaises(OSError):
+            await self.pipeline.wait()
+        # The block stays in the log for the replay
+        self.assertEqual(len(self.wal.records()), 1)
+
+    async def test_wait_without_commit(self):
+        await self.pipeline.wait()
+
+    async def test_shutdown_checkpoints_last_apply(self):
+        self.driver.set("a.b", 1)
+        self.pipeline.commit(1, 10)
+        self.pipeline.shutdown()
+        self.assertEqual(self.driver.store, {"a.b": 1})
+        self.assertEqual(self.wal.records(), [])
+
+    async def test_shutdown_keeps_failed_apply_in_log(self):
+        def fail(nanos):
+            raise OSError("disk full")
+        self.driver.hard_apply = fail
+        self.driver.set("a.b", 1)
+        self.pipeline.commit(1, 10)
+        self.pipeline.shutdown()
+        self.assertEqual(len(self.wal.records()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
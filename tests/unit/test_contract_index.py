@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from xian import contract_index
+from xian.contract_index import ContractIndex
+
+CODE_V1 = "balances = Hash()\n\n@export\ndef transfer(amount: float, to: str):\n    pass\n"
+CODE_V2 = CODE_V1 + "\n@export\ndef approve(amount: float, to: str):\n    pass\n"
+
+
+class FakeState:
+    def __init__(self, store=None):
+        self.store = dict(store or {})
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def keys(self, prefix=""):
+        return sorted(key for key in self.store if key.startswith(prefix))
+
+    def get_contract(self, name):
+        return self.get(f"{name}.__code__")
+
+
+class TestContractIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.state = FakeState({"con_token.__code__": CODE_V1, "con_token.balances:alice": 1})
+        self.methods = mock.Mock(wraps=contract_index.parser.methods_for_contract)
+        self.variables = mock.Mock(wraps=contract_index.parser.variables_for_contract)
+        patcher = mock.patch.multiple(
+            contract_index.parser,
+            methods_for_contract=self.methods,
+            variables_for_contract=self.variables
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def open_index(self):
+        return ContractIndex(os.path.join(self.dir, "contracts.db"), self.state)
+
+    def method_names(self, metadata):
+        return [method["name"] for method in metadata["methods"]]
+
+    def test_parses_once_per_code(self):
+        index = self.open_index()
+        self.assertEqual(index.warm_up(), 1)
+        for _ in range(3):
+            metadata = index.get("con_token")
+        self.assertEqual(self.method_names(metadata), ["transfer"])
+        self.assertEqual(metadata["code_hash"], contract_index.code_hash(CODE_V1))
+        self.assertEqual(self.methods.call_count, 1)
+        self.assertIsNone(index.get("con_missing"))
+
+    def test_side_table_survives_restart(self):
+        self.open_index().warm_up()
+        index = self.open_index()
+        index.warm_up()
+        self.assertEqual(self.method_names(index.get("con_token")), ["transfer"])
+        self.assertEqual(self.methods.call_count, 1)
+
+    def test_update_from_block_writes(self):
+        index = self.open_index()
+        index.warm_up()
+        self.state.store["con_token.__code__"] = CODE_V2
+        self.state.store["con_new.__code__"] = CODE_V1
+        index.update({"con_token.__code__": CODE_V2, "con_new.__code__": CODE_V1, "con_token.balances:bob": 2})
+        self.assertEqual(self.method_names(index.get("con_token")), ["transfer", "approve"])
+        # Same code as before, nothing to parse
+        self.assertEqual(self.method_names(index.get("con_new")), ["transfer"])
+        self.assertEqual(self.methods.call_count, 2)
+
+    def test_other_state_by_code_hash(self):
+        index = self.open_index()
+        index.warm_up()
+        old = FakeState({"con_token.__code__": CODE_V1})
+        index.update({"con_token.__code__": CODE_V2})
+        self.assertEqual(self.method_names(index.get("con_token", old)), ["transfer"])
+
+    def test_unparsable_code_is_not_indexed(self):
+        index = self.open_index()
+        self.methods.side_effect = SyntaxError("bad")
+        index.update({"con_bad.__code__": "def ("})
+        self.assertNotIn("con_bad", index._by_name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import json
+import random
+import unittest
+from parameterized import parameterized
+from xian.utils.decoder import (
+    _decode_fast,
+    decode_transaction,
+    decode_transaction_legacy,
+)
+from xian.utils.encoding import encode_transaction_bytes
+
+TX = '{"metadata":{"signature":"f47871676c33d17d5a86bd8b2f12832e35e2b73692b0f28321be2f9acd3379c755440333ddc5e5bf40255256adb946aecae6729e8cb3a9028b08cdd995609f05"},"payload":{"chain_id":"xian-local","contract":"currency","function":"transfer","kwargs":{"amount":0.00000252,"to":"JAVASCRIPT_TRANSACTION_TEST"},"nonce":40,"sender":"e9e8aad29ce8e94fd77d9c55582e5e0c57cf81c552ba61c0d4e34b0dc11fd931","stamps_supplied":10}}'
+
+# Transactions the single pass decoder handles itself
+FAST_CORPUS = [
+    ("plain", TX),
+    ("payload_first", '{"payload":{"nonce":1,"kwargs":{}},"metadata":{"signature":"abc"}}'),
+    ("whitespace", ' {\n "metadata" : {"signature": "abc"} ,\t"payload":  {"a": [1, 2, {"b": "}"}]} }\n'),
+    ("escaped_quote", '{"metadata":{"signature":"abc"},"payload":{"text":"This is a \\" } quoted\\" string"}}'),
+    ("unicode_escape", '{"metadata":{"signature":"abc"},"payload":{"text":"\\u2603 \\u2764"}}'),
+    ("unicode_raw", '{"metadata":{"signature":"abc"},"payload":{"text":"\u2603 \u00e9 \U0001F600"}}'),
+    ("empty_payload_object", '{"metadata":{"signature":"abc"},"payload":{}}'),
+    ("large_number", '{"metadata":{"signature":"abc"},"payload":{"n":12345678901234567890,"f":1e-9}}'),
+    ("literals", '{"metadata":{"signature":"abc"},"payload":{"t":true,"f":false,"n":null}}'),
+    ("payload_key_in_payload", '{"metadata":{"signature":"abc"},"payload":{"kwargs":{"payload":{"x":1}}}}'),
+    ("escaped_payload_text_in_metadata", '{"metadata":{"signature":"\\"payload\\":{}"},"payload":{"x":1}}'),
+    ("duplicate_other_key", '{"metadata":{"a":1},"payload":{"x":1},"metadata":{"signature":"abc"}}'),
+]
+
+# Transactions that are left to the legacy decoding, valid or not
+LEGACY_CORPUS = [
+    ("payload_key_in_metadata", '{"metadata":{"payload":{"x":1}},"payload":{"x":1}}'),
+    ("multiple_payloads", '{"payload":{"x":2},"metadata":{"signature":"abc"},"payload":{"x":1}}'),
+    ("escaped_backslash", '{"metadata":{"signature":"abc"},"payload":{"path":"C:\\\\","x":"}"}}'),
+    ("nan", '{"metadata":{"signature":"abc"},"payload":{"x":NaN}}'),
+    ("string_payload", '{"id":3,"payload":"","other":{"x":1}}'),
+    ("list_payload", '{"metadata":{"signature":"abc"},"payload":[{"x":1}]}'),
+    ("no_payload", '{"id":2,"other_field":"data"}'),
+    ("empty_object", '{}'),
+    ("top_level_list", '[{"payload":{}}]'),
+    ("extra_data", '{"payload":{"x":1}} {}'),
+    ("truncated", '{"metadata":{"signature":"abc"},"payload":{"x":1}'),
+    ("payload_key_spacing", '{"metadata":{"signature":"abc"},"payload" :{"x":1}}'),
+    ("not_json", 'hello'),
+]
+
+
+def outcome(func, raw):
+    try:
+        decoded = func(raw)
+    except Exception as e:
+        return type(e), str(e)
+    return decoded.tx, decoded.payload_str
+
+
+class TestDecodeTransaction(unittest.TestCase):
+
+    def assert_same_as_legacy(self, raw):
+        new = outcome(decode_transaction, raw)
+        old = outcome(decode_transaction_legacy, raw)
+        self.assertEqual(new, old)
+        if isinstance(new[0], dict):
+            # Key order matters for anything that re-encodes the tx
+            self.assertEqual(list(new[0]), list(old[0]))
+
+    @parameterized.expand(FAST_CORPUS)
+    def test_fast_path_matches_legacy(self, name, tx_str):
+        self.assertIsNotNone(_decode_fast(tx_str))
+        raw = encode_transaction_bytes(tx_str)
+        self.assert_same_as_legacy(raw)
+
+    @parameterized.expand(LEGACY_CORPUS)
+    def test_fallback_matches_legacy(self, name, tx_str):
+        self.assertIsNone(_decode_fast(tx_str))
+        self.assert_same_as_legacy(encode_transaction_bytes(tx_str))
+
+    @parameterized.expand([
+        ("odd_length", b"7b7"),
+        ("not_hex", b"zz"),
+        ("whitespace_in_hex", b"7b 7d"),
+        ("not_ascii", "\u00e9".encode()),
+        ("invalid_utf8", b"ff"),
+    ])
+    def test_bad_wire_bytes_match_legacy(self, name, raw):
+        self.assert_same_as_legacy(raw)
+
+    def test_random_transactions_match_legacy(self):
+        rng = random.Random(1)
+        alphabet = ['a', '"', '\\', '{', '}', '[', ']', ':', ',', ' ', '\u00e9', '\n', 'payload']
+
+        def value(depth=0):
+            kind = rng.randrange(6 if depth < 3 else 4)
+            if kind == 0:
+                return rng.randrange(-10**20, 10**20)
+            if kind == 1:
+                return rng.random() * 1000
+            if kind == 2:
+                return "".join(rng.choice(alphabet) for _ in range(rng.randrange(8)))
+            if kind == 3:
+                return rng.choice([True, False, None])
+            if kind == 4:
+                return [value(depth + 1) for _ in range(rng.randrange(4))]
+            return {f"k{i}": value(depth + 1) for i in range(rng.randrange(4))}
+
+        for i in range(500):
+            tx = {"metadata": {"signature": value()}, "payload": {"nonce": i, "kwargs": value()}}
+            if rng.random() < 0.5:
+                tx = {"payload": tx["payload"], "metadata": tx["metadata"]}
+            tx_str = json.dumps(
+                tx,
+                ensure_ascii=rng.random() < 0.5,
+                separators=rng.choice([(",", ":"), (", ", ": ")])
+            )
+            self.assert_same_as_legacy(encode_transaction_bytes(tx_str))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import copy
+import unittest
+from parameterized import parameterized
+from xian.exceptions import TransactionException
+from xian.formatting import TRANSACTION_RULES
+from xian.utils.tx import check_tx_formatting, compile_rules, recurse_rules
+
+VK = "e9e8aad29ce8e94fd77d9c55582e5e0c57cf81c552ba61c0d4e34b0dc11fd931"
+SIGNATURE = "f47871676c33d17d5a86bd8b2f12832e35e2b73692b0f28321be2f9acd3379c755440333ddc5e5bf40255256adb946aecae6729e8cb3a9028b08cdd995609f05"
+
+TX = {
+    "metadata": {"signature": SIGNATURE},
+    "payload": {
+        "chain_id": "xian-local",
+        "contract": "currency",
+        "function": "transfer",
+        "kwargs": {"amount": 1, "to": "bob"},
+        "nonce": 0,
+        "sender": VK,
+        "stamps_supplied": 10
+    }
+}
+
+
+def tx_with(section, **changes):
+    tx = copy.deepcopy(TX)
+    for key, value in changes.items():
+        if value is None:
+            del tx[section][key]
+        else:
+            tx[section][key] = value
+    return tx
+
+
+CORPUS = [
+    ("valid", TX, None),
+    ("sender_too_short", tx_with("payload", sender=VK[:-2]), "Transaction has wrongly formatted dictionary"),
+    ("sender_not_hex", tx_with("payload", sender="z" * 64), "Transaction has wrongly formatted dictionary"),
+    ("sender_list", tx_with("payload", sender=[VK, VK]), None),
+    ("sender_list_with_bad_entry", tx_with("payload", sender=[VK, "x"]), "Transaction has wrongly formatted dictionary"),
+    ("sender_empty", tx_with("payload", sender=""), "Payload key 'sender' is missing"),
+    ("signature_int", tx_with("metadata", signature=5), "Transaction has wrongly formatted dictionary"),
+    ("negative_nonce", tx_with("payload", nonce=-1), "Transaction has wrongly formatted dictionary"),
+    ("float_stamps", tx_with("payload", stamps_supplied=1.5), "Transaction has wrongly formatted dictionary"),
+    ("zero_stamps", tx_with("payload", stamps_supplied=0), "Payload key 'stamps_supplied' is missing"),
+    ("bad_function", tx_with("payload", function="1transfer"), "Transaction has wrongly formatted dictionary"),
+    ("contract_dict", tx_with("payload", contract={"a": 1}), "Transaction has wrongly formatted dictionary"),
+    ("bad_kwarg_name", tx_with("payload", kwargs={"to-x": 1}), "Transaction has wrongly formatted dictionary"),
+    ("kwargs_list", tx_with("payload", kwargs=[{"to": 1}, {"amount": 2}]), None),
+    ("kwargs_string", tx_with("payload", kwargs="to"), AttributeError),
+    ("chain_id_int", tx_with("payload", chain_id=1), "Transaction has wrongly formatted dictionary"),
+    ("missing_nonce", tx_with("payload", nonce=None), KeyError),
+    ("missing_chain_id", tx_with("payload", chain_id=None), KeyError),
+    ("replaced_key", tx_with("payload", chain_id=None, extra=1), "Payload keys are not valid"),
+    ("extra_payload_key", tx_with("payload", extra=1), None),
+    ("two_metadata_entries", tx_with("metadata", extra=1), "Wrong number of metadata entries"),
+    ("metadata_missing", {"payload": TX["payload"]}, "Metadata is missing"),
+    ("metadata_list", {"metadata": [1], "payload": TX["payload"]}, AttributeError),
+    ("payload_missing", {"metadata": TX["metadata"]}, "Payload is missing"),
+    ("extra_top_level_key", dict(TX, b_meta={}), "Transaction has unexpected or missing keys"),
+]
+
+
+def outcome(func, *args):
+    try:
+        return func(*args)
+    except Exception as e:
+        return type(e)
+
+
+class TestCompiledRules(unittest.TestCase):
+
+    @parameterized.expand(CORPUS)
+    def test_compiled_rules_match_recurse_rules(self, name, tx, expected):
+        if type(tx.get("metadata")) is not dict or set(tx) != set(TRANSACTION_RULES):
+            return
+        self.assertEqual(
+            outcome(compile_rules(TRANSACTION_RULES), tx),
+            outcome(recurse_rules, tx, TRANSACTION_RULES)
+        )
+
+    @parameterized.expand(CORPUS)
+    def test_check_tx_formatting(self, name, tx, expected):
+        if expected is None:
+            check_tx_formatting(tx)
+        elif isinstance(expected, str):
+            with self.assertRaises(TransactionException) as context:
+                check_tx_formatting(tx)
+            self.assertEqual(str(context.exception), expected)
+        else:
+            with self.assertRaises(expected):
+                check_tx_formatting(tx)
+
+    def test_nested_rules(self):
+        rule = {"a": {"b": lambda v: v == 1}, "c": lambda v: v == 2}
+        validate = compile_rules(rule)
+        for d in [
+            {"a": {"b": 1}, "c": 2},
+            {"a": [{"b": 1}, {"b": 0}], "c": 2},
+            {"a": "not a dict", "c": 2},
+            {"a": {"b": 1}, "c": [2, 2]},
+            {"a": {"b": 1}, "c": 3},
+        ]:
+            self.assertEqual(validate(d), recurse_rules(d, rule))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import json
+import threading
+import unittest
+from xian.methods.query import parse_key_list
+from xian.state import CommittedState
+
+
+class FakeDriver:
+    def __init__(self, store):
+        self.store = store
+
+    def find(self, key):
+        return self.store.get(key)
+
+
+class TestParseKeyList(unittest.TestCase):
+
+    def test_comma_separated(self):
+        self.assertEqual(
+            parse_key_list("currency.balances:alice,currency.balances:bob,", b""),
+            ["currency.balances:alice", "currency.balances:bob"]
+        )
+
+    def test_hex_json(self):
+        keys = ["con_x.pairs:a,b", "currency.balances:bob"]
+        self.assertEqual(parse_key_list(json.dumps(keys).encode().hex(), b""), keys)
+
+    def test_data(self):
+        keys = ["currency.balances:alice"]
+        self.assertEqual(parse_key_list("", json.dumps(keys).encode()), keys)
+
+    def test_not_a_list_of_keys(self):
+        for data in (b'{"a": 1}', b"[1, 2]"):
+            with self.assertRaises(ValueError):
+                parse_key_list("", data)
+
+
+class TestGetMany(unittest.TestCase):
+
+    def setUp(self):
+        self.state = CommittedState.__new__(CommittedState)
+        self.state.driver = FakeDriver({"a.x": 1, "a.y": 2})
+        self.state.overlay = None
+        self.state.lock = threading.RLock()
+
+    def test_reads_overlay_and_store(self):
+        self.state.overlay = {"a.y": 3, "a.z": None}
+        self.assertEqual(self.state.get_many(["a.x", "a.y", "a.z", "a.w"]), {"a.x": 1, "a.y": 3, "a.z": None, "a.w": None})
+
+    def test_waits_for_commit(self):
+        read = []
+        with self.state.lock:
+            reader = threading.Thread(target=lambda: read.append(self.state.get_many(["a.x", "a.y"])))
+            reader.start()
+            reader.join(0.05)
+            self.assertEqual(read, [])
+            # The block becomes visible as a whole
+            self.state.overlay = {"a.x": 10, "a.y": 20}
+        reader.join()
+        self.assertEqual(read, [{"a.x": 10, "a.y": 20}])
+
+    def test_single_reads_wait_for_commit(self):
+        read = []
+        with self.state.lock:
+            reader = threading.Thread(target=lambda: read.append(self.state.get("a.x")))
+            reader.start()
+            reader.join(0.05)
+            self.assertEqual(read, [])
+            self.state.overlay = {"a.x": 10}
+        reader.join()
+        self.assertEqual(read, [10])
+
+
+if __name__ == "__main__":
+    unittest.main()
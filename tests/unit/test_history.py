@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import unittest
+from xian.history import StateHistory
+
+
+class FakeState:
+    """
+    Committed state with a driver interface to apply blocks
+    """
+
+    def __init__(self, store=None):
+        self.store = dict(store or {})
+        self.pending_writes = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def keys(self, prefix=""):
+        return sorted(key for key in self.store if key.startswith(prefix))
+
+    def make_key(self, contract, variable, args=[]):
+        key = f"{contract}.{variable}"
+        return key + ":" + ":".join(args) if args else key
+
+    def set(self, key, value):
+        self.pending_writes[key] = value
+
+    def hard_apply(self, nanos):
+        for key, value in self.pending_writes.items():
+            if value is None:
+                self.store.pop(key, None)
+            else:
+                self.store[key] = value
+        self.pending_writes.clear()
+
+
+class TestStateHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.state = FakeState({"currency.balances:alice": 100, "con_token.__code__": "v1"})
+        self.history = self.open_history()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def open_history(self, keep_heights=0):
+        return StateHistory(os.path.join(self.dir, "history.db"), keep_heights=keep_heights)
+
+    def commit(self, height, writes):
+        for key, value in writes.items():
+            self.state.set(key, value)
+        self.history.record(height, self.state.pending_writes, self.state)
+        self.state.hard_apply(str(height))
+
+    def build(self):
+        self.commit(1, {"currency.balances:alice": 90, "currency.balances:bob": 10})
+        self.commit(2, {"currency.balances:alice": 80, "con_token.__code__": "v2"})
+        self.commit(3, {"currency.balances:bob": None, "currency.balances:carol": 5})
+
+    def test_values_at_heights(self):
+        self.build()
+        key = "currency.balances:alice"
+        self.assertEqual([self.history.get(key, h, self.state) for h in range(4)], [100, 90, 80, 80])
+        self.assertEqual([self.history.get("currency.balances:bob", h, self.state) for h in range(4)], [None, 10, 10, None])
+        self.assertEqual(self.history.at(1, self.state).get_contract("con_token"), "v1")
+        self.assertEqual(self.history.at(3, self.state).get_contract("con_token"), "v2")
+
+    def test_keys_at_heights(self):
+        self.build()
+        prefix = "currency.balances"
+        self.assertEqual(self.history.keys(prefix, 0, self.state), ["currency.balances:alice"])
+        self.assertEqual(
+            self.history.keys(prefix, 2, self.state),
+            ["currency.balances:alice", "currency.balances:bob"]
+        )
+        self.assertEqual(
+            self.history.at(3, self.state).keys(prefix),
+            ["currency.balances:alice", "currency.balances:carol"]
+        )
+
+    def test_heights_out_of_range(self):
+        with self.assertRaises(ValueError):
+            self.history.get("currency.balances:alice", 0, self.state)
+        self.build()
+        for height in (-1, 4):
+            with self.assertRaises(ValueError):
+                self.history.at(height, self.state)
+
+    def test_compaction(self):
+        self.history = self.open_history(keep_heights=2)
+        self.build()
+        self.assertEqual(self.history.earliest, 1)
+        self.assertEqual(self.history.get("currency.balances:alice", 1, self.state), 90)
+        with self.assertRaises(ValueError):
+            self.history.get("currency.balances:alice", 0, self.state)
+        count = self.history.db.execute("SELECT COUNT(*) FROM changes WHERE height <= 1").fetchone()[0]
+        self.assertEqual(count, 0)
+
+    def test_survives_reopen(self):
+        self.build()
+        history = self.open_history()
+        self.assertEqual((history.earliest, history.height), (0, 3))
+        self.assertEqual(history.get("currency.balances:alice", 1, self.state), 90)
+
+    def test_truncate(self):
+        self.build()
+        self.history.truncate(2)
+        self.assertEqual(self.history.height, 2)
+        # Changes of height 3 are gone, bob reads the current state
+        self.assertIsNone(self.history.get("currency.balances:bob", 2, self.state))
+
+    def test_rollback(self):
+        before = dict(self.state.store)
+        self.build()
+        after_one = {"currency.balances:alice": 90, "currency.balances:bob": 10, "con_token.__code__": "v1"}
+        self.assertEqual(self.history.rollback(1, self.state, "0"), 4)
+        self.assertEqual(self.state.store, after_one)
+        self.assertEqual(self.history.height, 1)
+        self.history.rollback(0, self.state, "0")
+        self.assertEqual(self.state.store, before)
+
+
+if __name__ == "__main__":
+    unittest.main()
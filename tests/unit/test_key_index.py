@@ -0,0 +1,105 @@
+import os
+import json
+import asyncio
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from xian.key_index import KeyIndex
+from xian.methods.query import scan_keys, run_query
+
+
+class FakeState:
+    def __init__(self, keys):
+        self.store = {key: 1 for key in keys}
+
+    def keys(self, prefix=""):
+        return [key for key in self.store if key.startswith(prefix)]
+
+
+class TestKeyIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.index = self.open_index()
+        self.holders = [f"currency.balances:{i:04d}" for i in range(1200)]
+        self.index.rebuild(self.holders + ["currency.allowances:a", "currency.balancesx", "con_x.balances:a"], 5)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def open_index(self):
+        return KeyIndex(os.path.join(self.dir, "key_index.db"))
+
+    def test_scan_prefix_in_order(self):
+        self.assertEqual(list(self.index.scan("currency.balances:")), self.holders)
+        self.assertEqual(list(self.index.scan("currency.")), ["currency.allowances:a"] + self.holders + ["currency.balancesx"])
+        self.assertEqual(list(self.index.scan("nothing")), [])
+
+    def test_cursor_pages(self):
+        pages, after = [], None
+        while True:
+            page = list(self.index.scan("currency.balances:", after, 500))
+            pages.append(page)
+            if len(page) < 500:
+                break
+            after = page[-1]
+        self.assertEqual([len(page) for page in pages], [500, 500, 200])
+        self.assertEqual(sum(pages, []), self.holders)
+        self.assertEqual(list(self.index.scan("currency.balances:", "currency.balances:0009", 2)), self.holders[10:12])
+        # A cursor before the prefix starts at the beginning
+        self.assertEqual(list(self.index.scan("currency.balances:", "a", 1)), self.holders[:1])
+
+    def test_update(self):
+        self.index.update({"currency.balances:0000": None, "currency.balances:9999": 5, "currency.balances:0001": 2}, 6)
+        keys = list(self.index.scan("currency.balances:"))
+        self.assertEqual(keys, self.holders[1:] + ["currency.balances:9999"])
+        self.assertEqual(self.open_index().height, 6)
+
+    def test_scan_keys_without_index(self):
+        app = SimpleNamespace(key_index=None, committed_state=None)
+        state = FakeState(reversed(self.holders))
+        self.assertEqual(list(scan_keys(app, state, "currency.balances:", "currency.balances:0009", 2)), self.holders[10:12])
+        self.assertEqual(list(scan_keys(app, state, "currency.balances:")), self.holders)
+
+    def test_scan_keys_uses_index_for_latest(self):
+        state = FakeState([])
+        app = SimpleNamespace(key_index=self.index, committed_state=state)
+        self.assertEqual(list(scan_keys(app, state, "con_x.")), ["con_x.balances:a"])
+
+    def test_keys_query_is_paged(self):
+        state = FakeState([])
+        app = SimpleNamespace(
+            key_index=self.index,
+            committed_state=state,
+            block_service_mode=True,
+            block_metadata=SimpleNamespace(height=5)
+        )
+
+        def keys(path):
+            res = asyncio.run(run_query(app, SimpleNamespace(path=path, height=0, prove=False, data=b"")))
+            return json.loads(res.value)
+
+        self.assertEqual(
+            keys("/keys/currency.balances:"),
+            {"keys": [f"{i:04d}" for i in range(100)], "next": "currency.balances:0099"}
+        )
+        self.assertEqual(
+            keys("/keys/currency.balances/after=currency.balances:1149/limit=1000"),
+            {"keys": [f"{i:04d}" for i in range(1150, 1200)] + ["currency.balancesx"], "next": None}
+        )
+
+    def test_keys_query_keeps_all_dimensions(self):
+        self.index.update({"con_x.pairs:a:b": 1}, 6)
+        app = SimpleNamespace(
+            key_index=self.index,
+            committed_state=FakeState([]),
+            block_service_mode=True,
+            block_metadata=SimpleNamespace(height=6)
+        )
+        res = asyncio.run(run_query(app, SimpleNamespace(path="/keys/con_x.pairs", height=0, prove=False, data=b"")))
+        self.assertEqual(json.loads(res.value), {"keys": ["a:b"], "next": None})
+
+
+if __name__ == "__main__":
+    unittest.main()
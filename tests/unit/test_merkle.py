@@ -0,0 +1,90 @@
+import hashlib
+import unittest
+from xian.utils.merkle import MerkleAccumulator, leaf_hash, node_hash, verify_inclusion
+from xian.upgrades import Upgrades, MERKLE_APP_HASH
+
+
+def reference_root(leaves: list[bytes]) -> bytes:
+    # MTH from RFC 6962, section 2.1
+    if len(leaves) == 0:
+        return hashlib.sha3_256(b"").digest()
+    if len(leaves) == 1:
+        return leaf_hash(leaves[0])
+    k = 1 << ((len(leaves) - 1).bit_length() - 1)
+    return node_hash(reference_root(leaves[:k]), reference_root(leaves[k:]))
+
+
+class TestMerkleAccumulator(unittest.TestCase):
+
+    def test_root_matches_reference(self):
+        tree = MerkleAccumulator()
+        leaves = []
+        self.assertEqual(tree.root(), reference_root(leaves))
+        for i in range(70):
+            leaves.append(f"leaf {i}".encode())
+            tree.append(leaves[-1])
+            self.assertEqual(tree.root(), reference_root(leaves), len(leaves))
+
+    def test_proofs_verify(self):
+        for size in range(1, 40):
+            tree = MerkleAccumulator()
+            for i in range(size):
+                tree.append(f"leaf {i}".encode())
+            root = tree.root()
+            for index in range(size):
+                proof = tree.proof(index)
+                leaf = leaf_hash(f"leaf {index}".encode())
+                self.assertTrue(verify_inclusion(leaf, index, size, proof, root), (size, index))
+                self.assertFalse(verify_inclusion(leaf_hash(b"other"), index, size, proof, root))
+                if size > 1:
+                    self.assertFalse(verify_inclusion(leaf, (index + 1) % size, size, proof, root))
+
+    def test_proof_out_of_range(self):
+        tree = MerkleAccumulator()
+        tree.append(b"leaf")
+        with self.assertRaises(IndexError):
+            tree.proof(1)
+        self.assertFalse(verify_inclusion(leaf_hash(b"leaf"), 1, 1, [], tree.root()))
+
+    def test_proof_for_key(self):
+        tree = MerkleAccumulator()
+        tree.append(b"previous block")
+        tree.append(b"aa", key="aa")
+        tree.append(b"bb", key="bb")
+        tree.append(b"rewards")
+
+        proof = tree.proof_for("bb")
+        self.assertEqual(proof["index"], 2)
+        self.assertEqual(proof["size"], 4)
+        self.assertEqual(proof["root"], tree.root().hex())
+        self.assertTrue(verify_inclusion(
+            bytes.fromhex(proof["leaf"]),
+            proof["index"],
+            proof["size"],
+            [bytes.fromhex(node) for node in proof["proof"]],
+            bytes.fromhex(proof["root"])
+        ))
+        self.assertIsNone(tree.proof_for("cc"))
+
+
+class TestUpgrades(unittest.TestCase):
+
+    def test_activation_height(self):
+        upgrades = Upgrades({MERKLE_APP_HASH: 100})
+        self.assertFalse(upgrades.is_active(MERKLE_APP_HASH, 99))
+        self.assertTrue(upgrades.is_active(MERKLE_APP_HASH, 100))
+        self.assertTrue(upgrades.is_active(MERKLE_APP_HASH, 101))
+
+    def test_not_scheduled(self):
+        self.assertFalse(Upgrades().is_active(MERKLE_APP_HASH, 10 ** 9))
+        self.assertFalse(Upgrades(None).is_active(MERKLE_APP_HASH, 1))
+
+    def test_invalid_config(self):
+        with self.assertRaises(ValueError):
+            Upgrades({"unknown_upgrade": 1})
+        with self.assertRaises(ValueError):
+            Upgrades({MERKLE_APP_HASH: "100"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from xian.exceptions import TransactionException
+from xian.nonce import PendingNonceIndex
+
+
+class FakeNonceStorage:
+    def __init__(self, nonces):
+        self.nonces = nonces
+        self.reads = 0
+
+    def get_nonce(self, sender):
+        self.reads += 1
+        return self.nonces.get(sender)
+
+
+def tx(sender, nonce):
+    return {"payload": {"sender": sender, "nonce": nonce}}
+
+
+class TestPendingNonceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = FakeNonceStorage({"alice": 4})
+        self.index = PendingNonceIndex(self.storage)
+
+    def test_next_nonce_follows_pending_txs(self):
+        self.assertEqual(self.index.get_next_nonce("alice"), 5)
+        self.assertEqual(self.index.get_next_nonce("bob"), 0)
+
+        self.index.add(tx("alice", 5), "a5")
+        self.index.add(tx("alice", 6), "a6")
+        self.index.add(tx("bob", 0), "b0")
+
+        self.assertEqual(self.index.get_next_nonce("alice"), 7)
+        self.assertEqual(self.index.get_next_nonce("bob"), 1)
+        # The committed nonce is only read once per sender
+        self.assertEqual(self.storage.reads, 2)
+
+    def test_rejects_stale_duplicate_and_gapped_nonces(self):
+        self.index.add(tx("alice", 5), "a5")
+
+        with self.assertRaisesRegex(TransactionException, "invalid"):
+            self.index.check_nonce(tx("alice", 4), "old")
+        with self.assertRaisesRegex(TransactionException, "already pending"):
+            self.index.check_nonce(tx("alice", 5), "other")
+        with self.assertRaisesRegex(TransactionException, "gap"):
+            self.index.check_nonce(tx("alice", 7), "a7")
+
+        # A recheck of the same tx passes
+        self.index.check_nonce(tx("alice", 5), "a5")
+        self.index.add(tx("alice", 5), "a5")
+
+    def test_first_tx_of_new_sender_takes_any_nonce(self):
+        self.index.add(tx("bob", 3), "b3")
+        with self.assertRaisesRegex(TransactionException, "gap"):
+            self.index.check_nonce(tx("bob", 5), "b5")
+        self.index.add(tx("bob", 4), "b4")
+
+    def test_commit_reconciles_with_block(self):
+        self.index.add(tx("alice", 5), "a5")
+        self.index.add(tx("alice", 6), "a6")
+
+        self.index.commit({"alice": 5})
+        self.assertEqual(self.index.get_next_nonce("alice"), 7)
+        with self.assertRaisesRegex(TransactionException, "invalid"):
+            self.index.check_nonce(tx("alice", 5), "a5")
+
+        # A committed nonce beyond every pending tx wins
+        self.index.commit({"alice": 9})
+        self.assertEqual(self.index.get_next_nonce("alice"), 10)
+        self.assertEqual(self.storage.reads, 1)
+
+    def test_commit_prunes_txs_that_were_not_rechecked(self):
+        self.index.add(tx("alice", 5), "a5")
+        self.index.add(tx("alice", 6), "a6")
+        self.index.commit({})
+
+        # Only a6 is rechecked, a5 left the mempool
+        self.index.add(tx("alice", 6), "a6")
+        self.index.commit({})
+        self.assertEqual(self.index.get_next_nonce("alice"), 7)
+
+        self.index.commit({})
+        self.assertEqual(self.index.get_next_nonce("alice"), 5)
+
+    def test_committed_nonces_are_bounded(self):
+        index = PendingNonceIndex(self.storage, max_committed=2)
+        index.commit({"bob": 1, "carol": 2})
+        self.assertEqual(index.get_next_nonce("alice"), 5)
+        # bob was used least recently
+        self.assertEqual(list(index._committed), ["carol", "alice"])
+        self.assertEqual(index.get_next_nonce("bob"), 0)
+        self.assertEqual(self.storage.reads, 2)
+
+    def test_commit_prunes_evicted_senders(self):
+        index = PendingNonceIndex(self.storage, prune_unseen=False, max_committed=1)
+        index.add(tx("alice", 5), "a5")
+        index.commit({"bob": 1})
+        self.assertNotIn("alice", index._committed)
+        # alice's tx was committed by a block this index did not see
+        self.storage.nonces["alice"] = 5
+        index.commit({})
+        self.assertNotIn("alice", index._pending)
+        index.add(tx("alice", 6), "a6")
+        self.assertEqual(index.get_next_nonce("alice"), 7)
+
+    def test_read_during_commit_is_not_cached(self):
+        index = PendingNonceIndex(self.storage)
+        get_nonce = self.storage.get_nonce
+
+        def commit_while_reading(sender):
+            nonce = get_nonce(sender)
+            index.commit({})
+            return nonce
+
+        self.storage.get_nonce = commit_while_reading
+        self.assertEqual(index.get_committed_nonce("alice"), 4)
+        self.assertNotIn("alice", index._committed)
+
+    def test_discard(self):
+        self.index.add(tx("alice", 5), "a5")
+        self.index.discard(tx("alice", 5), "other")
+        self.assertEqual(self.index.get_next_nonce("alice"), 6)
+        self.index.discard(tx("alice", 5), "a5")
+        self.assertEqual(self.index.get_next_nonce("alice"), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
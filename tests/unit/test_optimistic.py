@@ -0,0 +1,86 @@
+import time
+import asyncio
+import unittest
+from xian.optimistic import OptimisticExecution
+
+
+async def execute(result, log=None):
+    if log is not None:
+        log.append(result)
+    return result
+
+
+async def execute_blocking(seconds):
+    # Contract execution does not yield to the event loop
+    time.sleep(seconds)
+    return "result"
+
+
+async def fail():
+    raise ValueError("execution failed")
+
+
+class TestOptimisticExecution(unittest.IsolatedAsyncioTestCase):
+
+    async def test_nothing_pending(self):
+        execution = OptimisticExecution()
+        self.assertFalse(execution.pending)
+        self.assertIsNone(await execution.take(1, "aa"))
+
+    async def test_take_matching_block(self):
+        execution = OptimisticExecution()
+        execution.start(5, "aa", execute("result"))
+        self.assertTrue(execution.pending)
+        self.assertEqual(await execution.take(5, "aa"), "result")
+        self.assertFalse(execution.pending)
+
+    async def test_take_other_block(self):
+        execution = OptimisticExecution()
+        log = []
+        execution.start(5, "aa", execute("result", log))
+        self.assertIsNone(await execution.take(5, "bb"))
+        # It ran to completion, the caller drops what it wrote
+        self.assertEqual(log, ["result"])
+        self.assertFalse(execution.pending)
+
+    async def test_take_other_height(self):
+        execution = OptimisticExecution()
+        execution.start(5, "aa", execute("result"))
+        self.assertIsNone(await execution.take(6, "aa"))
+
+    async def test_does_not_block_the_loop(self):
+        execution = OptimisticExecution()
+        started = time.monotonic()
+        execution.start(5, "aa", execute_blocking(0.3))
+        await asyncio.sleep(0.01)
+        self.assertLess(time.monotonic() - started, 0.2)
+        self.assertEqual(await execution.take(5, "aa"), "result")
+
+    async def test_failed_execution(self):
+        execution = OptimisticExecution()
+        execution.start(5, "aa", fail())
+        self.assertIsNone(await execution.take(5, "aa"))
+        self.assertFalse(execution.pending)
+
+    async def test_discard(self):
+        execution = OptimisticExecution()
+        log = []
+        execution.start(5, "aa", execute("first", log))
+        await execution.discard()
+        self.assertFalse(execution.pending)
+        execution.start(5, "bb", execute("second", log))
+        self.assertEqual(await execution.take(5, "bb"), "second")
+        self.assertEqual(log, ["first", "second"])
+
+    async def test_one_execution_at_a_time(self):
+        execution = OptimisticExecution()
+        execution.start(5, "aa", execute("first"))
+        coro = execute("second")
+        with self.assertRaises(RuntimeError):
+            execution.start(5, "bb", coro)
+        coro.close()
+        await execution.discard()
+
+
+if __name__ == "__main__":
+    unittest.main()
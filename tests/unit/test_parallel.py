@@ -0,0 +1,94 @@
+import unittest
+from xian.parallel import ParallelBlock, ParallelExecutor, SpeculativeResult
+
+
+class FakeDriver:
+    def __init__(self):
+        self.writes = {}
+
+    def set(self, key, value):
+        self.writes[key] = value
+
+
+class FakeProcessor:
+    """
+    Serial execution writes the keys listed in the tx
+    """
+
+    def __init__(self):
+        self.client = type("Client", (), {"raw_driver": FakeDriver()})()
+        self.executed = []
+        self.applied = []
+
+    def result(self, tx, writes):
+        return {"tx_result": {"state": [{"key": k, "value": v} for k, v in writes.items()]}}
+
+    def process_tx(self, tx, enabled_fees=False, rewards_handler=None):
+        self.executed.append(tx["id"])
+        return self.result(tx, tx["writes"])
+
+    def process_executed_tx(self, tx, output, stamp_cost, rewards_handler=None):
+        self.applied.append(tx["id"])
+        return self.result(tx, output["writes"])
+
+
+def tx(id, writes, contract="currency"):
+    return {"id": id, "writes": writes, "payload": {"contract": contract}}
+
+
+def spec(reads, writes, status_code=0, prefixes=()):
+    output = {"status_code": status_code, "writes": writes}
+    return SpeculativeResult(output, 20, set(reads), set(prefixes))
+
+
+class TestParallelBlock(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = FakeProcessor()
+        self.block = ParallelBlock()
+
+    def process(self, tx, spec):
+        return self.block.process_tx(tx, spec, self.processor, enabled_fees=True, rewards_handler=None)
+
+    def test_independent_txs_use_speculative_results(self):
+        self.process(tx(0, {"a": 1}), spec({"a", "s0"}, {"a": 1}))
+        self.process(tx(1, {"b": 1}), spec({"b", "s1"}, {"b": 1}))
+        self.assertEqual(self.processor.applied, [0, 1])
+        self.assertEqual(self.processor.executed, [])
+        self.assertEqual(self.processor.client.raw_driver.writes, {"a": 1, "b": 1})
+
+    def test_conflicting_reads_are_executed_again(self):
+        self.process(tx(0, {"a": 1}), spec({"a"}, {"a": 1}))
+        self.process(tx(1, {"a": 2}), spec({"a"}, {"a": 5}))
+        self.process(tx(2, {"c": 1}), spec({"c"}, {"c": 1}))
+        self.assertEqual(self.processor.applied, [0, 2])
+        self.assertEqual(self.processor.executed, [1])
+        self.assertEqual((self.block.reused, self.block.executed), (2, 1))
+
+    def test_writes_of_executed_txs_invalidate_later_reads(self):
+        self.process(tx(0, {"x": 1}), None)
+        self.process(tx(1, {}), spec({"x"}, {}))
+        self.assertEqual(self.processor.executed, [0, 1])
+
+    def test_prefix_reads_conflict_with_writes_below_them(self):
+        self.process(tx(0, {"con.h:a": 1}), spec({}, {"con.h:a": 1}))
+        self.process(tx(1, {}), spec({}, {}, prefixes={"con.h:"}))
+        self.process(tx(2, {}), spec({}, {}, prefixes={"con.other:"}))
+        self.assertEqual(self.processor.executed, [1])
+
+    def test_failed_txs_are_executed_again(self):
+        self.process(tx(0, {}), spec({}, {}, status_code=1))
+        self.assertEqual(self.processor.executed, [0])
+
+
+class TestParallelExecutor(unittest.TestCase):
+
+    def test_blocks_with_submissions_run_serially(self):
+        executor = ParallelExecutor(storage_home="/tmp", workers=2)
+        self.assertTrue(executor.should_speculate([tx(0, {}), tx(1, {})]))
+        self.assertFalse(executor.should_speculate([tx(0, {})]))
+        self.assertFalse(executor.should_speculate([tx(0, {}), tx(1, {}, contract="submission")]))
+
+
+if __name__ == "__main__":
+    unittest.main()
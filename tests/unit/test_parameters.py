@@ -0,0 +1,71 @@
+import unittest
+from xian.parameters import ParameterCache
+
+
+class FakeDriver:
+    def __init__(self, state):
+        self.state = state
+        self.reads = []
+
+    def make_key(self, contract, variable, args=[]):
+        key = f"{contract}.{variable}"
+        return ":".join([key, *map(str, args)]) if args else key
+
+    def get(self, key):
+        self.reads.append(key)
+        return self.state.get(key)
+
+
+class FakeClient:
+    def __init__(self, state):
+        self.raw_driver = FakeDriver(state)
+
+    def get_var(self, contract, variable, arguments=[], mark=False):
+        return self.raw_driver.get(self.raw_driver.make_key(contract, variable, arguments))
+
+
+class TestParameterCache(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeClient({
+            "stamp_cost.S:value": 20,
+            "masternodes.nodes": ["a", "b"],
+            "currency.balances:a": 5,
+        })
+        self.driver = self.client.raw_driver
+        self.parameters = ParameterCache(self.client)
+
+    def test_parameters_are_read_once(self):
+        for _ in range(3):
+            self.assertEqual(self.parameters.get_var("stamp_cost", "S", ["value"]), 20)
+            self.assertEqual(self.parameters.get("masternodes.nodes"), ["a", "b"])
+            self.assertIsNone(self.parameters.get("foundation.owner"))
+        self.assertEqual(sorted(self.driver.reads), ["foundation.owner", "masternodes.nodes", "stamp_cost.S:value"])
+
+    def test_other_keys_are_not_cached(self):
+        for _ in range(2):
+            self.assertEqual(self.parameters.get_var("currency", "balances", ["a"]), 5)
+        self.assertEqual(self.driver.reads, ["currency.balances:a"] * 2)
+
+    def test_invalidate_and_clear(self):
+        self.parameters.get("stamp_cost.S:value")
+        self.parameters.get("masternodes.nodes")
+
+        self.driver.state["stamp_cost.S:value"] = 30
+        self.parameters.invalidate({"stamp_cost.S:value": 30, "currency.balances:a": 1})
+        self.assertEqual(self.parameters.get("stamp_cost.S:value"), 30)
+
+        self.driver.state["masternodes.nodes"] = ["a"]
+        self.assertEqual(self.parameters.get("masternodes.nodes"), ["a", "b"])
+        self.parameters.clear()
+        self.assertEqual(self.parameters.get("masternodes.nodes"), ["a"])
+
+    def test_pass_through_without_keys(self):
+        parameters = ParameterCache(self.client, keys=())
+        parameters.get("stamp_cost.S:value")
+        parameters.get("stamp_cost.S:value")
+        self.assertEqual(len(self.driver.reads), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
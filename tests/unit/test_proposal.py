@@ -0,0 +1,117 @@
+import json
+import unittest
+import nacl.signing
+from xian.proposal import ProposalBuilder, proto_size
+from xian.tx_cache import VerifiedTxCache
+from xian.verifier import SignatureVerifier
+
+CHAIN_ID = "xian-testnet-1"
+
+
+class FakeNonceIndex:
+    def __init__(self, committed=None):
+        self.committed = committed or {}
+
+    def get_committed_nonce(self, sender):
+        return self.committed.get(sender)
+
+
+def make_tx(key, nonce, stamps=100, chain_id=CHAIN_ID, tamper=False):
+    payload = json.dumps({
+        "chain_id": chain_id,
+        "contract": "currency",
+        "function": "transfer",
+        "kwargs": {"amount": 1, "to": "bob"},
+        "nonce": nonce,
+        "sender": key.verify_key.encode().hex(),
+        "stamps_supplied": stamps,
+    }, separators=(",", ":"), sort_keys=True)
+    signature = key.sign(payload.encode()).signature.hex()
+    if tamper:
+        payload = payload.replace('"amount":1', '"amount":2')
+    tx = '{"metadata":{"signature":"%s"},"payload":%s}' % (signature, payload)
+    return tx.encode().hex().encode()
+
+
+def sender(key):
+    return key.verify_key.encode().hex()
+
+
+class TestProposalBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.alice = nacl.signing.SigningKey.generate()
+        self.bob = nacl.signing.SigningKey.generate()
+        self.verifier = SignatureVerifier(workers=1)
+        self.tx_cache = VerifiedTxCache()
+
+    def tearDown(self):
+        self.verifier.shutdown()
+
+    def builder(self, committed=None, ordering="fifo"):
+        return ProposalBuilder(
+            self.tx_cache, self.verifier, FakeNonceIndex(committed), CHAIN_ID, ordering=ordering
+        )
+
+    def test_drops_invalid_txs(self):
+        good = make_tx(self.alice, 1)
+        txs = [
+            b"zz",
+            make_tx(self.bob, 1, tamper=True),
+            make_tx(self.bob, 2, chain_id="other-chain"),
+            good,
+            good,
+        ]
+        builder = self.builder()
+        self.assertEqual(builder.build(txs, 0), [good])
+        self.assertEqual(builder.last_stats.invalid, 3)
+        self.assertEqual(builder.last_stats.duplicates, 1)
+        # The signature verdicts are cached for the next proposal
+        self.assertTrue(self.tx_cache.get(good).signature_valid)
+        self.assertFalse(self.tx_cache.get(txs[1]).signature_valid)
+
+    def test_orders_sender_txs_by_nonce(self):
+        a3, a1, b5, a2 = make_tx(self.alice, 3), make_tx(self.alice, 1), make_tx(self.bob, 5), make_tx(self.alice, 2)
+        txs = self.builder().build([a3, a1, b5, a2], 0)
+        # Mempool order, except where a sender's nonces have to go first
+        self.assertEqual(txs, [a1, b5, a2, a3])
+
+    def test_drops_committed_and_gapped_nonces(self):
+        txs = [make_tx(self.alice, n) for n in (4, 5, 6, 8)] + [make_tx(self.bob, 1)]
+        builder = self.builder(committed={sender(self.alice): 4})
+        self.assertEqual(builder.build(txs, 0), [txs[1], txs[2], txs[4]])
+        self.assertEqual(builder.last_stats.nonce_dropped, 2)
+
+    def test_same_nonce_keeps_first(self):
+        first = make_tx(self.alice, 1, stamps=100)
+        second = make_tx(self.alice, 1, stamps=200)
+        self.assertEqual(self.builder().build([first, second], 0), [first])
+
+    def test_stamps_ordering(self):
+        a1 = make_tx(self.alice, 1, stamps=10)
+        a2 = make_tx(self.alice, 2, stamps=1000)
+        b1 = make_tx(self.bob, 1, stamps=50)
+        b2 = make_tx(self.bob, 2, stamps=5)
+        txs = self.builder(ordering="stamps").build([a1, a2, b1, b2], 0)
+        # Most stamps first, without breaking nonce order
+        self.assertEqual(txs, [b1, a1, a2, b2])
+
+    def test_packs_to_max_tx_bytes(self):
+        a1, a2, b1 = make_tx(self.alice, 1), make_tx(self.alice, 2, stamps=1000), make_tx(self.bob, 1)
+        limit = proto_size(a1) + proto_size(b1)
+        builder = self.builder()
+        self.assertEqual(builder.build([a1, a2, b1], limit), [a1, b1])
+        self.assertEqual(builder.last_stats.size_dropped, 1)
+        self.assertEqual(builder.last_stats.bytes, limit)
+
+    def test_proto_size(self):
+        self.assertEqual(proto_size(b"a" * 10), 12)
+        self.assertEqual(proto_size(b"a" * 200), 203)
+
+    def test_unknown_ordering(self):
+        with self.assertRaises(ValueError):
+            self.builder(ordering="random")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from xian.query_cache import QueryCache, query_kind
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestQueryKind(unittest.TestCase):
+
+    def test_dependencies(self):
+        self.assertEqual(query_kind(["get", "currency.balances:alice"], False), ("get", {"currency.balances:alice"}, []))
+        self.assertEqual(query_kind(["contract_methods", "currency"], False), ("contract", {"currency.__code__"}, []))
+        self.assertEqual(query_kind(["keys", "currency.balances"], False), ("keys", set(), ["currency.balances"]))
+        self.assertIsNone(query_kind(["contracts", "limit=10"], False))
+        self.assertIsNone(query_kind(["state", "currency.balances"], False))
+
+    def test_not_cached(self):
+        for path_parts in ([], ["get"], ["get_next_nonce", "alice"], ["simulate_tx", "00"], ["health"]):
+            self.assertIsNone(query_kind(path_parts, False))
+
+    def test_historical(self):
+        self.assertEqual(query_kind(["get", "a.b"], True), ("history", set(), []))
+        self.assertIsNone(query_kind(["state", "a.b"], True))
+
+
+class TestQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = QueryCache(max_size=3, clock=self.clock)
+
+    def put(self, path, height=0):
+        kind = query_kind(path.split("/"), bool(height))
+        value, generation = self.cache.get((path, height))
+        self.cache.put((path, height), f"{path}@{height}", *kind, generation=generation)
+
+    def cached(self, path, height=0):
+        return self.cache.get((path, height))[0]
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(self.cached("get/a.b"))
+        self.put("get/a.b")
+        self.assertEqual(self.cached("get/a.b"), "get/a.b@0")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_invalidates_written_keys(self):
+        for path in ("get/a.b", "get/a.c", "contract/con_x"):
+            self.put(path)
+        self.assertEqual(self.cache.invalidate(["a.b", "con_x.__code__", "z.z"]), 2)
+        self.assertIsNone(self.cached("get/a.b"))
+        self.assertIsNone(self.cached("contract/con_x"))
+        self.assertEqual(self.cached("get/a.c"), "get/a.c@0")
+
+    def test_invalidates_prefixes_and_all(self):
+        self.put("keys/currency.balances")
+        self.put("keys/con_x.owners")
+        self.put("app_hash_proof/f39b4ea8")
+        self.assertEqual(self.cache.invalidate(["currency.balances:bob"]), 2)
+        self.assertEqual(self.cached("keys/con_x.owners"), "keys/con_x.owners@0")
+
+    def test_historical_entries_survive_commits(self):
+        self.put("get/a.b", height=5)
+        self.cache.invalidate(["a.b"])
+        self.assertEqual(self.cached("get/a.b", 5), "get/a.b@5")
+
+    def test_stale_put_is_dropped(self):
+        _, generation = self.cache.get(("get/a.b", 0))
+        # A block commits while the query is running
+        self.cache.invalidate(["a.b"])
+        self.cache.put(("get/a.b", 0), "old", "get", {"a.b"}, [], generation=generation)
+        self.assertIsNone(self.cached("get/a.b"))
+
+    def test_ttl(self):
+        self.put("get/a.b")
+        self.put("contract/con_x")
+        self.clock.now = 60
+        self.assertIsNone(self.cached("get/a.b"))
+        self.assertEqual(self.cached("contract/con_x"), "contract/con_x@0")
+
+    def test_lru_eviction(self):
+        for path in ("get/a.1", "get/a.2", "get/a.3"):
+            self.put(path)
+        self.cached("get/a.1")
+        self.put("get/a.4")
+        self.assertIsNone(self.cached("get/a.2"))
+        self.assertEqual(self.cached("get/a.1"), "get/a.1@0")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        # Dependencies of evicted entries are forgotten too
+        self.assertNotIn("a.2", self.cache._by_key)
+
+    def test_clear(self):
+        self.put("get/a.b")
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
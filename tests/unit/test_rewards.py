@@ -0,0 +1,56 @@
+import unittest
+from contracting.stdlib.bridge.decimal import ContractingDecimal
+from xian.rewards import RewardLedger
+
+
+class FakeDriver:
+    def __init__(self, state=None):
+        self.state = dict(state or {})
+        self.reads = []
+
+    def get(self, key):
+        self.reads.append(key)
+        return self.state.get(key)
+
+    def set(self, key, value):
+        self.state[key] = value
+
+
+class TestRewardLedger(unittest.TestCase):
+
+    def test_units_round_to_dust_exponent(self):
+        ledger = RewardLedger()
+        self.assertEqual(ledger.to_units("1"), 10 ** 8)
+        self.assertEqual(ledger.to_units("0.000000015"), 2)
+        self.assertEqual(ledger.to_units("0.000000025"), 2)
+        self.assertEqual(ledger.to_units("0.000000004"), 0)
+        self.assertEqual(ledger.to_units(ContractingDecimal("0.12345678")), 12345678)
+
+    def test_one_write_per_recipient(self):
+        ledger = RewardLedger()
+        nodes = [f"node_{i}" for i in range(100)]
+        for _ in range(1000):
+            ledger.credit_many(nodes, "0.001")
+            ledger.credit("foundation", "0.0005")
+
+        driver = FakeDriver({"currency.balances:node_0": ContractingDecimal("10")})
+        writes = ledger.apply(driver)
+
+        self.assertEqual(len(writes), 101)
+        self.assertEqual(len(driver.reads), 101)
+        self.assertEqual([w["key"] for w in writes], sorted(w["key"] for w in writes))
+        self.assertEqual(driver.state["currency.balances:node_0"], ContractingDecimal("11"))
+        self.assertEqual(driver.state["currency.balances:node_1"], ContractingDecimal("1"))
+        self.assertEqual(driver.state["currency.balances:foundation"], ContractingDecimal("0.5"))
+        # Totals are paid once
+        self.assertEqual(ledger.apply(driver), [])
+
+    def test_zero_rewards_write_nothing(self):
+        ledger = RewardLedger()
+        ledger.credit("node", 0)
+        ledger.credit("node", "0.000000001")
+        self.assertEqual(ledger.apply(FakeDriver()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
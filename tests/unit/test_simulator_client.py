@@ -0,0 +1,108 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from xian.services.simulator_client import HEADER, SimulatorClient
+
+
+class FakeSimulator:
+    """
+    Answers every request with its payload reversed, after the delay in
+    seconds the payload starts with
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connections = 0
+        self.writers = []
+
+    async def start(self):
+        self.server = await asyncio.start_unix_server(self.handle, self.path)
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        self.writers.append(writer)
+        try:
+            while True:
+                length, request_id = HEADER.unpack(await reader.readexactly(HEADER.size))
+                data = await reader.readexactly(length)
+                asyncio.create_task(self.respond(writer, request_id, data))
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+    async def respond(self, writer, request_id, data):
+        await asyncio.sleep(float(data.split(b":")[0]))
+        response = data[::-1]
+        writer.write(HEADER.pack(len(response), request_id) + response)
+        await writer.drain()
+
+    async def stop(self):
+        self.server.close()
+        for writer in self.writers:
+            writer.close()
+        await self.server.wait_closed()
+
+
+class TestSimulatorClient(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "simulator.sock")
+        self.simulator = FakeSimulator(self.path)
+        await self.simulator.start()
+        self.client = SimulatorClient(self.path, size=2, timeout=1)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.simulator.stop()
+        shutil.rmtree(self.dir)
+
+    async def test_request(self):
+        self.assertEqual(await self.client.request(b"0:abc"), b"cba:0")
+        self.assertEqual(await self.client.request(b"0:def"), b"fed:0")
+        # Connections are reused
+        self.assertEqual(self.simulator.connections, 1)
+
+    async def test_pipelined_responses_out_of_order(self):
+        self.client.size = 1
+        slow = asyncio.create_task(self.client.request(b"0.2:slow"))
+        await asyncio.sleep(0.01)
+        fast = await self.client.request(b"0:fast")
+        self.assertEqual(fast, b"tsaf:0")
+        self.assertFalse(slow.done())
+        self.assertEqual(await slow, b"wols:2.0")
+        self.assertEqual(self.simulator.connections, 1)
+
+    async def test_busy_connection_opens_another(self):
+        results = await asyncio.gather(self.client.request(b"0.05:a"), self.client.request(b"0.05:b"))
+        self.assertEqual(results, [b"a:50.0", b"b:50.0"])
+        self.assertEqual(self.simulator.connections, 2)
+
+    async def test_timeout(self):
+        self.client.timeout = 0.05
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.client.request(b"0.2:late")
+        # The late response is dropped, the connection stays usable
+        await asyncio.sleep(0.2)
+        self.assertEqual(await self.client.request(b"0:next"), b"txen:0")
+
+    async def test_reconnects(self):
+        await self.client.request(b"0:a")
+        for writer in self.simulator.writers:
+            writer.close()
+        await asyncio.sleep(0.05)
+        self.assertEqual(await self.client.request(b"0:b"), b"b:0")
+        self.assertEqual(self.simulator.connections, 2)
+
+    async def test_lost_connection_fails_pending(self):
+        task = asyncio.create_task(self.client.request(b"0.5:a"))
+        await asyncio.sleep(0.05)
+        for writer in self.simulator.writers:
+            writer.close()
+        with self.assertRaises(ConnectionError):
+            await task
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,281 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from cometbft.abci.v1beta1.types_pb2 import (
+    RequestApplySnapshotChunk,
+    RequestLoadSnapshotChunk,
+    RequestOfferSnapshot,
+    ResponseApplySnapshotChunk,
+    ResponseOfferSnapshot,
+)
+from xian.methods import state_sync
+from xian.snapshots import SnapshotRestore, SnapshotStore, decode_chunk
+from xian.state_tree import StateTree
+from xian.utils.merkle import MerkleAccumulator
+from xian.upgrades import STATE_ROOT
+
+
+class FakeState:
+    def __init__(self, store=None):
+        self.store = dict(store or {})
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def keys(self, prefix=""):
+        return sorted(key for key in self.store if key.startswith(prefix))
+
+
+class FakeDriver:
+    def __init__(self, state):
+        self.state = state
+        self.pending_writes = {}
+
+    def set(self, key, value):
+        self.pending_writes[key] = value
+
+    def hard_apply(self, nanos):
+        for key, value in self.pending_writes.items():
+            if value is None:
+                self.state.store.pop(key, None)
+            else:
+                self.state.store[key] = value
+        self.pending_writes.clear()
+
+
+def make_state(n=50):
+    return {f"currency.balances:{i:04d}": i for i in range(n)}
+
+
+class TestSnapshotStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.store = SnapshotStore(self.dir, chunk_size=200, keep_recent=2)
+
+    def tearDown(self):
+        self.store.shutdown()
+        shutil.rmtree(self.dir)
+
+    def take(self, state, height):
+        self.store.take(state, height, b"apphash", height * 10)
+        self.store._pending.result()
+
+    def test_chunks_hold_the_state(self):
+        state = FakeState(make_state())
+        self.take(state, 10)
+        self.assertEqual(self.store.heights(), [10])
+        manifest = json.loads(self.store.metadata(10))
+        self.assertGreater(len(manifest["chunks"]), 1)
+        self.assertEqual(manifest["app_hash"], b"apphash".hex())
+
+        items = []
+        for i in range(len(manifest["chunks"])):
+            items += decode_chunk(self.store.load_chunk(10, i))
+        self.assertEqual(dict(items), state.store)
+        self.assertEqual(self.store.load_chunk(10, 99), b"")
+
+    def test_empty_state_has_one_chunk(self):
+        self.take(FakeState(), 1)
+        manifest = json.loads(self.store.metadata(1))
+        self.assertEqual(len(manifest["chunks"]), 1)
+        self.assertEqual(decode_chunk(self.store.load_chunk(1, 0)), [])
+
+    def test_keeps_recent(self):
+        state = FakeState(make_state(3))
+        for height in (10, 20, 30):
+            self.take(state, height)
+        self.assertEqual(self.store.heights(), [20, 30])
+        self.assertIsNone(self.store.metadata(10))
+
+    def test_keeps_at_least_one(self):
+        with self.assertRaises(ValueError):
+            SnapshotStore(self.dir, keep_recent=0)
+
+    def test_view_keeps_snapshot_height(self):
+        state = FakeState({"a.x": 1, "a.y": 2})
+        driver = FakeDriver(state)
+        self.store.take(state, 10, b"apphash", 100)
+        view = self.store.view
+        # The next block commits while the snapshot is written
+        driver.set("a.x", 5)
+        driver.set("a.y", None)
+        driver.set("a.z", 3)
+        self.store.preserve(driver.pending_writes)
+        driver.hard_apply("200")
+        self.assertEqual(view.keys(), ["a.x", "a.y", "a.z"])
+        self.assertEqual([view.get(key) for key in view.keys()], [1, 2, None])
+        self.store._pending.result()
+
+
+class TestSnapshotRestore(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.store = SnapshotStore(self.dir, chunk_size=200)
+        self.source = FakeState(make_state())
+        self.store.take(self.source, 10, b"apphash", 100)
+        self.store._pending.result()
+        self.manifest = json.loads(self.store.metadata(10))
+        self.target = FakeState()
+        self.restore = SnapshotRestore(self.manifest, FakeDriver(self.target), workers=2)
+
+    def tearDown(self):
+        self.store.shutdown()
+        shutil.rmtree(self.dir)
+
+    async def test_restores_chunks_in_any_order(self):
+        chunks = range(len(self.manifest["chunks"]))
+        for i in reversed(chunks):
+            self.assertTrue(self.restore.apply(i, self.store.load_chunk(10, i)))
+        self.assertTrue(self.restore.complete)
+        await self.restore.finish()
+        self.assertEqual(self.target.store, self.source.store)
+
+    async def test_rejects_corrupt_chunk(self):
+        chunk = self.store.load_chunk(10, 0)
+        self.assertFalse(self.restore.apply(0, chunk[:-1] + b"\x00"))
+        self.assertFalse(self.restore.apply(99, chunk))
+        self.assertFalse(self.restore.complete)
+
+    async def test_rollback(self):
+        self.restore.apply(0, self.store.load_chunk(10, 0))
+        self.restore.rollback()
+        self.assertEqual(self.target.store, {})
+
+
+class TestStateSync(unittest.IsolatedAsyncioTestCase):
+    """
+    A snapshot served by one node and restored by another
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def make_app(self, name, state):
+        app = SimpleNamespace(
+            committed_state=state,
+            client=SimpleNamespace(raw_driver=FakeDriver(state)),
+            block_metadata=SimpleNamespace(height=0, hash=b""),
+            committed_parameters=SimpleNamespace(clear=lambda: None),
+            snapshot_store=SnapshotStore(os.path.join(self.dir, name), chunk_size=200),
+            snapshot_restore=None,
+            snapshot_trust_unverified=False,
+            state_tree=None,
+            query_cache=None,
+            contract_index=SimpleNamespace(warm_up=lambda: 0),
+        )
+        app.state_tree_items = lambda: ((key, state.get(key)) for key in state.keys())
+        app.sync_key_index = lambda height, force=False: None
+
+        def set_metadata(h=None, height=None):
+            app.block_metadata.hash, app.block_metadata.height = h, height
+        app.block_metadata.set = set_metadata
+        self.addCleanup(app.snapshot_store.shutdown)
+        return app
+
+    def app_hash_with_state_root(self, state: dict):
+        tree = StateTree(":memory:")
+        tree.rebuild(state.items(), 10)
+        app_hash_tree = MerkleAccumulator()
+        app_hash_tree.append(b"tx fingerprint", key="tx")
+        app_hash_tree.append(tree.root().hex().encode(), key=STATE_ROOT)
+        return app_hash_tree.root().hex().encode(), app_hash_tree.proof_for(STATE_ROOT)
+
+    async def sync(self, source, target, app_hash, corrupt=None):
+        listed = (await state_sync.list_snapshots(source, None)).snapshots
+        self.assertEqual(len(listed), 1)
+        snapshot = listed[0]
+        offer = await state_sync.offer_snapshot(target, RequestOfferSnapshot(snapshot=snapshot, app_hash=app_hash))
+        if offer.result != ResponseOfferSnapshot.ACCEPT:
+            return offer.result
+
+        result = None
+        for i in range(snapshot.chunks):
+            chunk = (await state_sync.load_snapshot_chunk(source, RequestLoadSnapshotChunk(
+                height=snapshot.height, format=snapshot.format, chunk=i
+            ))).chunk
+            if i == corrupt:
+                res = await state_sync.apply_snapshot_chunk(target, RequestApplySnapshotChunk(
+                    index=i, chunk=b"garbage", sender="peer"
+                ))
+                self.assertEqual(res.result, ResponseApplySnapshotChunk.RETRY)
+                self.assertEqual(list(res.refetch_chunks), [i])
+                self.assertEqual(list(res.reject_senders), ["peer"])
+            res = await state_sync.apply_snapshot_chunk(target, RequestApplySnapshotChunk(index=i, chunk=chunk))
+            result = res.result
+        return result
+
+    async def test_restore_verified_against_app_hash(self):
+        state = make_state()
+        app_hash, proof = self.app_hash_with_state_root(state)
+        source = self.make_app("source", FakeState(state))
+        source.snapshot_store.take(source.committed_state, 10, app_hash, 100, state_proof=proof)
+        await source.snapshot_store.wait()
+
+        target = self.make_app("target", FakeState())
+        result = await self.sync(source, target, app_hash, corrupt=1)
+        self.assertEqual(result, ResponseApplySnapshotChunk.ACCEPT)
+        self.assertEqual(target.committed_state.store, state)
+        self.assertEqual(target.block_metadata.height, 10)
+        self.assertEqual(target.block_metadata.hash, app_hash)
+
+    async def test_rejects_state_not_matching_app_hash(self):
+        state = make_state()
+        app_hash, proof = self.app_hash_with_state_root(state)
+        state["currency.balances:0001"] = 1000
+        source = self.make_app("source", FakeState(state))
+        source.snapshot_store.take(source.committed_state, 10, app_hash, 100, state_proof=proof)
+        await source.snapshot_store.wait()
+
+        target = self.make_app("target", FakeState())
+        result = await self.sync(source, target, app_hash)
+        self.assertEqual(result, ResponseApplySnapshotChunk.REJECT_SNAPSHOT)
+        self.assertEqual(target.committed_state.store, {})
+        self.assertEqual(target.block_metadata.height, 0)
+
+    async def test_rejects_other_app_hash(self):
+        source = self.make_app("source", FakeState(make_state()))
+        source.snapshot_store.take(source.committed_state, 10, b"apphash", 100)
+        await source.snapshot_store.wait()
+
+        target = self.make_app("target", FakeState())
+        result = await self.sync(source, target, b"otherhash")
+        self.assertEqual(result, ResponseOfferSnapshot.REJECT)
+
+    async def test_rejects_unverifiable_snapshot(self):
+        state = make_state()
+        source = self.make_app("source", FakeState(state))
+        source.snapshot_store.take(source.committed_state, 10, b"apphash", 100)
+        await source.snapshot_store.wait()
+
+        target = self.make_app("target", FakeState())
+        result = await self.sync(source, target, b"apphash")
+        self.assertEqual(result, ResponseOfferSnapshot.REJECT)
+        self.assertIsNone(target.snapshot_restore)
+
+        # Unless the operator trusts the peers
+        target.snapshot_trust_unverified = True
+        result = await self.sync(source, target, b"apphash")
+        self.assertEqual(result, ResponseApplySnapshotChunk.ACCEPT)
+        self.assertEqual(target.committed_state.store, state)
+
+    async def test_rejects_when_state_is_not_empty(self):
+        source = self.make_app("source", FakeState(make_state()))
+        source.snapshot_store.take(source.committed_state, 10, b"apphash", 100)
+        await source.snapshot_store.wait()
+
+        target = self.make_app("target", FakeState())
+        target.block_metadata.height = 5
+        result = await self.sync(source, target, b"apphash")
+        self.assertEqual(result, ResponseOfferSnapshot.REJECT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from xian.state_tree import StateTree, EMPTY_HASH, verify_proof
+
+
+class TestStateTree(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.tree = self.open_tree("tree.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def open_tree(self, name):
+        return StateTree(os.path.join(self.dir, name))
+
+    def fresh_root(self, state: dict, name: str) -> bytes:
+        tree = self.open_tree(name)
+        tree.rebuild(state.items(), 1)
+        return tree.root()
+
+    def test_empty_tree(self):
+        self.assertEqual(self.tree.root(), EMPTY_HASH)
+        self.assertEqual(self.tree.stage({}), EMPTY_HASH)
+        proof = self.tree.prove("currency.balances:alice")
+        self.assertTrue(verify_proof(proof, EMPTY_HASH))
+
+    def test_root_only_depends_on_state(self):
+        rng = random.Random(7)
+        state = {}
+        for height in range(1, 30):
+            writes = {}
+            for _ in range(rng.randint(1, 12)):
+                key = f"currency.balances:{rng.randint(0, 60)}"
+                value = None if state and rng.random() < 0.3 else rng.randint(0, 10 ** 6)
+                writes[key] = value
+            root = self.tree.stage(writes)
+            self.tree.commit(height)
+            for key, value in writes.items():
+                if value is None:
+                    state.pop(key, None)
+                else:
+                    state[key] = value
+            self.assertEqual(root, self.tree.root())
+            self.assertEqual(root, self.fresh_root(state, f"fresh_{height}.db"))
+
+    def test_proofs(self):
+        state = {f"currency.balances:{i}": i * 10 for i in range(50)}
+        self.tree.stage(state)
+        self.tree.commit(5)
+        root = self.tree.root()
+
+        for key, value in state.items():
+            proof = self.tree.prove(key)
+            self.assertEqual(proof["height"], 5)
+            self.assertTrue(verify_proof(proof, root, value))
+            self.assertFalse(verify_proof(proof, root, value + 1))
+            # Present keys can't be proven absent
+            self.assertFalse(verify_proof(proof, root))
+
+        for i in range(50, 80):
+            proof = self.tree.prove(f"currency.balances:{i}")
+            self.assertTrue(verify_proof(proof, root))
+            self.assertFalse(verify_proof(proof, root, 1))
+
+    def test_proof_against_other_root(self):
+        self.tree.stage({"a.b": 1, "a.c": 2})
+        self.tree.commit(1)
+        proof = self.tree.prove("a.b")
+        self.tree.stage({"a.b": 3})
+        self.tree.commit(2)
+        self.assertFalse(verify_proof(proof, self.tree.root(), 1))
+
+    def test_delete_collapses(self):
+        root = self.tree.stage({"a.b": 1})
+        self.tree.commit(1)
+        self.tree.stage({"a.c": 2, "a.d": 3})
+        self.tree.commit(2)
+        self.assertEqual(self.tree.stage({"a.c": None, "a.d": None}), root)
+        self.tree.commit(3)
+        self.assertEqual(self.tree.stage({"a.b": None}), EMPTY_HASH)
+
+    def test_staged_writes_are_not_committed(self):
+        self.tree.stage({"a.b": 1})
+        self.tree.commit(1)
+        root = self.tree.root()
+        staged = self.tree.stage({"a.c": 2})
+        self.assertNotEqual(staged, root)
+        self.assertEqual(self.tree.root(), root)
+        self.tree.discard()
+        self.assertTrue(verify_proof(self.tree.prove("a.c"), root))
+
+    def test_restart(self):
+        self.tree.stage({f"a.{i}": i for i in range(20)})
+        self.tree.commit(3)
+        root = self.tree.root()
+
+        reopened = self.open_tree("tree.db")
+        self.assertEqual(reopened.height, 3)
+        self.assertEqual(reopened.root(), root)
+        self.assertEqual(reopened.stage({"a.20": 20}), self.tree.stage({"a.20": 20}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from xian.tx_cache import VerifiedTxCache
+
+
+class TestVerifiedTxCache(unittest.TestCase):
+
+    def test_hit_returns_decoded_tx_and_verdict(self):
+        cache = VerifiedTxCache(max_size=10)
+        tx = {"payload": {"nonce": 1}}
+        cache.add(b"raw", tx, '{"nonce":1}', True)
+        entry = cache.get(b"raw")
+        self.assertIs(entry.tx, tx)
+        self.assertEqual(entry.payload_str, '{"nonce":1}')
+        self.assertTrue(entry.signature_valid)
+        self.assertIsNone(cache.get(b"other"))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = VerifiedTxCache(max_size=2)
+        cache.add(b"a", {}, "", True)
+        cache.add(b"b", {}, "", True)
+        cache.get(b"a")
+        cache.add(b"c", {}, "", False)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.get(b"a"))
+        self.assertIsNone(cache.get(b"b"))
+        self.assertFalse(cache.get(b"c").signature_valid)
+
+    def test_discard(self):
+        cache = VerifiedTxCache()
+        cache.add(b"a", {}, "", True)
+        cache.discard(b"a")
+        cache.discard(b"missing")
+        self.assertIsNone(cache.get(b"a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from cometbft.abci.v1beta1.types_pb2 import ValidatorUpdate
+from cometbft.crypto.v1.keys_pb2 import PublicKey
+from xian.validators import ValidatorHandler
+
+A, B, C = "aa" * 32, "bb" * 32, "cc" * 32
+
+
+class FakeDriver:
+    def __init__(self, state):
+        self.state = state
+
+    def get(self, key):
+        return self.state.get(key)
+
+    def set(self, key, value):
+        self.state[key] = value
+
+
+class FakeApp:
+    def __init__(self, state):
+        self.client = type("Client", (), {"raw_driver": FakeDriver(state)})()
+
+
+def update(validator, power):
+    return ValidatorUpdate(pub_key=PublicKey(ed25519=bytes.fromhex(validator)), power=power)
+
+
+class TestValidatorHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.state = {"masternodes.nodes": [A, B]}
+        self.handler = self.restart()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def restart(self):
+        return ValidatorHandler(FakeApp(self.state), self.dir)
+
+    def persisted(self):
+        with open(os.path.join(self.dir, ValidatorHandler.FILENAME)) as f:
+            return json.load(f)
+
+    @patch("xian.validators.requests.get")
+    def test_seeded_from_init_chain(self, rpc):
+        self.handler.init_validators([update(A, 10), update(B, 10), update(C, 0)])
+        self.assertEqual(self.persisted(), [A, B])
+
+        self.assertEqual(self.handler.build_validator_updates(1, nodes_changed=False), [])
+        self.assertEqual(self.handler.build_validator_updates(2, nodes_changed=True), [])
+        rpc.assert_not_called()
+
+    @patch("xian.validators.requests.get")
+    def test_updates_follow_masternodes(self, rpc):
+        self.handler.init_validators([update(A, 10), update(B, 10)])
+
+        self.state["masternodes.nodes"] = [B, C]
+        self.assertEqual(
+            self.handler.build_validator_updates(3, nodes_changed=True),
+            [update(C, 10), update(A, 0)]
+        )
+        # Persisted with the commit of the block
+        self.assertEqual(self.persisted(), [A, B])
+        self.handler.commit()
+        self.assertEqual(self.persisted(), [B, C])
+        # Applied updates are not sent again
+        self.assertEqual(self.handler.build_validator_updates(4, nodes_changed=True), [])
+        rpc.assert_not_called()
+
+    def test_never_written_to_state(self):
+        self.handler.init_validators([update(A, 10)])
+        self.handler.build_validator_updates(1)
+        self.handler.commit()
+        self.assertEqual(list(self.state), ["masternodes.nodes"])
+
+    def test_loaded_from_file_after_restart(self):
+        self.handler.init_validators([update(A, 10)])
+        handler = self.restart()
+        with patch("xian.validators.requests.get") as rpc:
+            self.assertEqual(handler.build_validator_updates(5, nodes_changed=False), [update(B, 10)])
+            rpc.assert_not_called()
+
+    def test_falls_back_to_rpc_once(self):
+        with patch.object(ValidatorHandler, "get_tendermint_validators", return_value=[A, C]) as rpc:
+            self.assertEqual(self.handler.build_validator_updates(6), [update(B, 10), update(C, 0)])
+            self.assertEqual(self.handler.build_validator_updates(7), [])
+            rpc.assert_called_once()
+
+    def test_rpc_seeded_set_is_persisted_right_away(self):
+        with patch.object(ValidatorHandler, "get_tendermint_validators", return_value=[A, C]):
+            self.handler.load_validators()
+        self.assertEqual(self.persisted(), [A, C])
+        with patch.object(ValidatorHandler, "get_tendermint_validators", return_value=[B]) as rpc:
+            self.restart().load_validators()
+            rpc.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import nacl.signing
+from xian.verifier import SignatureVerifier
+
+
+def signed(msg: str, key=None):
+    key = key or nacl.signing.SigningKey.generate()
+    signature = key.sign(msg.encode()).signature.hex()
+    return key.verify_key.encode().hex(), msg, signature
+
+
+class TestSignatureVerifier(unittest.TestCase):
+
+    def setUp(self):
+        self.verifier = SignatureVerifier(workers=3, min_batch_size=2)
+
+    def tearDown(self):
+        self.verifier.shutdown()
+
+    def test_verdicts_keep_batch_order(self):
+        items = [signed(f"payload {i}") for i in range(10)]
+        vk, msg, signature = items[4]
+        items[4] = (vk, "tampered", signature)
+        items[7] = (items[7][0], items[7][1], "00" * 64)
+
+        verdicts = self.verifier.verify_many(items)
+        self.assertEqual(verdicts, [i not in (4, 7) for i in range(10)])
+
+    def test_malformed_input_is_invalid(self):
+        vk, msg, signature = signed("payload")
+        self.assertTrue(self.verifier.verify(vk, msg, signature))
+        self.assertFalse(self.verifier.verify("not hex", msg, signature))
+        self.assertFalse(self.verifier.verify(vk, msg, "abcd"))
+
+    def test_other_errors_are_raised(self):
+        vk, msg, signature = signed("payload")
+        with self.assertRaises(AttributeError):
+            self.verifier.verify(vk, None, signature)
+
+    def test_small_and_empty_batches(self):
+        self.assertEqual(self.verifier.verify_many([]), [])
+        self.assertEqual(self.verifier.verify_many([signed("payload")]), [True])
+
+
+if __name__ == "__main__":
+    unittest.main()